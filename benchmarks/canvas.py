@@ -0,0 +1,94 @@
+#
+# canvas.py -- benchmarks for canvas objects
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Benchmarks for the memory used by, and the time to draw, large numbers
+of canvas objects in a headless (mock) viewer.
+"""
+import gc
+import logging
+import tracemalloc
+
+import numpy as np
+
+from ginga import AstroImage
+from ginga.canvas.CanvasObject import get_canvas_types
+from ginga.mockw.ImageViewCanvasMock import ImageViewCanvas
+
+kinds = ['Point', 'Circle', 'Box', 'Polygon', 'Text', 'Annulus',
+         'MarkerCollection']
+
+window_size = (1024, 1024)
+num_objects = 10000
+
+
+class CanvasBase(object):
+
+    params = [kinds]
+    param_names = ['kind']
+    timeout = 300
+
+    def setup(self, kind):
+        self.logger = logging.getLogger('benchmark')
+        self.dc = get_canvas_types()
+        self.viewer = ImageViewCanvas(logger=self.logger)
+        self.viewer.set_redraw_lag(0.0)
+        self.viewer.configure_window(*window_size)
+        data = np.zeros((4096, 4096), dtype=np.float32)
+        self.viewer.set_image(AstroImage.AstroImage(data_np=data,
+                                                    logger=self.logger))
+        self.canvas = self.dc.DrawingCanvas()
+        self.viewer.get_canvas().add(self.canvas)
+
+        rs = np.random.RandomState(42)
+        self.xy = rs.uniform(0, 4096, (num_objects, 2))
+
+    def add_objects(self, kind):
+        """Add `num_objects` objects (or markers) of type `kind`."""
+        dc, xy = self.dc, self.xy
+        if kind == 'MarkerCollection':
+            self.canvas.add(dc.MarkerCollection(xy[:, 0], xy[:, 1],
+                                                radius=5),
+                            redraw=False)
+            return
+
+        for x, y in xy:
+            if kind in ('Point', 'Circle'):
+                obj = getattr(dc, kind)(x, y, 5)
+            elif kind == 'Box':
+                obj = dc.Box(x, y, 5, 3)
+            elif kind == 'Polygon':
+                obj = dc.Polygon([(x, y), (x + 5, y), (x, y + 5)])
+            elif kind == 'Text':
+                obj = dc.Text(x, y, text='star')
+            elif kind == 'Annulus':
+                obj = dc.Annulus(x, y, 5, width=3)
+            self.canvas.add(obj, redraw=False)
+
+
+class MemCanvasObjects(CanvasBase):
+
+    def track_bytes_per_object(self, kind):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            self.add_objects(kind)
+            nbytes, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return nbytes / float(num_objects)
+
+    track_bytes_per_object.unit = 'bytes'
+
+
+class TimeCanvasObjects(CanvasBase):
+
+    def setup(self, kind):
+        super(TimeCanvasObjects, self).setup(kind)
+        self.add_objects(kind)
+
+    def time_redraw(self, kind):
+        self.viewer.redraw_now(whence=3)
@@ -0,0 +1,43 @@
+#
+# rgbmap.py -- benchmarks for color mapping
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+import logging
+
+import numpy as np
+
+from ginga import RGBMap
+
+
+class TimeRGBMap(object):
+    """Color mapping of a 4k x 4k index array, with and without the
+    fused lookup table.
+    """
+    params = ([True, False], ['RGB', 'RGBA'], ['linear', 'log'])
+    param_names = ['fused_lut', 'order', 'color_algorithm']
+
+    def setup(self, fused_lut, order, color_algorithm):
+        logger = logging.getLogger('benchmark')
+        self.rgbmap = RGBMap.RGBMapper(logger)
+        self.rgbmap.fused_lut = fused_lut
+        self.rgbmap.set_color_map('rainbow3')
+        self.rgbmap.set_hash_algorithm(color_algorithm)
+
+        hashsize = self.rgbmap.get_hash_size()
+        rs = np.random.RandomState(42)
+        self.idx = rs.randint(0, hashsize, (4096, 4096)).astype(np.uint)
+        self.out = np.empty((4096, 4096, len(order)),
+                            dtype=self.rgbmap.dtype)
+        # build the lookup table outside of the timing
+        self.rgbmap.get_rgbarray(self.idx[:1, :1], order=order)
+
+    def time_get_rgbarray(self, fused_lut, order, color_algorithm):
+        self.rgbmap.get_rgbarray(self.idx, out=self.out, order=order)
+
+    def time_get_rgbarray_after_shift(self, fused_lut, order,
+                                      color_algorithm):
+        # includes rebuilding the lookup table
+        self.rgbmap.shift(0.01)
+        self.rgbmap.get_rgbarray(self.idx, out=self.out, order=order)
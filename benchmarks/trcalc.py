@@ -0,0 +1,32 @@
+#
+# trcalc.py -- benchmarks for image transformation calculations
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+import numpy as np
+
+from ginga import trcalc
+
+
+class TimeScaledCutout(object):
+    """Downscaling a 4k x 4k image, and a 2k x 2k RGB image, with the
+    available interpolation methods.  With OpenCV installed, "area" is
+    done by ``cv2.INTER_AREA``; otherwise by NumPy area averaging.
+    """
+    params = ([(4096, 4096), (2048, 2048, 3)], [0.5, 0.3, 0.7],
+              ['basic', 'area'])
+    param_names = ['shape', 'scale', 'interpolation']
+
+    def setup(self, shape, scale, interpolation):
+        rs = np.random.RandomState(42)
+        if len(shape) > 2:
+            self.data = rs.randint(0, 256, shape).astype(np.uint8)
+        else:
+            self.data = rs.uniform(0, 1000, shape).astype(np.float32)
+
+    def time_get_scaled_cutout(self, shape, scale, interpolation):
+        ht, wd = self.data.shape[:2]
+        trcalc.get_scaled_cutout_basic(self.data, 0, 0, wd - 1, ht - 1,
+                                       scale, scale,
+                                       interpolation=interpolation)
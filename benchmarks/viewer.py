@@ -0,0 +1,175 @@
+#
+# viewer.py -- benchmarks for the viewer rendering pipeline
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Benchmarks that drive a headless (mock) viewer through common operations.
+
+Most benchmarks are parameterized by image size, data type and the
+acceleration package used by `ginga.trcalc` ("numpy" disables the
+optional packages).  Benchmarks for an acceleration package that is not
+installed are skipped.  The 16k images need several GB of memory; use
+e.g. ``asv run -b "size=1024"`` or the ``--bench`` option to select
+a subset.
+"""
+import logging
+
+import numpy as np
+
+from ginga import AstroImage, AutoCuts, ColorDist, trcalc
+from ginga.mockw.ImageViewMock import CanvasView
+
+sizes = [1024, 4096, 16384]
+dtypes = ['uint8', 'int16', 'float32', '>f8']
+accels = ['numpy', 'opencv', 'numexpr']
+
+window_size = (1920, 1080)
+
+_images = {}
+
+
+def get_data(size, dtype):
+    """Make (and cache) a synthetic image of size x size pixels."""
+    key = (size, dtype)
+    if key not in _images:
+        # a smooth gradient with some structure; cheap to generate
+        ramp = np.arange(size) % 1021
+        data = np.add.outer(ramp * 7, ramp * 13) % 4093
+        if dtype == 'uint8':
+            data = data % 256
+        _images[key] = data.astype(dtype)
+    return _images[key]
+
+
+class ViewerBase(object):
+
+    params = (sizes, dtypes, accels)
+    param_names = ['size', 'dtype', 'accel']
+    timeout = 600
+
+    def setup(self, size, dtype, accel, *args):
+        self._set_accel(accel)
+
+        self.logger = logging.getLogger('benchmark')
+        self.viewer = CanvasView(logger=self.logger)
+        # render synchronously
+        self.viewer.set_redraw_lag(0.0)
+        self.viewer.configure_window(*window_size)
+
+        self.data = get_data(size, dtype)
+        self.image = AstroImage.AstroImage(data_np=self.data,
+                                           logger=self.logger)
+        self.viewer.set_image(self.image)
+
+    def teardown(self, *args):
+        (trcalc.have_opencv, trcalc.have_numexpr) = self._accel_save
+
+    def _set_accel(self, accel):
+        self._accel_save = (trcalc.have_opencv, trcalc.have_numexpr)
+        if accel == 'numpy':
+            trcalc.have_opencv = trcalc.have_numexpr = False
+        elif accel == 'opencv':
+            if not trcalc.have_opencv:
+                raise NotImplementedError("opencv is not installed")
+            trcalc.have_numexpr = False
+        elif accel == 'numexpr':
+            if not trcalc.have_numexpr:
+                raise NotImplementedError("numexpr is not installed")
+            trcalc.have_opencv = False
+
+
+class TimeSetImage(ViewerBase):
+
+    def time_set_image(self, size, dtype, accel):
+        image = AstroImage.AstroImage(data_np=self.data, logger=self.logger)
+        self.viewer.set_image(image)
+
+
+class TimeZoom(ViewerBase):
+
+    def time_zoom_fit(self, size, dtype, accel):
+        self.viewer.zoom_fit()
+        self.viewer.redraw_now(whence=0)
+
+    def time_zoom_1(self, size, dtype, accel):
+        self.viewer.scale_to(1.0, 1.0)
+        self.viewer.redraw_now(whence=0)
+
+
+class TimePan(ViewerBase):
+
+    params = ViewerBase.params + ([False, True], )
+    param_names = ViewerBase.param_names + ['tile_render']
+
+    def setup(self, size, dtype, accel, tile_render):
+        super(TimePan, self).setup(size, dtype, accel)
+        self.viewer.settings.set(tile_render=tile_render)
+        self.viewer.scale_to(1.0, 1.0)
+        # a sweep diagonally across the image in 20 steps
+        self.positions = np.linspace(size * 0.25, size * 0.75, 20)
+
+    def time_pan_sweep(self, size, dtype, accel, tile_render):
+        for pos in self.positions:
+            self.viewer.set_pan(pos, pos)
+
+    def track_allocs_per_pan(self, size, dtype, accel, tile_render):
+        self.time_pan_sweep(size, dtype, accel, tile_render)
+        self.viewer.reset_render_stats()
+        self.time_pan_sweep(size, dtype, accel, tile_render)
+        stats = self.viewer.get_render_stats()
+        return stats['allocs'] / float(len(self.positions))
+
+    track_allocs_per_pan.unit = 'allocations'
+
+
+class TimeRotate(ViewerBase):
+
+    params = ViewerBase.params + ([30.0, 90.0], )
+    param_names = ViewerBase.param_names + ['rot_deg']
+
+    def time_rotate(self, size, dtype, accel, rot_deg):
+        self.viewer.rotate(rot_deg)
+        self.viewer.rotate(0.0)
+
+
+class TimeColorMap(ViewerBase):
+
+    def time_cmap(self, size, dtype, accel):
+        self.viewer.set_color_map('rainbow3')
+        self.viewer.set_color_map('gray')
+
+    def time_imap(self, size, dtype, accel):
+        self.viewer.set_intensity_map('neg')
+        self.viewer.set_intensity_map('ramp')
+
+    def time_cut_levels(self, size, dtype, accel):
+        self.viewer.cut_levels(10, 900)
+        self.viewer.cut_levels(20, 1000)
+
+
+class TimeAutoCuts(ViewerBase):
+
+    params = ViewerBase.params + (list(AutoCuts.autocut_methods), )
+    param_names = ViewerBase.param_names + ['method']
+
+    def setup(self, size, dtype, accel, method):
+        super(TimeAutoCuts, self).setup(size, dtype, accel)
+        self.viewer.set_autocut_params(method)
+
+    def time_auto_levels(self, size, dtype, accel, method):
+        self.viewer.auto_levels()
+
+
+class TimeColorDist(ViewerBase):
+
+    params = ViewerBase.params + (list(ColorDist.get_dist_names()), )
+    param_names = ViewerBase.param_names + ['color_algorithm']
+
+    def setup(self, size, dtype, accel, color_algorithm):
+        super(TimeColorDist, self).setup(size, dtype, accel)
+        self.viewer.set_color_algorithm(color_algorithm)
+
+    def time_redraw_cuts(self, size, dtype, accel, color_algorithm):
+        self.viewer.redraw_now(whence=1)
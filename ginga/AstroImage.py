@@ -86,6 +86,10 @@ class AstroImage(BaseImage):
         # initialize data attribute to something reasonable
         if data is None:
             data = np.zeros((0, 0))
+        elif isinstance(data, (io_fits.MemmapSection,
+                               io_fits.CompImageSection)):
+            # lazily loaded data (see load_hdu())
+            pass
         elif not isinstance(data, np.ndarray):
             data = np.zeros((0, 0))
         elif 0 in data.shape:
@@ -111,8 +115,16 @@ class AstroImage(BaseImage):
         self.set_naxispath(naxispath)
 
     def load_hdu(self, hdu, fobj=None, naxispath=None,
-                 inherit_primary_header=None):
-
+                 inherit_primary_header=None, lazy=False):
+        """Load the image from FITS HDU `hdu`.
+
+        If `lazy` is `True` and the data of the HDU can be memory mapped
+        (an uncompressed image in an uncompressed file) or read by tiles
+        (a tile compressed image), the data is only read as it is needed
+        (e.g. the parts of the image shown in a viewer), instead of all at
+        once.  This makes huge images quick to show, but operations on all
+        of the data are slower.
+        """
         if self.io is None:
             # need image loader for the fromHDU() call below
             raise ImageError("No IO loader defined")
@@ -137,7 +149,12 @@ class AstroImage(BaseImage):
 
             self.io.fromHDU(fobj[0], self._primary_hdr)
 
-        self.setup_data(hdu.data, naxispath=naxispath)
+        data = None
+        if lazy and hasattr(self.io, 'get_lazy_data'):
+            data = self.io.get_lazy_data(hdu)
+        if data is None:
+            data = hdu.data
+        self.setup_data(data, naxispath=naxispath)
 
         # Try to make a wcs object on the header
         if hasattr(self, 'wcs') and self.wcs is not None:
@@ -190,9 +207,15 @@ class AstroImage(BaseImage):
 
         self.io.load_file(filespec, dstobj=self, **kwargs)
 
-    def load_data(self, data_np, naxispath=None, metadata=None):
+    def load_data(self, data_np, naxispath=None, metadata=None, minmax=None):
+        """Load a NumPy array as the data of this image.
 
+        If given, `minmax` is the known ``(min, max, min_noinf, max_noinf)``
+        of the data (of the plane chosen by `naxispath`), which then need
+        not be calculated.
+        """
         self.clear_metadata()
+        self._known_minmax = minmax
 
         self.setup_data(data_np, naxispath=naxispath)
 
@@ -211,6 +234,16 @@ class AstroImage(BaseImage):
     def get_mddata(self):
         return self._md_data
 
+    def get_memory_usage(self):
+        nbytes = super(AstroImage, self).get_memory_usage()
+        md_data = self._md_data
+        if (isinstance(md_data, np.ndarray) and
+                isinstance(self._data, np.ndarray) and
+                md_data is not self._data):
+            # the data is a plane of a cube, which is all in memory
+            nbytes += md_data.nbytes - self._data.nbytes
+        return nbytes
+
     def set_naxispath(self, naxispath):
         """Choose a slice out of multidimensional data.
         """
@@ -219,7 +252,13 @@ class AstroImage(BaseImage):
 
         # construct slice view and extract it
         view = tuple(revnaxis + [slice(None), slice(None)])
-        data = self.get_mddata()[view]
+        data = self.get_mddata()
+        if isinstance(data, (io_fits.MemmapSection,
+                             io_fits.CompImageSection)):
+            # don't read the slice of lazily loaded data yet
+            data = data.get_plane(view)
+        else:
+            data = data[view]
 
         if len(data.shape) != 2:
             raise ImageError(
@@ -734,6 +773,7 @@ class AstroImage(BaseImage):
         # Can't use usual techniques because it adds too much time to the
         # mosacing
         #self._set_minmax()
+        self._reset_pyramid()
 
         # Notify watchers that our data has changed
         if not suppress_callback:
@@ -53,6 +53,12 @@ class AutoCutsBase(object):
     def get_algorithms(self):
         return autocut_methods
 
+    def get_cache_key(self):
+        """Get a key identifying this algorithm and its parameters."""
+        return (self.kind,) + tuple([(param.name,
+                                      getattr(self, param.name, None))
+                                     for param in self.get_params_metadata()])
+
     def get_autocut_levels(self, image):
         loval, hival = self.calc_cut_levels(image)
         return loval, hival
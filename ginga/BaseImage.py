@@ -9,6 +9,7 @@ import logging
 
 from ginga.misc import Bunch, Callback
 from ginga import trcalc, AutoCuts
+from ginga.util.pyramid import ImagePyramid
 
 
 class ImageError(Exception):
@@ -78,6 +79,10 @@ class ViewerObjectBase(Callback.Callbacks):
 
 class BaseImage(ViewerObjectBase):
 
+    # approximate number of pixels sampled for the min and max of lazily
+    # loaded data
+    lazy_sample_size = 1000000
+
     def __init__(self, data_np=None, metadata=None, logger=None, order=None,
                  name=None):
 
@@ -90,6 +95,14 @@ class BaseImage(ViewerObjectBase):
         self.order = ''
         self.name = name
 
+        # optional multi-resolution pyramid (see enable_pyramid())
+        self._pyramid = None
+        self._pyramid_params = None
+        # known (min, max, min_noinf, max_noinf) of the next data set
+        self._known_minmax = None
+        # cut levels calculated ahead of time (see calc_cut_levels())
+        self._cut_levels = {}
+
         self._set_minmax()
         self._calc_order(order)
 
@@ -97,7 +110,7 @@ class BaseImage(ViewerObjectBase):
 
     @property
     def shape(self):
-        return self._get_data().shape
+        return self._data.shape
 
     @property
     def width(self):
@@ -119,7 +132,7 @@ class BaseImage(ViewerObjectBase):
 
     @property
     def dtype(self):
-        return self._get_data().dtype
+        return self._data.dtype
 
     def get_size(self):
         return (self.width, self.height)
@@ -139,11 +152,22 @@ class BaseImage(ViewerObjectBase):
         return (ctr_x, ctr_y)
 
     def get_data(self):
-        return self._data
+        return self._get_data()
 
     def _get_data(self):
+        if not isinstance(self._data, np.ndarray):
+            # lazily loaded data (e.g. see AstroImage.load_hdu()) is read
+            # in full when all of it is needed
+            self.logger.debug("reading all of lazily loaded data")
+            self._data = np.asarray(self._data)
         return self._data
 
+    def is_lazy(self):
+        """Return `True` if the data is lazily loaded and has not been
+        read in full yet.
+        """
+        return not isinstance(self._data, np.ndarray)
+
     def _get_fast_data(self):
         """
         Return an array similar to but possibly smaller than self._data,
@@ -151,7 +175,20 @@ class BaseImage(ViewerObjectBase):
 
         NOTE: this is used by the Ginga plugin for Glue
         """
-        return self._data
+        if not self.is_lazy():
+            return self._data
+
+        if hasattr(self._data, 'get_sample'):
+            # e.g. a sample of whole tiles of a compressed image
+            return self._data.get_sample(self.lazy_sample_size)
+
+        # sample a few hundred whole rows of lazily loaded data, which
+        # is much faster to read than the same number of pixels from
+        # every row
+        ht, wd = self.shape[:2]
+        ystep = max(1, ht // 256)
+        xstep = max(1, int(wd * (ht // ystep) / self.lazy_sample_size))
+        return self._slice(np.s_[::ystep, ::xstep])
 
     def copy_data(self):
         data = self._get_data()
@@ -168,6 +205,8 @@ class BaseImage(ViewerObjectBase):
         """Use this method to SHARE (not copy) the incoming array.
         """
         if astype:
+            if not isinstance(data_np, np.ndarray):
+                data_np = np.asarray(data_np)
             data = data_np.astype(astype, copy=False)
         else:
             data = data_np
@@ -179,6 +218,8 @@ class BaseImage(ViewerObjectBase):
             self.update_metadata(metadata)
 
         self._set_minmax()
+        self._reset_pyramid()
+        self._cut_levels = {}
 
         self.make_callback('modified')
 
@@ -188,10 +229,108 @@ class BaseImage(ViewerObjectBase):
 
         # unreference data array
         self._data = np.zeros((1, 1))
+        self._reset_pyramid()
+        self._cut_levels = {}
+
+    def enable_pyramid(self, tf, max_bytes=None, min_size=256,
+                       background=True):
+        """Enable or disable a multi-resolution pyramid for this image.
+
+        When enabled, decimated copies of the data are built lazily (the
+        first time a scaled cutout is requested) and used to satisfy
+        zoomed out nearest-neighbor cutouts without touching the full
+        resolution data.
+
+        Parameters
+        ----------
+        tf : bool
+            `True` to enable the pyramid, `False` to disable it.
+
+        max_bytes : int or `None`
+            Memory budget for the decimated levels (`None` for no limit).
+
+        min_size : int
+            Smallest dimension (in pixels) of the coarsest level.
+
+        background : bool
+            If `True`, levels are built incrementally in a background
+            thread; otherwise they are built synchronously on first use.
+
+        """
+        self._reset_pyramid()
+        if tf:
+            self._pyramid_params = dict(max_bytes=max_bytes,
+                                        min_size=min_size,
+                                        background=background)
+        else:
+            self._pyramid_params = None
+
+    def get_pyramid(self):
+        """Return the multi-resolution pyramid for this image, building
+        it if necessary.  Returns `None` if the pyramid is not enabled.
+        """
+        if self._pyramid_params is None or self.is_lazy():
+            # NOTE: building a pyramid would read all of lazily loaded
+            # data
+            return None
+
+        data = self._get_data()
+        pyramid = self._pyramid
+        if pyramid is not None and pyramid.levels[0] is data:
+            return pyramid
+
+        # no pyramid yet, or data array was replaced out from under us
+        self._reset_pyramid()
+        params = self._pyramid_params
+        pyramid = ImagePyramid(data, max_bytes=params['max_bytes'],
+                               min_size=params['min_size'],
+                               logger=self.logger)
+        self._pyramid = pyramid
+        if params['background']:
+            pyramid.start()
+        else:
+            pyramid.build()
+        return pyramid
+
+    def _reset_pyramid(self):
+        pyramid, self._pyramid = self._pyramid, None
+        if pyramid is not None:
+            pyramid.cancel()
+
+    def get_memory_usage(self):
+        """Return the memory (in bytes) used by the data of the image,
+        including data derived from it (e.g. a pyramid).
+        """
+        data = self._data
+        if isinstance(data, np.ndarray):
+            nbytes = data.nbytes
+        elif hasattr(data, 'get_cache_size'):
+            # e.g. decompressed tiles of lazily loaded data
+            nbytes = data.get_cache_size()
+        else:
+            nbytes = 0
+
+        pyramid = self._pyramid
+        if pyramid is not None:
+            nbytes += pyramid.nbytes
+        return nbytes
+
+    def _get_cutout_data(self, x1, y1, x2, y2):
+        """Return an array with the data for a cutout with corners
+        (x1, y1) and (x2, y2), and the corners relative to that array.
+        Only the region of the cutout is read from lazily loaded data.
+        """
+        if not self.is_lazy():
+            return self._get_data(), (x1, y1, x2, y2)
+
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        data = self._slice(np.s_[y1:y2 + 1, x1:x2 + 1])
+        return data, (0, 0, x2 - x1, y2 - y1)
 
     def _slice(self, view):
         view = tuple(view)
-        return self._get_data()[view]
+        # NOTE: only reads the part of lazily loaded data in the view
+        return self._data[view]
 
     def get_slice(self, c):
         view = [slice(None)] * self.ndim
@@ -245,6 +384,13 @@ class BaseImage(ViewerObjectBase):
         return hasattr(self, 'wcs') and self.wcs.has_valid_wcs()
 
     def _set_minmax(self):
+        if self._known_minmax is not None:
+            # e.g. saved with the image in a disk cache (see ginga.util.spill)
+            (self.minval, self.maxval, self.minval_noinf,
+             self.maxval_noinf) = self._known_minmax
+            self._known_minmax = None
+            return
+
         data = self._get_fast_data()
         try:
             self.maxval = np.nanmax(data)
@@ -270,6 +416,36 @@ class BaseImage(ViewerObjectBase):
         except Exception:
             self.minval_noinf = self.minval
 
+    def calc_cut_levels(self, autocuts, keep=False):
+        """Calculate the cut levels of this image.
+
+        Parameters
+        ----------
+        autocuts : subclass of `~ginga.AutoCuts.AutoCutsBase`
+            Algorithm to calculate the cut levels.
+
+        keep : bool
+            If `True`, keep the cut levels for the next call with the same
+            algorithm and parameters (e.g. when they are calculated ahead
+            of time for an image preloaded in the background).
+
+        Returns
+        -------
+        cuts : tuple
+            Low and high values, in that order.
+
+        """
+        key = autocuts.get_cache_key()
+        if not keep:
+            cuts = self._cut_levels.pop(key, None)
+            if cuts is not None:
+                return cuts
+
+        cuts = autocuts.calc_cut_levels(self)
+        if keep:
+            self._cut_levels[key] = cuts
+        return cuts
+
     def get_minmax(self, noinf=False):
         if not noinf:
             return (self.minval, self.maxval)
@@ -416,7 +592,8 @@ class BaseImage(ViewerObjectBase):
             newdata = self._slice(view)
 
         else:
-            data_np = self._get_data()
+            data_np, (x1, y1, x2, y2) = self._get_cutout_data(x1, y1,
+                                                              x2, y2)
             (newdata, (scale_x, scale_y)) = \
                 trcalc.get_scaled_cutout_wdht(data_np, x1, y1, x2, y2,
                                               new_wd, new_ht,
@@ -451,7 +628,7 @@ class BaseImage(ViewerObjectBase):
             return self.get_scaled_cutout_basic(x1, y1, x2, y2,
                                                 scale_x, scale_y)
 
-        data = self._get_data()
+        data, (x1, y1, x2, y2) = self._get_cutout_data(x1, y1, x2, y2)
         newdata, (scale_x, scale_y) = trcalc.get_scaled_cutout_basic(
             data, x1, y1, x2, y2, scale_x, scale_y, interpolation=method)
 
@@ -467,6 +644,14 @@ class BaseImage(ViewerObjectBase):
                                           scales[0], scales[1],
                                           method=method)
 
+        if len(scales) == 2:
+            pyramid = self.get_pyramid()
+            if pyramid is not None:
+                level, data = pyramid.get_level(*scales)
+                if level > 0:
+                    return self._get_scaled_cutout_level(level, data,
+                                                         p1, p2, scales)
+
         shp = self.shape
 
         view, scales = trcalc.get_scaled_cutout_basic_view(
@@ -481,6 +666,40 @@ class BaseImage(ViewerObjectBase):
 
         return res
 
+    def get_scaled_tile(self, p1, p2, scales):
+        """Extract a region of the image scaled by `scales` (nearest
+        neighbor).  The region is defined by corners `p1` (u1, v1) and
+        `p2` (u2, v2) (exclusive) in the pixel coordinates of the *scaled*
+        image, so adjacent regions can be assembled without seams.
+        """
+        pyramid = self.get_pyramid()
+        if pyramid is not None:
+            level, data_np = pyramid.get_level(*scales)
+            factor = 2 ** level
+            scales = (scales[0] * factor, scales[1] * factor)
+            view = trcalc.get_scaled_tile_view(data_np.shape, p1, p2, scales)
+            return data_np[view]
+
+        view = trcalc.get_scaled_tile_view(self.shape, p1, p2, scales)
+        return self._slice(view)
+
+    def _get_scaled_cutout_level(self, level, data_np, p1, p2, scales):
+        # nearest-neighbor cutout from a decimated pyramid level
+        factor = 2 ** level
+        ht, wd = data_np.shape[:2]
+        x1, y1 = min(p1[0] // factor, wd - 1), min(p1[1] // factor, ht - 1)
+        x2, y2 = min(p2[0] // factor, wd - 1), min(p2[1] // factor, ht - 1)
+        scale_x, scale_y = scales[0] * factor, scales[1] * factor
+
+        view, (scale_x, scale_y) = trcalc.get_scaled_cutout_basic_view(
+            data_np.shape, (x1, y1), (x2, y2), (scale_x, scale_y))
+        newdata = data_np[view]
+
+        # report scales relative to the full resolution data
+        res = Bunch.Bunch(data=newdata, scale_x=scale_x / factor,
+                          scale_y=scale_y / factor)
+        return res
+
     def get_thumbnail(self, length):
         wd, ht = self.get_size()
         if ht == 0:
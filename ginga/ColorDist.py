@@ -20,6 +20,10 @@ class ColorDistError(Exception):
 
 class ColorDistBase(object):
 
+    # True if the hash table depends on the data being mapped (i.e. it
+    # cannot be precomputed independently of the data)
+    data_dependent = False
+
     def __init__(self, hashsize, colorlen=None):
         super(ColorDistBase, self).__init__()
 
@@ -268,6 +272,7 @@ class HistogramEqualizationDist(ColorDistBase):
     The histogram equalization distribution function distributes colors
     based on the frequency of each data value.
     """
+    data_dependent = True
 
     def __init__(self, hashsize, colorlen=None):
         super(HistogramEqualizationDist, self).__init__(hashsize,
@@ -11,19 +11,23 @@ from io import BytesIO
 import math
 import logging
 import threading
+import concurrent.futures
 import sys
 import traceback
 import time
+from contextlib import contextmanager
 
 import numpy as np
 
-from ginga.misc import Callback, Settings
+from ginga.misc import Bunch, Callback, Settings
 from ginga import BaseImage, AstroImage
 from ginga import RGBMap, AutoCuts, ColorDist, zoom
 from ginga import colors, trcalc
 from ginga.canvas import coordmap, transform
 from ginga.canvas.types.layer import DrawingCanvas
 from ginga.util import rgb_cms, addons
+from ginga.util.bufpool import BufferPool
+from ginga.util.renderstats import RenderStats
 
 __all__ = ['ImageViewBase']
 
@@ -40,6 +44,10 @@ class ImageViewNoDataError(ImageViewError):
     pass
 
 
+class ImageViewRenderCancelled(ImageViewError):
+    pass
+
+
 class ImageViewBase(Callback.Callbacks):
     """An abstract base class for displaying images represented by
     Numpy data arrays.
@@ -168,6 +176,32 @@ class ImageViewBase(Callback.Callbacks):
                              limits=None, enter_focus=None)
         self.t_.get_setting('limits').add_callback('set', self._set_limits_cb)
 
+        # rendering optimizations: tiled rendering of the image for
+        # fast panning, direct color mapping of integer data, parallel
+        # rendering in row bands
+        self.t_.add_defaults(tile_render=False, tile_size=256,
+                             tile_cache_size=400, int_lut=True,
+                             render_threads=1)
+        for name in ('tile_render', 'tile_size', 'int_lut'):
+            self.t_.get_setting(name).add_callback('set',
+                                                   self.render_opt_change_cb)
+        self.t_.get_setting('render_threads').add_callback(
+            'set', self.render_threads_change_cb)
+
+        # progressive rendering: quick drafts during bursts of pan/zoom
+        # changes, refined at full quality when they stop
+        self.t_.add_defaults(progressive_render=False,
+                             progressive_idle_ms=200,
+                             progressive_decimate=2,
+                             progressive_interpolation='basic')
+        self.t_.get_setting('progressive_render').add_callback(
+            'set', self.progressive_change_cb)
+
+        # asynchronous rendering on a worker thread
+        self.t_.add_defaults(async_render=False)
+        self.t_.get_setting('async_render').add_callback(
+            'set', self.async_render_change_cb)
+
         # embedded image "profiles"
         self.t_.add_defaults(profile_use_scale=False, profile_use_pan=False,
                              profile_use_cuts=False,
@@ -222,6 +256,9 @@ class ImageViewBase(Callback.Callbacks):
         # offset from pan position (at center) in this array
         self._org_xoff = 0
         self._org_yoff = 0
+        # incremented whenever the mapping between data and window
+        # coordinates changes (see get_transform_version())
+        self._tform_version = 0
 
         # viewer window backend has its canvas origin (0, 0) in upper left
         self.origin_upper = True
@@ -251,6 +288,15 @@ class ImageViewBase(Callback.Callbacks):
         self._rgbarr = None
         self._rgbarr2 = None
         self._rgbobj = None
+        # geometry of the last frame rendered (see _calc_render_state())
+        self._render_state = None
+        # scratch buffers reused from one frame to the next
+        self.scratch = BufferPool(logger=self.logger)
+        # per-stage render statistics (see get_render_stats())
+        self.render_stats = RenderStats(bufpool=self.scratch)
+        # thread pool for parallel rendering (see get_render_pool())
+        self._render_pool = None
+        self._render_pool_lock = threading.RLock()
 
         # optimization of redrawing
         self.defer_redraw = self.t_.get('defer_redraw', True)
@@ -327,7 +373,8 @@ class ImageViewBase(Callback.Callbacks):
 
         # For callbacks
         for name in ('transform', 'image-set', 'image-unset', 'configure',
-                     'redraw', 'limits-set', 'cursor-changed'):
+                     'redraw', 'limits-set', 'cursor-changed',
+                     'render-stats'):
             self.enable_callback(name)
 
         # for timed refresh
@@ -346,10 +393,40 @@ class ImageViewBase(Callback.Callbacks):
         self.rf_early_total = 0.0
         self.rf_early_count = 0
         self.rf_skip_total = 0.0
+        self.rf_skip_count = 0
+        self.rf_drop_count = 0
+        # lowest whence of the redraws requested since the last tick
+        self.rf_whence = self._defer_whence_reset
+        self.rf_active = False
         if self.rf_timer is not None:
             self.rf_timer.add_callback('expired', self.refresh_timer_cb,
                                        self.rf_flags)
 
+        # for asynchronous rendering
+        self._displayed = None
+        self._async_pool = None
+        self._async_future = None
+        self._async_req_whence = 0
+        self._async_whence = None
+        self._async_cancel = threading.Event()
+        # geometry of the frame being rendered on the worker thread
+        self._async_local = threading.local()
+        self._async_lock = threading.RLock()
+        self._async_index = 0
+        self._async_poll_sec = 0.005
+        self._async_max_stale_sec = 0.25
+        self._time_last_frame = 0.0
+        self._async_timer = self.make_timer()
+        if self._async_timer is not None:
+            self._async_timer.add_callback('expired', self._async_poll_cb)
+
+        # for progressive rendering
+        self._draft = False
+        self._time_last_interaction = 0.0
+        self._refine_timer = self.make_timer()
+        if self._refine_timer is not None:
+            self._refine_timer.add_callback('expired', self._refine_cb)
+
     def set_window_size(self, width, height):
         """Report the size of the window to display the image.
 
@@ -378,6 +455,7 @@ class ImageViewBase(Callback.Callbacks):
         self._imgwin_ht = int(height)
         self._ctr_x = width // 2
         self._ctr_y = height // 2
+        self._tform_version += 1
         self.logger.debug("widget resized to %dx%d" % (width, height))
 
         self.make_callback('configure', width, height)
@@ -791,6 +869,8 @@ class ImageViewBase(Callback.Callbacks):
             #self.canvas.update_canvas(whence=0)
 
     def _image_set_cb(self, canvas_img, image):
+        # WCS coordinates map differently with a new image
+        self._tform_version += 1
         try:
             self.apply_profile_or_settings(image)
 
@@ -880,6 +960,29 @@ class ImageViewBase(Callback.Callbacks):
 
             self.redraw(whence=0)
 
+    @contextmanager
+    def transaction(self):
+        """Context manager for changing several viewer settings at once.
+
+        Callbacks for the changed settings are deferred until the end of
+        the ``with`` block, with one callback per changed setting (see
+        :meth:`~ginga.misc.Settings.SettingGroup.transaction`), and then
+        the viewer is redrawn once, as much as needed for all the
+        changes.
+
+        Example::
+
+            with viewer.transaction():
+                viewer.set_pan(100.0, 200.0)
+                viewer.scale_to(2.0, 2.0)
+                viewer.rotate(45.0)
+                viewer.cut_levels(0.0, 1000.0)
+
+        """
+        with self.suppress_redraw:
+            with self.t_.transaction():
+                yield self
+
     def apply_profile(self, profile, keylist=None):
         """Apply a profile to the viewer.
 
@@ -892,10 +995,9 @@ class ImageViewBase(Callback.Callbacks):
         from the profile to viewer settings, otherwise all items are
         copied.
         """
-        with self.suppress_redraw:
+        with self.transaction():
             profile.copy_settings(self.t_, keylist=keylist,
                                   callback=True)
-            self.redraw(whence=0)
 
     def capture_profile(self, profile):
         self.t_.copy_settings(profile)
@@ -1034,6 +1136,12 @@ class ImageViewBase(Callback.Callbacks):
         with self._defer_lock:
             whence = min(self._defer_whence, whence)
 
+            if self.rf_active:
+                # timed refresh: the next tick redraws as much as needed
+                self.rf_whence = min(self.rf_whence, whence)
+                self._defer_whence = self._defer_whence_reset
+                return
+
             if not self.defer_redraw:
                 if self._hold_redraw_cnt == 0:
                     self._defer_whence = self._defer_whence_reset
@@ -1149,6 +1257,14 @@ class ImageViewBase(Callback.Callbacks):
 
     def start_refresh(self):
         """Start redrawing the canvas at the previously set timed interval.
+
+        While the timed refresh is running, calls to :meth:`redraw` only
+        record what needs to be redrawn, which is then done at the next
+        tick of the refresh interval.  Ticks at which nothing needs to be
+        redrawn are skipped.  If you modify the data of the image being
+        shown in place, call ``redraw(whence=0)`` to have the change
+        shown (this may be done from any thread while the timed refresh
+        is running).
         """
         self.logger.debug("starting timed refresh interval")
         self.rf_flags['done'] = False
@@ -1160,6 +1276,12 @@ class ImageViewBase(Callback.Callbacks):
         self.rf_early_total = 0.0
         self.rf_delta_total = 0.0
         self.rf_skip_total = 0.0
+        self.rf_skip_count = 0
+        self.rf_drop_count = 0
+        with self._defer_lock:
+            # draw everything at the first tick
+            self.rf_whence = 0
+            self.rf_active = True
         self.rf_start_time = time.time()
         self.rf_deadline = self.rf_start_time
         self.refresh_timer_cb(self.rf_timer, self.rf_flags)
@@ -1170,14 +1292,29 @@ class ImageViewBase(Callback.Callbacks):
         self.logger.debug("stopping timed refresh")
         self.rf_flags['done'] = True
         self.rf_timer.clear()
+        with self._defer_lock:
+            self.rf_active = False
+            whence, self.rf_whence = self.rf_whence, self._defer_whence_reset
+        if whence < self._defer_whence_reset:
+            # draw any changes made since the last tick
+            self.redraw(whence=whence)
 
     def get_refresh_stats(self):
         """Return the measured statistics for timed refresh intervals.
 
         Returns
         -------
-        stats : float
-            The measured rate of actual back end updates in frames per second.
+        stats : dict
+            ``fps`` is the measured rate of actual back end updates in
+            frames per second.  ``jitter`` is the mean deviation of the
+            ticks from their deadlines (sec); ``early_avg``, ``late_avg``
+            (sec) and ``early_pct``, ``late_pct`` describe the ticks that
+            were early or late, and ``balance`` is the net lateness.
+            ``skipped`` is the number of ticks at which nothing had
+            changed, so nothing was redrawn, and ``dropped`` the number of
+            ticks at which a redraw was dropped to catch up after falling
+            behind; ``skipped_pct`` and ``dropped_pct`` are the same as
+            percentages of all ticks.
 
         """
         if self.rf_draw_count == 0:
@@ -1196,12 +1333,51 @@ class ImageViewBase(Callback.Callbacks):
 
         balance = self.rf_late_total - self.rf_early_total
 
+        num_ticks = max(1.0, float(self.rf_timer_count))
         stats = dict(fps=fps, jitter=jitter,
                      early_avg=early_avg, early_pct=early_pct,
                      late_avg=late_avg, late_pct=late_pct,
-                     balance=balance)
+                     balance=balance,
+                     skipped=self.rf_skip_count,
+                     skipped_pct=self.rf_skip_count / num_ticks * 100,
+                     dropped=self.rf_drop_count,
+                     dropped_pct=self.rf_drop_count / num_ticks * 100)
         return stats
 
+    def get_render_stats(self):
+        """Return statistics about rendering.
+
+        Returns
+        -------
+        stats : dict
+            ``allocs`` and ``alloc_bytes`` are the number and total size
+            of arrays allocated while rendering, ``reuses`` is the number
+            of times a scratch buffer was reused instead, and
+            ``pool_bytes`` is the size of the scratch buffers held.
+
+            ``stages`` maps the name of each stage of the render pipeline
+            to rolling statistics for it (see
+            :meth:`ginga.util.renderstats.RenderStats.get_stats`).  The
+            stages are: "backing" (backing image), "cutout", "cut_levels",
+            "rgb_map" (color mapping), "tiles" (tiled rendering of cutout,
+            cut levels and color mapping), "composite" (compositing images
+            into the backing image), "icc" (ICC profile conversion),
+            "transform" (flips, swaps and rotation) and "blit" (rendering
+            to the back end).
+
+            ``frames`` is the number of frames rendered.
+
+        """
+        stats = self.scratch.get_stats()
+        stats['stages'] = self.render_stats.get_stats()
+        stats['frames'] = self.render_stats.num_frames
+        return stats
+
+    def reset_render_stats(self):
+        """Reset the statistics returned by :meth:`get_render_stats`."""
+        self.scratch.reset_stats()
+        self.render_stats.reset()
+
     def refresh_timer_cb(self, timer, flags):
         """Refresh timer callback.
         This callback will normally only be called internally.
@@ -1237,13 +1413,13 @@ class ImageViewBase(Callback.Callbacks):
             adjust = - (late_avg / 2.0)
             self.rf_skip_total += delta
             if self.rf_skip_total < self.rf_rate:
-                self.rf_draw_count += 1
-                # TODO: can we optimize whence?
-                self.redraw_now(whence=0)
+                self._refresh_redraw()
             else:
                 # <-- we are behind by amount of time equal to one frame.
                 # skip a redraw and attempt to catch up some time
+                # (changes are kept for the next tick)
                 self.rf_skip_total = 0
+                self.rf_drop_count += 1
         else:
             if start_time < deadline:
                 # we are early
@@ -1253,13 +1429,24 @@ class ImageViewBase(Callback.Callbacks):
                 early_avg = self.rf_early_total / self.rf_early_count
                 adjust = early_avg / 4.0
 
-            self.rf_draw_count += 1
-            # TODO: can we optimize whence?
-            self.redraw_now(whence=0)
+            self._refresh_redraw()
 
         delay = max(0.0, self.rf_deadline - time.time() + adjust)
         timer.start(delay)
 
+    def _refresh_redraw(self):
+        # redraw only as much as has changed since the last tick
+        with self._defer_lock:
+            whence, self.rf_whence = self.rf_whence, self._defer_whence_reset
+
+        if whence >= self._defer_whence_reset:
+            # nothing changed
+            self.rf_skip_count += 1
+            return
+
+        self.rf_draw_count += 1
+        self.redraw_now(whence=whence)
+
     def redraw_now(self, whence=0):
         """Redraw the displayed image.
 
@@ -1269,6 +1456,12 @@ class ImageViewBase(Callback.Callbacks):
             See :meth:`get_rgb_object`.
 
         """
+        if self._use_async_render() and (whence <= 2.5 or
+                                         self._displayed is None):
+            # render on the worker thread; the result is shown later
+            self._request_render(whence)
+            return
+
         try:
             time_start = time.time()
             self.redraw_data(whence=whence)
@@ -1313,8 +1506,15 @@ class ImageViewBase(Callback.Callbacks):
             return
 
         if not self._self_scaling:
-            rgbobj = self.get_rgb_object(whence=whence)
-            self.renderer.render_image(rgbobj, self._dst_x, self._dst_y)
+            if (whence > 2.5 and self._displayed is not None and
+                    self._use_async_render()):
+                # don't wait for (or interfere with) a render in progress
+                # on the worker thread: redraw the frame being shown
+                rgbobj, dst_x, dst_y = self._displayed
+            else:
+                rgbobj = self.get_rgb_object(whence=whence)
+                dst_x, dst_y = self._dst_x, self._dst_y
+            self._blit(rgbobj, dst_x, dst_y)
 
         self.private_canvas.draw(self)
 
@@ -1323,6 +1523,170 @@ class ImageViewBase(Callback.Callbacks):
         if whence < 2:
             self.check_cursor_location()
 
+    def _blit(self, rgbobj, dst_x, dst_y):
+        self._displayed = (rgbobj, dst_x, dst_y)
+        arr = rgbobj.rgbarr
+        with self.render_stats.stage('blit',
+                                     pixels=arr.shape[0] * arr.shape[1]):
+            self.renderer.render_image(rgbobj, dst_x, dst_y)
+
+        self.make_callback('render-stats', self.render_stats.get_frame())
+
+    def _use_async_render(self):
+        return (self.t_.get('async_render', False) and
+                self._async_timer is not None and self._imgwin_set and
+                not self._self_scaling)
+
+    def async_render_change_cb(self, setting, value):
+        """Handle callback related to turning asynchronous rendering
+        on or off."""
+        if value:
+            return
+        # finish with any render in progress before rendering on the
+        # GUI thread again
+        with self._async_lock:
+            future, self._async_future = self._async_future, None
+            self._async_whence = None
+        if future is not None:
+            self._async_cancel.set()
+            try:
+                future.result()
+            except Exception:
+                pass
+            self._async_cancel.clear()
+            self.redraw(whence=0)
+
+    def _request_render(self, whence):
+        with self._async_lock:
+            if self._async_future is None:
+                self._start_render(whence)
+                return
+
+            # supersede the render in progress
+            if self._async_whence is None:
+                self._async_whence = whence
+            else:
+                self._async_whence = min(self._async_whence, whence)
+            self._async_cancel.set()
+
+    def _get_async_state(self):
+        # geometry of the frame being rendered, on the worker thread
+        return getattr(self._async_local, 'state', None)
+
+    def _start_render(self, whence):
+        # GUI thread: the worker renders with the geometry as it is now,
+        # and the viewer takes it on when the frame is shown
+        try:
+            state = self._make_render_state()
+
+        except Exception as e:
+            self.logger.error("Error rendering image: %s" % (str(e)))
+            return
+
+        self._async_cancel.clear()
+        self._async_req_whence = whence
+        if self._async_pool is None:
+            self._async_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1)
+        self._async_future = self._async_pool.submit(self._render_async,
+                                                     whence, state)
+        self._async_timer.set(self._async_poll_sec)
+
+    def _render_async(self, whence, state):
+        # worker thread: run the data side of the render pipeline
+        self._async_local.state = state
+        try:
+            rgbobj = self.get_rgb_object(whence=whence)
+        finally:
+            self._async_local.state = None
+
+        # copy the result into one of two buffers that alternate, so
+        # that the next render cannot overwrite the frame being shown
+        arr = rgbobj.rgbarr
+        self._async_index = 1 - self._async_index
+        buf = self.scratch.get_buffer('async%d' % self._async_index,
+                                      arr.shape, arr.dtype)
+        np.copyto(buf, arr)
+        return (RGBMap.RGBPlanes(buf, rgbobj.order), state)
+
+    def _async_poll_cb(self, timer):
+        # GUI thread: check on the render in progress
+        with self._async_lock:
+            future = self._async_future
+            if future is None:
+                return
+            if not future.done():
+                timer.set(self._async_poll_sec)
+                return
+
+            self._async_future = None
+            whence = self._async_req_whence
+            pending, self._async_whence = self._async_whence, None
+
+            try:
+                res = future.result()
+
+            except ImageViewRenderCancelled:
+                res = None
+
+            except Exception as e:
+                res = None
+                if pending is None:
+                    self.logger.error("Error rendering image: %s" % (str(e)))
+                else:
+                    # probably due to a change made while rendering
+                    self.logger.debug("Error rendering image: %s" % (str(e)))
+
+        # show the finished frame first, so that its overlays are drawn
+        # with the geometry it was rendered with
+        if res is not None:
+            self._show_frame(res, whence)
+
+        if pending is not None:
+            # the viewer changed while rendering--render again,
+            # redoing at least as much as the superseded render
+            self._request_render(min(whence, pending))
+
+    def _show_frame(self, res, whence):
+        time_start = time.time()
+        self._time_last_frame = time_start
+        rgbobj, state = res
+        # overlays, cursor readouts, etc. use the geometry of this frame
+        self._set_render_state(state)
+        self._dst_x, self._dst_y = state.dst_x, state.dst_y
+        self._blit(rgbobj, state.dst_x, state.dst_y)
+
+        self.private_canvas.draw(self)
+        self.make_callback('redraw', whence)
+        if whence < 2:
+            self.check_cursor_location()
+
+        self.update_image()
+        self.time_last_redraw = time.time()
+        self.logger.debug("widget '%s' async redraw (whence=%d) "
+                          "elapsed=%.4f sec" % (
+                              self.name, whence,
+                              self.time_last_redraw - time_start))
+
+    def check_render_cancel(self):
+        """Check whether the render in progress has been superseded by a
+        newer redraw request.  Called between the stages of the render
+        pipeline.
+
+        Raises
+        ------
+        ImageViewRenderCancelled
+            If the render should be abandoned.  A render is not abandoned
+            if no frame has been shown for a while, so that there is
+            feedback during continuous changes.  Only asynchronous renders
+            (on the worker thread) are abandoned.
+
+        """
+        if (self._get_async_state() is not None and
+                self._async_cancel.is_set() and
+                time.time() - self._time_last_frame < self._async_max_stale_sec):
+            raise ImageViewRenderCancelled("render superseded")
+
     def check_cursor_location(self):
         """Check whether the data location of the last known position
         of the cursor has changed.  If so, issue a callback.
@@ -1373,7 +1737,12 @@ class ImageViewBase(Callback.Callbacks):
             dtype = rgbmap.dtype
 
         # Prepare data array for rendering
-        data = self._rgbobj.get_array(order, dtype=dtype)
+        if self._displayed is not None and self._use_async_render():
+            # the frame shown may be older than the last one rendered
+            rgbobj, dst_x, dst_y = self._displayed
+        else:
+            rgbobj, dst_x, dst_y = self._rgbobj, self._dst_x, self._dst_y
+        data = rgbobj.get_array(order, dtype=dtype)
 
         # NOTE [A]
         height, width, depth = data.shape
@@ -1386,7 +1755,7 @@ class ImageViewBase(Callback.Callbacks):
                                           dtype, order, r, g, b, alpha)
 
         # overlay our data
-        trcalc.overlay_image(outarr, (self._dst_x, self._dst_y),
+        trcalc.overlay_image(outarr, (dst_x, dst_y),
                              data, dst_order=order, src_order=order,
                              flipy=False, fill=False, copy=False)
 
@@ -1504,29 +1873,45 @@ class ImageViewBase(Callback.Callbacks):
         time_start = t2 = t3 = time.time()
         win_wd, win_ht = self.get_window_size()
         order = self.get_rgb_order()
+        stats = self.render_stats
+        stats.start_frame(whence)
+
+        # geometry of the frame, if rendering on the worker thread
+        state = self._get_async_state()
 
         if (whence <= 0.0) or (self._rgbarr is None):
-            # calculate dimensions of window RGB backing image
-            pan_x, pan_y = self.get_pan(coord='data')[:2]
-            scale_x, scale_y = self.get_scale_xy()
-            wd, ht = self._calc_bg_dimensions(scale_x, scale_y,
-                                              pan_x, pan_y,
-                                              win_wd, win_ht)
-
-            # create backing image
-            depth = len(order)
-            rgbmap = self.get_rgbmap()
-            # make backing image with the background color
-            r, g, b = self.img_bg
-            rgba = trcalc.make_filled_array((ht, wd, depth), rgbmap.dtype,
-                                            order, r, g, b, 1.0)
+            with stats.stage('backing') as st:
+                # calculate dimensions of window RGB backing image
+                if state is None:
+                    pan_x, pan_y = self.get_pan(coord='data')[:2]
+                    scale_x, scale_y = self.get_scale_xy()
+                    wd, ht = self._calc_bg_dimensions(scale_x, scale_y,
+                                                      pan_x, pan_y,
+                                                      win_wd, win_ht)
+                else:
+                    wd, ht = state.wd, state.ht
+
+                # create backing image
+                depth = len(order)
+                rgbmap = self.get_rgbmap()
+                # make backing image with the background color
+                r, g, b = self.img_bg
+                rgba = self.scratch.get_buffer('backing', (ht, wd, depth),
+                                               rgbmap.dtype)
+                trcalc.fill_array(rgba, order, r, g, b, 1.0)
+                st.pixels = wd * ht
 
             self._rgbarr = rgba
             t2 = time.time()
 
+        self.check_render_cancel()
+
         if (whence <= 2.0) or (self._rgbarr2 is None):
             # Apply any RGB image overlays
-            self._rgbarr2 = np.copy(self._rgbarr)
+            self._rgbarr2 = self.scratch.get_buffer('overlay',
+                                                    self._rgbarr.shape,
+                                                    self._rgbarr.dtype)
+            np.copyto(self._rgbarr2, self._rgbarr)
             self.overlay_images(self.private_canvas, self._rgbarr2,
                                 whence=whence)
 
@@ -1534,18 +1919,27 @@ class ImageViewBase(Callback.Callbacks):
             output_profile = self.t_.get('icc_output_profile', None)
             working_profile = rgb_cms.working_profile
             if (working_profile is not None) and (output_profile is not None):
-                self.convert_via_profile(self._rgbarr2, order,
-                                         working_profile, output_profile)
+                with stats.stage('icc', pixels=self._rgbarr2.size // len(order)):
+                    self.convert_via_profile(self._rgbarr2, order,
+                                             working_profile, output_profile)
             t3 = time.time()
 
+        self.check_render_cancel()
+
         if (whence <= 2.5) or (self._rgbobj is None):
             rotimg = self._rgbarr2
 
-            # Apply any viewing transformations or rotations
-            # if not applied earlier
-            rotimg = self.apply_transforms(rotimg,
-                                           self.t_['rot_deg'])
-            rotimg = np.ascontiguousarray(rotimg)
+            with stats.stage('transform', pixels=rotimg.size // len(order)):
+                # Apply any viewing transformations or rotations
+                # if not applied earlier
+                if state is None:
+                    state = self._render_state
+                rotimg = self.apply_transforms(rotimg, state.rot_deg)
+                if not rotimg.flags.c_contiguous:
+                    out = self.scratch.get_buffer('output', rotimg.shape,
+                                                  rotimg.dtype)
+                    np.copyto(out, rotimg)
+                    rotimg = out
 
             self._rgbobj = RGBMap.RGBPlanes(rotimg, order)
 
@@ -1558,9 +1952,10 @@ class ImageViewBase(Callback.Callbacks):
 
         return self._rgbobj
 
-    def _calc_bg_dimensions(self, scale_x, scale_y,
-                            pan_x, pan_y, win_wd, win_ht):
-        """
+    def _calc_render_state(self, scale_x, scale_y,
+                           pan_x, pan_y, win_wd, win_ht):
+        """Calculate the geometry of a frame, without changing the viewer.
+
         Parameters
         ----------
         scale_x, scale_y : float
@@ -1571,6 +1966,13 @@ class ImageViewBase(Callback.Callbacks):
 
         win_wd, win_ht : int
             window dimensions in pixels
+
+        Returns
+        -------
+        state : `~ginga.misc.Bunch.Bunch`
+            Pan position, scale, orientation, reference point and
+            dimensions of the backing image of the frame.
+
         """
 
         # Sanity check on the scale
@@ -1580,17 +1982,29 @@ class ImageViewBase(Callback.Callbacks):
             #self.logger.warning("new scale would exceed max/min; scale unchanged")
             raise ImageViewError("new scale would exceed pixel max; scale unchanged")
 
-        # It is necessary to store these so that the get_pan_rect()
-        # (below) calculation can proceed
-        self._org_x, self._org_y = pan_x - self.data_off, pan_y - self.data_off
-        self._org_scale_x, self._org_scale_y = scale_x, scale_y
-        self._org_scale_z = (scale_x + scale_y) / 2.0
+        t_ = self.t_
+        state = Bunch.Bunch(pan=(pan_x, pan_y), scale=(scale_x, scale_y),
+                            rot_deg=t_['rot_deg'], flip_x=t_['flip_x'],
+                            flip_y=t_['flip_y'], swap_xy=t_['swap_xy'],
+                            ctr=(self._ctr_x, self._ctr_y),
+                            org_x=pan_x - self.data_off,
+                            org_y=pan_y - self.data_off,
+                            org_scale_x=scale_x, org_scale_y=scale_y,
+                            org_scale_z=(scale_x + scale_y) / 2.0)
 
         # calc minimum size of pixel image we will generate
         # necessary to fit the window in the desired size
 
-        # get the data points in the four corners
-        a, b = trcalc.get_bounds(self.get_pan_rect())
+        # get the data points in the four corners (as get_pan_rect(), but
+        # with the reference point and scale of this frame)
+        win_pts = np.asarray([(0, 0), (win_wd, 0), (win_wd, win_ht),
+                              (0, win_ht)])
+        off_pts = self.tform['cartesian_to_window'].from_(win_pts)
+        off_pts = self.trcat.RotationTransform(self).from_(off_pts)
+        off_pts = np.multiply(off_pts, [1.0 / scale_x, 1.0 / scale_y])
+        arr_pts = np.add(off_pts, [state.org_x, state.org_y]) + self.data_off
+        state.pan_rect = arr_pts
+        a, b = trcalc.get_bounds(arr_pts)
 
         # determine bounding box
         a1, b1 = a[:2]
@@ -1604,26 +2018,73 @@ class ImageViewBase(Callback.Callbacks):
         self.logger.debug("approx area covered is %dx%d to %dx%d" % (
             x1, y1, x2, y2))
 
-        self._org_x1 = x1
-        self._org_y1 = y1
-        self._org_x2 = x2
-        self._org_y2 = y2
-
-        # Make a square from the scaled cutout, with room to rotate
-        slop = 20
-        side = int(math.sqrt(win_wd**2 + win_ht**2) + slop)
-        wd = ht = side
+        state.org_x1, state.org_y1 = x1, y1
+        state.org_x2, state.org_y2 = x2, y2
+
+        rot_deg = state.rot_deg
+        if math.fmod(rot_deg, 90.0) == 0.0:
+            # no rotation, or rotation by a multiple of 90 deg: make the
+            # backing image the size of the window, in the orientation
+            # of the data
+            slop = 4
+            wd, ht = win_wd + slop, win_ht + slop
+            num_rot90 = int(round(-rot_deg / 90.0)) % 4
+            if state.swap_xy != (num_rot90 % 2 == 1):
+                wd, ht = ht, wd
+        else:
+            # Make a square from the scaled cutout, with room to rotate
+            slop = 20
+            side = int(math.sqrt(win_wd**2 + win_ht**2) + slop)
+            wd = ht = side
+        state.wd, state.ht = wd, ht
 
         # Find center of new array
-        ncx, ncy = wd // 2, ht // 2
-        self._org_xoff, self._org_yoff = ncx, ncy
+        state.org_xoff, state.org_yoff = wd // 2, ht // 2
+
+        return state
+
+    def _set_render_state(self, state):
+        """Make `state` (see _calc_render_state()) the geometry of the
+        viewer, e.g. when the frame rendered with it is shown.
+        """
+        org = (state.org_x, state.org_y, state.org_scale_x, state.org_scale_y)
+        changed = (org != (self._org_x, self._org_y, self._org_scale_x,
+                           self._org_scale_y))
+        self._render_state = state
+        self._org_x, self._org_y = state.org_x, state.org_y
+        self._org_scale_x = state.org_scale_x
+        self._org_scale_y = state.org_scale_y
+        self._org_scale_z = state.org_scale_z
+        self._org_x1, self._org_y1 = state.org_x1, state.org_y1
+        self._org_x2, self._org_y2 = state.org_x2, state.org_y2
+        self._org_xoff, self._org_yoff = state.org_xoff, state.org_yoff
+        # NOTE: the version changes only after the new mapping is in
+        # place, so that coordinates cached with it are up to date
+        if changed:
+            self._tform_version += 1
 
-        return (wd, ht)
+    def _calc_bg_dimensions(self, scale_x, scale_y,
+                            pan_x, pan_y, win_wd, win_ht):
+        """
+        Parameters
+        ----------
+        scale_x, scale_y : float
+            desired scale of viewer in each axis.
 
-    def _reset_bbox(self):
-        """This function should only be called internally.  It resets
-        the viewers bounding box based on changes to pan or scale.
+        pan_x, pan_y : float
+            pan position in data coordinates.
+
+        win_wd, win_ht : int
+            window dimensions in pixels
         """
+        state = self._calc_render_state(scale_x, scale_y,
+                                        pan_x, pan_y, win_wd, win_ht)
+        self._set_render_state(state)
+
+        return (state.wd, state.ht)
+
+    def _make_render_state(self):
+        # geometry of a frame with the current pan, scale and orientation
         scale_x, scale_y = self.get_scale_xy()
         pan_x, pan_y = self.get_pan(coord='data')[:2]
         win_wd, win_ht = self.get_window_size()
@@ -1632,8 +2093,17 @@ class ImageViewBase(Callback.Callbacks):
         # issue 431
         win_wd, win_ht = max(1, win_wd), max(1, win_ht)
 
-        self._calc_bg_dimensions(scale_x, scale_y,
-                                 pan_x, pan_y, win_wd, win_ht)
+        return self._calc_render_state(scale_x, scale_y,
+                                       pan_x, pan_y, win_wd, win_ht)
+
+    def _reset_bbox(self):
+        """This function should only be called internally.  It resets
+        the viewers bounding box based on changes to pan or scale.
+        """
+        if self._use_async_render() and self._displayed is not None:
+            # geometry changes with the next frame shown (see _show_frame())
+            return
+        self._set_render_state(self._make_render_state())
 
     def apply_transforms(self, data, rot_deg):
         """Apply transformations to the given data.
@@ -1655,12 +2125,16 @@ class ImageViewBase(Callback.Callbacks):
         """
         start_time = time.time()
 
+        state = self._get_async_state()
+        if state is None:
+            state = self._render_state
+
         wd, ht = self.get_dims(data)
-        xoff, yoff = self._org_xoff, self._org_yoff
+        xoff, yoff = state.org_xoff, state.org_yoff
 
         # Do transforms as necessary
-        flip_x, flip_y = self.t_['flip_x'], self.t_['flip_y']
-        swap_xy = self.t_['swap_xy']
+        flip_x, flip_y = state.flip_x, state.flip_y
+        swap_xy = state.swap_xy
 
         data = trcalc.transform(data, flip_x=flip_x, flip_y=flip_y,
                                 swap_xy=swap_xy)
@@ -1676,11 +2150,27 @@ class ImageViewBase(Callback.Callbacks):
             split_time - start_time))
 
         # Rotate the image as necessary
-        if rot_deg != 0:
+        if math.fmod(rot_deg, 90.0) == 0.0:
+            # multiples of 90 deg can be done with a view
+            num_rot90 = int(round(-rot_deg / 90.0)) % 4
+            if num_rot90 != 0:
+                wd, ht = self.get_dims(data)
+                data = np.rot90(data, num_rot90)
+                # track the offsets through the rotation
+                if num_rot90 == 1:
+                    xoff, yoff = yoff, wd - xoff
+                elif num_rot90 == 2:
+                    xoff, yoff = wd - xoff, ht - yoff
+                else:
+                    xoff, yoff = ht - yoff, xoff
+
+        else:
             # This is the slowest part of the rendering--install the OpenCv or pyopencl
             # packages to speed it up
-            data = np.ascontiguousarray(data)
-            data = trcalc.rotate_clip(data, -rot_deg, out=data,
+            # NOTE: rotate a copy, the source may be needed for another frame
+            buf = self.scratch.get_buffer('rotate', data.shape, data.dtype)
+            np.copyto(buf, data)
+            data = trcalc.rotate_clip(buf, -rot_deg, out=buf,
                                       logger=self.logger)
 
         split2_time = time.time()
@@ -1697,9 +2187,11 @@ class ImageViewBase(Callback.Callbacks):
         # dimensions may have changed in transformations
         wd, ht = self.get_dims(data)
 
-        ctr_x, ctr_y = self._ctr_x, self._ctr_y
+        ctr_x, ctr_y = state.ctr
         dst_x, dst_y = ctr_x - xoff, ctr_y - (ht - yoff)
-        self._dst_x, self._dst_y = dst_x, dst_y
+        state.dst_x, state.dst_y = dst_x, dst_y
+        if state is self._render_state:
+            self._dst_x, self._dst_y = dst_x, dst_y
         self.logger.debug("ctr=%d,%d off=%d,%d dst=%d,%d cutout=%dx%d" % (
             ctr_x, ctr_y, xoff, yoff, dst_x, dst_y, wd, ht))
 
@@ -1918,6 +2410,22 @@ class ImageViewBase(Callback.Callbacks):
         x, y = int(float(xpct) * width), int(float(ypct) * height)
         return (x, y)
 
+    def get_transform_version(self):
+        """Get the version of the mapping between data and window
+        coordinates.
+
+        The version is increased whenever that mapping may have changed
+        (pan, scale, rotation, flips, window size or image), so that
+        coordinates computed with an equal version are still valid.
+
+        Returns
+        -------
+        version : int
+            The transform version.
+
+        """
+        return self._tform_version
+
     def get_pan_rect(self):
         """Get the coordinates in the actual data corresponding to the
         area shown in the display for the current zoom level and pan.
@@ -1930,6 +2438,11 @@ class ImageViewBase(Callback.Callbacks):
             from lower-left to lower-right.
 
         """
+        state = self._get_async_state()
+        if state is not None:
+            # rendering on the worker thread
+            return state.pan_rect
+
         wd, ht = self.get_window_size()
         #win_pts = np.asarray([(0, 0), (wd-1, 0), (wd-1, ht-1), (0, ht-1)])
         win_pts = np.asarray([(0, 0), (wd, 0), (wd, ht), (0, ht)])
@@ -2090,6 +2603,7 @@ class ImageViewBase(Callback.Callbacks):
         zoomlevel = self.zoom.calc_level(value)
         self.t_.set(zoomlevel=zoomlevel)
 
+        self.note_interaction()
         self.redraw(whence=0)
 
     def get_scale(self):
@@ -2132,6 +2646,10 @@ class ImageViewBase(Callback.Callbacks):
 
         """
         #return (self._org_scale_x, self._org_scale_y)
+        state = self._get_async_state()
+        if state is not None:
+            # rendering on the worker thread
+            return state.scale
         return self.t_['scale'][:2]
 
     def get_scale_base_xy(self):
@@ -2355,6 +2873,101 @@ class ImageViewBase(Callback.Callbacks):
         canvas_img.reset_optimize()
         self.redraw(whence=0)
 
+    def render_opt_change_cb(self, setting, value):
+        """Handle callback related to changes in rendering optimizations."""
+        canvas_img = self.get_canvas_image()
+        canvas_img.reset_optimize()
+        self.redraw(whence=0)
+
+    def render_threads_change_cb(self, setting, value):
+        """Handle callback related to changes in the number of rendering
+        threads."""
+        with self._render_pool_lock:
+            pool, self._render_pool = self._render_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def progressive_change_cb(self, setting, value):
+        """Handle callback related to turning progressive rendering
+        on or off."""
+        if not value and self._draft:
+            self._refine_timer.stop()
+            self._refine_cb(self._refine_timer)
+
+    def note_interaction(self):
+        """Note a change of pan position or scale for progressive
+        rendering.
+
+        If the ``progressive_render`` setting is on and this change comes
+        within ``progressive_idle_ms`` milliseconds of the previous one,
+        frames are rendered as quick drafts until there have been no
+        changes for that long, after which the frame is rendered again at
+        full quality.  An isolated change is rendered at full quality
+        right away.
+        """
+        if not self.t_.get('progressive_render', False):
+            return
+        if self._refine_timer is None:
+            # no way to schedule the refinement
+            return
+
+        idle_sec = self.t_.get('progressive_idle_ms', 200) / 1000.0
+        time_now = time.time()
+        if time_now - self._time_last_interaction < idle_sec:
+            self._draft = True
+        self._time_last_interaction = time_now
+
+        if self._draft:
+            # (re)start the countdown to the refinement pass
+            self._refine_timer.set(idle_sec)
+
+    def _refine_cb(self, timer):
+        if not self._draft:
+            return
+        self._draft = False
+        self.logger.debug("refining draft rendering")
+        self.redraw(whence=0)
+
+    def get_draft_params(self):
+        """Get the parameters for rendering the current frame as a draft.
+
+        Returns
+        -------
+        params : tuple or `None`
+            ``(decimate, interpolation)`` if the frame should be rendered
+            as a draft (see :meth:`note_interaction`), otherwise `None`.
+            Drafts are rendered with the data (and the cut levels and color
+            mapping) reduced by a factor of ``decimate`` in each dimension,
+            scaled with the given interpolation method.
+
+        """
+        if not self._draft:
+            return None
+        decimate = max(1, int(self.t_.get('progressive_decimate', 2)))
+        interp = self.t_.get('progressive_interpolation', 'basic')
+        if interp not in trcalc.interpolation_methods:
+            interp = 'basic'
+        return (decimate, interp)
+
+    def get_render_pool(self):
+        """Get the thread pool used to render images in parallel.
+
+        Returns
+        -------
+        pool : `~concurrent.futures.ThreadPoolExecutor` or `None`
+            The pool, or `None` if the ``render_threads`` setting is
+            less than 2.
+
+        """
+        num_threads = self.t_.get('render_threads', 1)
+        if num_threads is None or num_threads < 2:
+            return None
+        with self._render_pool_lock:
+            if self._render_pool is None:
+                self._render_pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=num_threads)
+            return self._render_pool
+
     def set_name(self, name):
         """Set viewer name."""
         self.name = name
@@ -2445,6 +3058,7 @@ class ImageViewBase(Callback.Callbacks):
         pan_x, pan_y = value[:2]
 
         self.logger.debug("pan set to %.2f,%.2f" % (pan_x, pan_y))
+        self.note_interaction()
         self.redraw(whence=0)
 
     def get_pan(self, coord='data'):
@@ -2462,6 +3076,11 @@ class ImageViewBase(Callback.Callbacks):
             X and Y positions, in that order.
 
         """
+        state = self._get_async_state()
+        if state is not None and coord == 'data':
+            # rendering on the worker thread
+            return state.pan
+
         pan_x, pan_y = self.t_['pan'][:2]
         if coord == 'wcs':
             if self.t_['pan_coord'] == 'data':
@@ -2642,7 +3261,8 @@ class ImageViewBase(Callback.Callbacks):
         if image is None:
             return
 
-        loval, hival = autocuts.calc_cut_levels(image)
+        # NOTE: levels may have been calculated when the image was loaded
+        loval, hival = image.calc_cut_levels(autocuts)
 
         # this will invoke cut_levels_cb()
         self.t_.set(cuts=(loval, hival))
@@ -2765,6 +3385,7 @@ class ImageViewBase(Callback.Callbacks):
 
     def transform_cb(self, setting, value):
         """Handle callback related to changes in transformations."""
+        self._tform_version += 1
         self.make_callback('transform')
 
         # whence=0 because need to calculate new extents for proper
@@ -2816,14 +3437,13 @@ class ImageViewBase(Callback.Callbacks):
         if 'pan' in attrlist:
             keylist.extend(['pan'])
 
-        with dst_fi.suppress_redraw:
+        with dst_fi.transaction():
             if share:
                 self.t_.share_settings(dst_fi.get_settings(),
                                        keylist=keylist)
             else:
                 self.t_.copy_settings(dst_fi.get_settings(),
                                       keylist=keylist)
-            dst_fi.redraw(whence=0)
 
     def get_rotation(self):
         """Get image rotation angle.
@@ -2854,6 +3474,7 @@ class ImageViewBase(Callback.Callbacks):
 
     def rotation_change_cb(self, setting, value):
         """Handle callback related to changes in rotation angle."""
+        self._tform_version += 1
         # whence=0 because need to calculate new extents for proper
         # cutout for rotation (TODO: always make extents consider
         #  room for rotation)
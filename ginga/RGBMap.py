@@ -78,6 +78,13 @@ class RGBMapper(Callback.Callbacks):
     # parameter, which avoids having to allocate a new array for the
     # result
     #
+    # [B] For index (non-RGB) data with a color distribution that does
+    # not depend on the data, the color distribution, shift array and
+    # color map are combined into a single lookup table, and mapping is
+    # done in one pass with np.take() directly into the output array.
+    # Set fused_lut to False to use the step by step method.
+    #
+    fused_lut = True
 
     def __init__(self, logger, dist=None, settings=None, bpp=None):
         Callback.Callbacks.__init__(self)
@@ -120,6 +127,12 @@ class RGBMapper(Callback.Callbacks):
         self.carr = None
         self.sarr = None
         self.scale_pct = 1.0
+        # incremented whenever the mapping from index to color changes
+        self._version = 0
+        # combined lookup table (hash + shift + color), see _get_lut()
+        self._lut = None
+        self._lut_key = None
+        self._lut_hash = None
 
         # targeted bit depth per-pixel band of the output RGB array
         # (can be less than the data size of the output array)
@@ -320,6 +333,7 @@ class RGBMapper(Callback.Callbacks):
             if _len != maxlen:
                 raise RGBMapError("shift map length %d != %d" % (_len, maxlen))
             self.sarr = sarr.astype(np.uint, copy=False)
+            self._version += 1
             # NOTE: can't reset scale_pct here because it results in a
             # loop with e.g. scale_and_shift()
             #self.scale_pct = 1.0
@@ -356,12 +370,21 @@ class RGBMapper(Callback.Callbacks):
             self.arr[0] = self.arr[0][idx]
             self.arr[1] = self.arr[1][idx]
             self.arr[2] = self.arr[2][idx]
+        self._version += 1
 
         # NOTE: don't reset shift array
         #self.reset_sarr(callback=False)
         if callback:
             self.make_callback('changed')
 
+    def get_version(self):
+        """
+        Return a counter that is incremented whenever the mapping from
+        data indexes to colors changes.  Useful for validating caches of
+        color mapped data.
+        """
+        return self._version
+
     def get_hash_size(self):
         return self.dist.get_hash_size()
 
@@ -371,6 +394,7 @@ class RGBMapper(Callback.Callbacks):
 
     def color_hashsize_set_cb(self, setting, size):
         self.dist.set_hash_size(size)
+        self._version += 1
         self.make_callback('changed')
 
     def get_hash_algorithms(self):
@@ -387,6 +411,7 @@ class RGBMapper(Callback.Callbacks):
 
     def set_dist(self, dist, callback=True):
         self.dist = dist
+        self._version += 1
         if callback:
             self.make_callback('changed')
 
@@ -473,6 +498,10 @@ class RGBMapper(Callback.Callbacks):
 
         res = RGBPlanes(out, order)
 
+        if self._can_use_lut(idx, image_order):
+            self._get_rgbarray_lut(idx, res)
+            return res
+
         # set alpha channel
         if res.hasAlpha:
             aa = res.get_slice('A')
@@ -484,6 +513,56 @@ class RGBMapper(Callback.Callbacks):
 
         return res
 
+    def _can_use_lut(self, idx, image_order):
+        return (self.fused_lut and
+                ((image_order is None) or (len(image_order) < 3)) and
+                np.issubdtype(idx.dtype, np.integer) and
+                not self.dist.data_dependent)
+
+    def _get_lut(self, order):
+        """Return a lookup table that maps indexes in the range of the
+        color distribution hash directly to output pixels in `order`.
+        This combines the color distribution, shift array and color map
+        into one table, which is rebuilt only when one of those changes.
+        """
+        key = (self._version, order, self.dist.get_hash_size())
+        if (self._lut is not None and key == self._lut_key and
+                self._lut_hash is self.dist.hash):
+            return self._lut
+
+        hashsize = self.dist.get_hash_size()
+        idx = self.dist.hash_array(np.arange(hashsize))
+        idx = idx.clip(0, self.maxc)
+        idx = self.sarr[idx].clip(0, self.maxc)
+
+        lut = np.empty((hashsize, len(order)), dtype=self.dtype)
+        for i, c in enumerate(order.upper()):
+            if c == 'A':
+                lut[:, i] = self.maxc
+            else:
+                lut[:, i] = self.arr['RGB'.index(c)][idx]
+
+        self._lut, self._lut_key, self._lut_hash = lut, key, self.dist.hash
+        return lut
+
+    def _get_rgbarray_lut(self, idx, rgbobj):
+        lut = self._get_lut(rgbobj.get_order())
+        out = rgbobj.rgbarr
+
+        if idx.dtype == np.uint and idx.dtype.itemsize == np.dtype(np.intp).itemsize:
+            # take() won't cast unsigned indexes; values of a valid
+            # index array are far below the sign bit, so reinterpret them
+            idx = idx.view(np.intp)
+
+        depth = lut.shape[1]
+        if (depth * lut.itemsize == 4) and out.flags.c_contiguous:
+            # view each output pixel as one 32-bit word
+            lut = lut.view(np.uint32).reshape(lut.shape[0])
+            out = out.view(np.uint32).reshape(idx.shape)
+            np.take(lut, idx, mode='clip', out=out)
+        else:
+            np.take(lut, idx, axis=0, mode='clip', out=out)
+
     def get_hasharray(self, idx):
         return self.dist.hash_array(idx)
 
@@ -576,6 +655,8 @@ class NonColorMapper(RGBMapper):
     This mapper allows changing of color distribution and contrast
     adjustment, but does no coloring.
     """
+    fused_lut = False
+
     def __init__(self, logger, dist=None, bpp=None):
         super(NonColorMapper, self).__init__(logger, dist=dist, bpp=bpp)
 
@@ -612,6 +693,8 @@ class PassThruRGBMapper(RGBMapper):
     coloring.  It is thus the most efficient one to use for maximum
     speed rendering of "finished" RGB data.
     """
+    fused_lut = False
+
     def __init__(self, logger, dist=None, bpp=None):
         super(PassThruRGBMapper, self).__init__(logger, bpp=bpp)
 
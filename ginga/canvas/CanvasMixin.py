@@ -70,7 +70,8 @@ class CanvasMixin(object):
             obj.add_callback('modified', self.subcanvas_updated_cb)
 
         if redraw:
-            self.update_canvas(whence=3)
+            # NOTE: the spatial index (if any) has already been updated
+            self.make_callback('modified', 3)
         return tag
 
     def delete_objects_by_tag(self, tags, redraw=True):
@@ -83,7 +84,7 @@ class CanvasMixin(object):
                 continue
 
         if redraw:
-            self.update_canvas(whence=3)
+            self.make_callback('modified', 3)
 
     def delete_object_by_tag(self, tag, redraw=True):
         self.delete_objects_by_tag([tag], redraw=redraw)
@@ -116,7 +117,7 @@ class CanvasMixin(object):
         CompoundMixin.delete_all_objects(self)
 
         if redraw:
-            self.update_canvas(whence=3)
+            self.make_callback('modified', 3)
 
     def delete_objects(self, objects, redraw=True):
         for tag, obj in list(self.tags.items()):
@@ -124,7 +125,7 @@ class CanvasMixin(object):
                 self.delete_object_by_tag(tag, redraw=False)
 
         if redraw:
-            self.update_canvas(whence=3)
+            self.make_callback('modified', 3)
 
     def delete_object(self, obj, redraw=True):
         self.delete_objects([obj], redraw=redraw)
@@ -138,7 +139,7 @@ class CanvasMixin(object):
             self.raise_object(obj1, obj2)
 
         if redraw:
-            self.update_canvas(whence=3)
+            self.make_callback('modified', 3)
 
     def lower_object_by_tag(self, tag, belowThis=None, redraw=True):
         obj1 = self.get_object_by_tag(tag)
@@ -149,7 +150,7 @@ class CanvasMixin(object):
             self.lower_object(obj1, obj2)
 
         if redraw:
-            self.update_canvas(whence=3)
+            self.make_callback('modified', 3)
 
     ### NON-PEP8 EQUIVALENTS -- TO BE DEPRECATED ###
 
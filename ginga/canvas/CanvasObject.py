@@ -49,6 +49,12 @@ class CanvasObjectBase(Callback.Callbacks):
     This class defines common methods used by all such objects.
     """
 
+    # number of sets of points for which get_cpoints() keeps results
+    _cpoints_cache_size = 4
+    # compound object (canvas) with a spatial index of this object, if
+    # any (see CompoundMixin.enable_spatial_index())
+    _index_owner = None
+
     def __init__(self, **kwdargs):
         if not hasattr(self, 'cb'):
             Callback.Callbacks.__init__(self)
@@ -62,6 +68,8 @@ class CanvasObjectBase(Callback.Callbacks):
         self.data = None
         self.crdmap = None
         self.tag = None
+        # canvas coordinates computed by get_cpoints()
+        self._cpoints_cache = None
         if not hasattr(self, 'kind'):
             self.kind = None
         # For debugging
@@ -87,6 +95,14 @@ class CanvasObjectBase(Callback.Callbacks):
             else:
                 self.crdmap = viewer.get_coordmap(self.coord)
 
+    def update_index(self):
+        """Update the entry of this object in the spatial index of the
+        canvas holding it (if any), after the object was moved or changed.
+        """
+        owner = self._index_owner
+        if owner is not None:
+            owner.update_object(self)
+
     def sync_state(self):
         """This method called when changes are made to the parameters.
         subclasses should override if they need any special state handling.
@@ -247,6 +263,7 @@ class CanvasObjectBase(Callback.Callbacks):
         to the coordinate space of the object and stored.
         """
         self.points = np.asarray(self.crdmap.data_to(points))
+        self.update_index()
 
     def rotate_deg(self, thetas, offset):
         points = np.asarray(self.get_data_points(), dtype=np.double)
@@ -282,6 +299,7 @@ class CanvasObjectBase(Callback.Callbacks):
         points = np.asarray(self.points, dtype=np.float)
         points[i] = self.crdmap.data_to(pt)
         self.points = points
+        self.update_index()
 
     def get_point_by_index(self, i):
         return self.crdmap.to_data(self.points[i])
@@ -491,14 +509,42 @@ class CanvasObjectBase(Callback.Callbacks):
         # If points are passed, they are assumed to be in data space
         if points is None:
             points = self.get_points()
+        points = np.asarray(points)
 
+        rot_deg = 0.0
         if (not no_rotate) and hasattr(self, 'rot_deg') and self.rot_deg != 0.0:
+            rot_deg = self.rot_deg
+            ctr_pt = tuple(self.get_center_pt())
+
+        # reuse the result of an earlier call for the same points, if the
+        # viewer transforms have not changed since (e.g. when only the
+        # overlays are redrawn)
+        version = viewer.get_transform_version()
+        cache = self._cpoints_cache
+        if cache is None or cache[0] is not viewer or cache[1] != version:
+            cache = (viewer, version, [])
+            self._cpoints_cache = cache
+        entries = cache[2]
+        for entry in entries:
+            if (entry[0] == rot_deg and entry[1].shape == points.shape and
+                    np.array_equal(entry[1], points) and
+                    (rot_deg == 0.0 or entry[2] == ctr_pt)):
+                return entry[3]
+
+        if rot_deg != 0.0:
             # rotate vertices according to rotation
-            ctr_x, ctr_y = self.get_center_pt()
-            points = trcalc.rotate_coord(points, [self.rot_deg], (ctr_x, ctr_y))
+            tpoints = trcalc.rotate_coord(points, [rot_deg], ctr_pt)
+        else:
+            tpoints = points
 
         crdmap = viewer.get_coordmap('native')
-        return crdmap.data_to(points)
+        cpoints = crdmap.data_to(tpoints)
+
+        if len(entries) >= self._cpoints_cache_size:
+            entries.pop(0)
+        entries.append((rot_deg, points.copy(),
+                        ctr_pt if rot_deg != 0.0 else None, cpoints))
+        return cpoints
 
     def get_bbox(self, points=None):
         """
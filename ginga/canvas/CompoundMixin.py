@@ -11,6 +11,7 @@ from functools import reduce
 import numpy as np
 
 from ginga.canvas import coordmap
+from ginga.canvas.spatial import GridIndex
 
 __all__ = ['CompoundMixin']
 
@@ -32,6 +33,10 @@ class CompoundMixin(object):
             self.coord = None
         self.opaque = False
         self._contains_reduce = np.logical_or
+        # optional spatial index of our objects (see enable_spatial_index())
+        self._spatial = None
+        self._spatial_dirty = False
+        self.spatial_margin = 50
 
     def get_llur(self):
         """
@@ -60,9 +65,102 @@ class CompoundMixin(object):
         return reduce(self._contains_reduce,
                       map(lambda obj: obj.contains_pts(pts), self.objects))
 
+    def enable_spatial_index(self, tf=True, cell_size=64.0):
+        """Enable or disable a spatial index of the objects in this
+        compound object.
+
+        With the index, drawing visits only the objects whose bounding box
+        is near the area shown in the viewer, and the objects at a point
+        are found without testing every object.  This makes panning and
+        picking much faster for canvases with many (e.g. thousands of
+        catalog) objects, most of which are off screen.
+
+        Objects in data coordinates are indexed by their bounding boxes;
+        other objects (and compound objects) are always drawn and tested.
+        The index is updated when objects are added or deleted, and when
+        an object is moved or changed through its methods (or edited
+        interactively).  After changing the attributes of an object
+        directly, call `update_object`; after changing many objects,
+        `reindex_objects` rebuilds the whole index.
+
+        Parameters
+        ----------
+        tf : bool
+            Whether to use the index.
+
+        cell_size : float
+            Size of the cells of the index grid, in data pixels.
+
+        """
+        if tf:
+            self._spatial = GridIndex(cell_size=cell_size)
+            self._spatial_dirty = True
+            self._get_spatial()
+        else:
+            self._spatial = None
+            for obj in self.objects:
+                self._release_object(obj)
+
+    def _get_index_llur(self, obj):
+        # bounding box by which to index an object, or None if it must
+        # always be drawn
+        if (obj.is_compound() or hasattr(obj, 'draw_image') or
+                not isinstance(obj.crdmap, coordmap.DataMapper)):
+            return None
+        try:
+            return obj.get_llur()
+        except Exception:
+            return None
+
+    def _release_object(self, obj):
+        # object is no longer in our spatial index
+        if obj._index_owner is self:
+            obj._index_owner = None
+
+    def _get_spatial(self):
+        if self._spatial is not None and self._spatial_dirty:
+            self._spatial.clear()
+            for obj in self.objects:
+                obj._index_owner = self
+                self._spatial.insert(obj, self._get_index_llur(obj))
+            self._spatial_dirty = False
+        return self._spatial
+
+    def update_object(self, obj):
+        """Update the entry of `obj` in the spatial index (if enabled),
+        after the object was moved or changed.
+        """
+        if (self._spatial is not None and not self._spatial_dirty and
+                obj in self._spatial):
+            self._spatial.insert(obj, self._get_index_llur(obj))
+
+    def reindex_objects(self):
+        """Rebuild the spatial index (if enabled) at its next use, e.g.
+        after many objects were changed.
+        """
+        self._spatial_dirty = True
+
+    def _get_candidates(self, viewer, x1, y1, x2, y2, margin):
+        # objects near the rectangle, or None if there is no index
+        spatial = self._get_spatial()
+        if spatial is None:
+            return None
+        # the margin is in window pixels
+        scale = max(viewer.get_scale_min(), 1e-6)
+        margin = margin / scale
+        return spatial.query(x1 - margin, y1 - margin,
+                             x2 + margin, y2 + margin)
+
     def get_items_at(self, pt):
+        objects = self.objects
+        spatial = self._get_spatial()
+        if spatial is not None:
+            x, y = pt[:2]
+            candidates = spatial.query_pt(x, y)
+            objects = [obj for obj in objects if obj in candidates]
+
         res = []
-        for obj in self.objects:
+        for obj in objects:
             if obj.contains_pt(pt):
                 #res.insert(0, obj)
                 res.append(obj)
@@ -83,7 +181,16 @@ class CompoundMixin(object):
     def select_items_at(self, viewer, pt, test=None):
         res = []
         try:
-            for obj in self.objects:
+            objects = self.objects
+            if test is None and len(objects) > 0:
+                # objects are selected within a few pixels of the point
+                x, y = pt[:2]
+                candidates = self._get_candidates(viewer, x, y, x, y,
+                                                  self.spatial_margin)
+                if candidates is not None:
+                    objects = [obj for obj in objects if obj in candidates]
+
+            for obj in objects:
                 if obj.is_compound() and not obj.opaque:
                     # non-opaque compound object, list up compatible members
                     res.extend(obj.select_items_at(viewer, pt, test=test))
@@ -125,6 +232,8 @@ class CompoundMixin(object):
         # initialize children
         for obj in self.objects:
             obj.initialize(canvas, viewer, logger)
+        # children may now map coordinates differently
+        self.reindex_objects()
 
     def inherit_from(self, obj):
         self.crdmap = obj.crdmap
@@ -139,9 +248,23 @@ class CompoundMixin(object):
             obj.use_coordmap(mapobj)
 
     def draw(self, viewer):
-        for obj in self.objects:
+        objects = self.objects
+        if self._spatial is not None and len(objects) > 0:
+            # draw only the objects near the area shown in the window
+            x1, y1, x2, y2 = self._get_view_bounds(viewer)
+            candidates = self._get_candidates(viewer, x1, y1, x2, y2,
+                                              self.spatial_margin)
+            objects = [obj for obj in objects if obj in candidates]
+
+        for obj in objects:
             obj.draw(viewer)
 
+    def _get_view_bounds(self, viewer):
+        pts = np.asarray(viewer.get_pan_rect())
+        x1, y1 = pts[:, 0].min(), pts[:, 1].min()
+        x2, y2 = pts[:, 0].max(), pts[:, 1].max()
+        return (x1, y1, x2, y2)
+
     def get_objects(self):
         return self.objects
 
@@ -150,12 +273,19 @@ class CompoundMixin(object):
 
     def delete_object(self, obj):
         self.objects.remove(obj)
+        if self._spatial is not None:
+            self._spatial.remove(obj)
+            self._release_object(obj)
 
     def delete_objects(self, objects):
         for obj in objects:
             self.delete_object(obj)
 
     def delete_all_objects(self):
+        if self._spatial is not None:
+            self._spatial.clear()
+            for obj in self.objects:
+                self._release_object(obj)
         self.objects[:] = []
 
     def roll_objects(self, n):
@@ -187,6 +317,11 @@ class CompoundMixin(object):
             index = self.objects.index(belowThis)
             self.objects.insert(index, obj)
 
+        if self._spatial is not None:
+            obj._index_owner = self
+            if not self._spatial_dirty:
+                self._spatial.insert(obj, self._get_index_llur(obj))
+
     def raise_object(self, obj, aboveThis=None):
         if aboveThis is None:
             # no reference object--move to top
@@ -353,6 +353,8 @@ class DrawingMixin(object):
                                           self._edit_detail)
 
         #self._edit_obj.sync_state()
+        # e.g. a radius may have changed
+        self._edit_obj.update_index()
 
         if time.time() - self._process_time > self._delta_time:
             self.process_drawing()
@@ -537,6 +539,7 @@ class DrawingMixin(object):
                 # Point near a line
                 pt = obj.crdmap.data_to((data_x, data_y))
                 obj.insert_pt(insert, pt)
+                obj.update_index()
                 self.process_drawing()
             else:
                 self.logger.debug("cursor not near a line")
@@ -563,6 +566,7 @@ class DrawingMixin(object):
             if delete is not None:
                 self.logger.debug("deleting point")
                 obj.delete_pt(delete)
+                obj.update_index()
                 self.process_drawing()
             else:
                 self.logger.debug("cursor not near a point")
@@ -573,6 +577,7 @@ class DrawingMixin(object):
         if self._edit_obj is None:
             return False
         self._edit_obj.rotate_by_deg([delta_deg])
+        self._edit_obj.update_index()
         self.process_drawing()
         self.make_callback('edit-event', self._edit_obj)
         return True
@@ -590,6 +595,7 @@ class DrawingMixin(object):
         if self._edit_obj is None:
             return False
         self._edit_obj.scale_by(delta_x, delta_y)
+        self._edit_obj.update_index()
         self.process_drawing()
         self.make_callback('edit-event', self._edit_obj)
         return True
@@ -0,0 +1,170 @@
+#
+# spatial.py -- spatial index of canvas objects
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+A spatial index over the bounding boxes of canvas objects, used to find
+the objects that may be visible in (or selected at) some area of a canvas
+without visiting every object.
+
+The index is a uniform grid of square cells.  Each object is listed in
+every cell that its bounding box overlaps.  Objects whose bounding boxes
+would span too many cells, and objects that cannot be indexed (e.g. ones
+whose position depends on the viewer), are kept in separate sets that
+are checked (or returned) on every query.
+"""
+import math
+
+__all__ = ['GridIndex']
+
+
+class GridIndex(object):
+    """A uniform grid index of object bounding boxes.
+
+    Parameters
+    ----------
+    cell_size : float
+        Size of a (square) grid cell, in the units of the bounding boxes.
+
+    max_cells : int
+        Objects whose bounding box spans more than this number of cells
+        are not entered in the grid, but checked on every query.
+
+    """
+
+    def __init__(self, cell_size=64.0, max_cells=256):
+        self.cell_size = float(cell_size)
+        self.max_cells = max_cells
+        self.clear()
+
+    def clear(self):
+        """Remove all objects from the index."""
+        # maps (i, j) cell indexes to sets of objects
+        self.cells = {}
+        # maps objects to their bounding boxes
+        self.bboxes = {}
+        # objects too large for the grid
+        self.large = set()
+        # objects that could not be indexed
+        self.always = set()
+
+    def _cell_range(self, x1, y1, x2, y2):
+        cs = self.cell_size
+        return (int(math.floor(x1 / cs)), int(math.floor(y1 / cs)),
+                int(math.floor(x2 / cs)), int(math.floor(y2 / cs)))
+
+    def insert(self, obj, llur):
+        """Add `obj` to the index.
+
+        Parameters
+        ----------
+        obj : object
+            The object (must be hashable).
+
+        llur : tuple or `None`
+            Bounding box ``(x1, y1, x2, y2)`` of the object, or `None` if
+            the object cannot be indexed; such an object is returned by
+            every query.
+
+        """
+        if obj in self.bboxes or obj in self.always:
+            self.remove(obj)
+
+        if llur is None:
+            self.always.add(obj)
+            return
+
+        x1, y1, x2, y2 = llur
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        if not all(map(math.isfinite, (x1, y1, x2, y2))):
+            self.always.add(obj)
+            return
+
+        bbox = (x1, y1, x2, y2)
+        self.bboxes[obj] = bbox
+        i1, j1, i2, j2 = self._cell_range(*bbox)
+        if (i2 - i1 + 1) * (j2 - j1 + 1) > self.max_cells:
+            self.large.add(obj)
+            return
+
+        for j in range(j1, j2 + 1):
+            for i in range(i1, i2 + 1):
+                key = (i, j)
+                cell = self.cells.get(key, None)
+                if cell is None:
+                    cell = set()
+                    self.cells[key] = cell
+                cell.add(obj)
+
+    def remove(self, obj):
+        """Remove `obj` from the index, if it is there."""
+        self.always.discard(obj)
+        bbox = self.bboxes.pop(obj, None)
+        if bbox is None:
+            return
+        if obj in self.large:
+            self.large.discard(obj)
+            return
+
+        i1, j1, i2, j2 = self._cell_range(*bbox)
+        for j in range(j1, j2 + 1):
+            for i in range(i1, i2 + 1):
+                key = (i, j)
+                cell = self.cells.get(key, None)
+                if cell is not None:
+                    cell.discard(obj)
+                    if len(cell) == 0:
+                        del self.cells[key]
+
+    def query(self, x1, y1, x2, y2):
+        """Find the objects that may overlap a rectangle.
+
+        Returns
+        -------
+        objs : set
+            The objects whose bounding box overlaps the rectangle
+            ``(x1, y1, x2, y2)``, plus those that could not be indexed.
+
+        """
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        res = set(self.always)
+        bboxes = self.bboxes
+
+        def _overlaps(obj):
+            a1, b1, a2, b2 = bboxes[obj]
+            return a1 <= x2 and a2 >= x1 and b1 <= y2 and b2 >= y1
+
+        res.update(filter(_overlaps, self.large))
+
+        i1, j1, i2, j2 = self._cell_range(x1, y1, x2, y2)
+        num_cells = (i2 - i1 + 1) * (j2 - j1 + 1)
+        if num_cells > len(self.cells):
+            # query area is large compared to the occupied cells
+            cells = [cell for (i, j), cell in self.cells.items()
+                     if i1 <= i <= i2 and j1 <= j <= j2]
+        else:
+            cells = [self.cells[(i, j)]
+                     for j in range(j1, j2 + 1) for i in range(i1, i2 + 1)
+                     if (i, j) in self.cells]
+
+        for cell in cells:
+            res.update(filter(_overlaps, cell - res))
+        return res
+
+    def query_pt(self, x, y, radius=0.0):
+        """Find the objects whose bounding box is within `radius` of the
+        point ``(x, y)``, plus those that could not be indexed.
+        """
+        return self.query(x - radius, y - radius, x + radius, y + radius)
+
+    def __len__(self):
+        return len(self.bboxes) + len(self.always)
+
+    def __contains__(self, obj):
+        return obj in self.bboxes or obj in self.always
+
+# END
@@ -7,5 +7,6 @@ from .image import *  # noqa
 from .layer import *  # noqa
 from .utils import *  # noqa
 from .astro import *  # noqa
+from .markers import *  # noqa
 
 # END
@@ -562,6 +562,7 @@ class SquareBox(OnePointOneRadiusMixin, CanvasObjectBase):
     def rotate_by_deg(self, thetas):
         new_rot = np.fmod(self.rot_deg + thetas[0], 360.0)
         self.rot_deg = new_rot
+        self.update_index()
         return new_rot
 
     def contains_pts(self, pts):
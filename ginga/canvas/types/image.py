@@ -4,6 +4,8 @@
 # This is open-source software licensed under a BSD license.
 # Please see the file LICENSE.txt for details.
 #
+from collections import OrderedDict
+
 import numpy as np
 
 from ginga.canvas.CanvasObject import (CanvasObjectBase, _bool, _color,
@@ -388,41 +390,65 @@ class NormImage(Image):
 
         cache = self.get_cache(viewer)
 
-        if (whence <= 0.0) or (cache.cutout is None) or (not self.optimize):
-            # get extent of our data coverage in the window
-            pts = np.asarray(viewer.get_pan_rect()).T
-            xmin = int(np.min(pts[0]))
-            ymin = int(np.min(pts[1]))
-            xmax = int(np.ceil(np.max(pts[0])))
-            ymax = int(np.ceil(np.max(pts[1])))
-
-            # destination location in data_coords
-            dst_x, dst_y = self.crdmap.to_data((self.x, self.y))
-
-            a1, b1, a2, b2 = 0, 0, self.image.width - 1, self.image.height - 1
+        if self.rgbmap is not None:
+            rgbmap = self.rgbmap
+        else:
+            rgbmap = viewer.get_rgbmap()
 
-            # calculate the cutout that we can make and scale to merge
-            # onto the final image--by only cutting out what is necessary
-            # this speeds scaling greatly at zoomed in sizes
-            ((dst_x, dst_y), (a1, b1), (a2, b2)) = \
-                trcalc.calc_image_merge_clip((xmin, ymin), (xmax, ymax),
-                                             (dst_x, dst_y),
-                                             (a1, b1), (a2, b2))
+        use_tiles = self._use_tiles(viewer, rgbmap)
+        if use_tiles != cache.tiled:
+            # switching between tiled and untiled rendering
+            self._reset_cache(cache)
+            cache.tiled = use_tiles
+
+        stats = viewer.render_stats
+
+        if use_tiles:
+            if (whence <= 2.5) or (cache.rgbarr is None):
+                with stats.stage('tiles') as st:
+                    if not self._render_tiles(viewer, cache, rgbmap, dstarr):
+                        # image is completely off the screen
+                        cache.rgbarr = None
+                        return
+                    st.pixels = cache.rgbarr.shape[0] * cache.rgbarr.shape[1]
+
+            num_pixels = cache.rgbarr.shape[0] * cache.rgbarr.shape[1]
+            with stats.stage('composite', pixels=num_pixels):
+                trcalc.overlay_image(dstarr, cache.cvs_pos, cache.rgbarr,
+                                     dst_order=viewer.get_rgb_order(),
+                                     src_order=cache.rgb_order,
+                                     alpha=self.alpha, fill=True, flipy=False)
+            return
 
-            # is image completely off the screen?
-            if (a2 - a1 <= 0) or (b2 - b1 <= 0):
+        if (whence <= 0.0) or (cache.cutout is None) or (not self.optimize):
+            area = self._calc_cutout_area(viewer)
+            if area is None:
                 # no overlay needed
                 return
+            (dst_x, dst_y), (a1, b1), (a2, b2) = area
 
             # cutout and scale the piece appropriately by viewer scale
             scale_x, scale_y = viewer.get_scale_xy()
             # scale additionally by our scale
             _scale_x, _scale_y = scale_x * self.scale_x, scale_y * self.scale_y
 
-            res = self.image.get_scaled_cutout2((a1, b1), (a2, b2),
-                                                (_scale_x, _scale_y),
-                                                method=self.interpolation)
-            cache.cutout = res.data
+            # during interactive pan/zoom, render a draft from a reduced
+            # cutout, which is enlarged when it is composited
+            method, cache.decimate = self.interpolation, 1
+            draft = viewer.get_draft_params()
+            if draft is not None:
+                cache.decimate, method = draft
+                _scale_x /= cache.decimate
+                _scale_y /= cache.decimate
+
+            with stats.stage('cutout') as st:
+                res = self.image.get_scaled_cutout2((a1, b1), (a2, b2),
+                                                    (_scale_x, _scale_y),
+                                                    method=method)
+                cache.cutout = res.data
+                st.pixels = res.data.shape[0] * res.data.shape[1]
+                if res.data.base is None:
+                    st.nbytes = res.data.nbytes
 
             # calculate our offset from the pan position
             pan_x, pan_y = viewer.get_pan()
@@ -440,23 +466,7 @@ class NormImage(Image):
             cvs_y = int(np.round(ht / 2.0 + off_y))
             cache.cvs_pos = (cvs_x, cvs_y)
 
-        if self.rgbmap is not None:
-            rgbmap = self.rgbmap
-        else:
-            rgbmap = viewer.get_rgbmap()
-
-        if (whence <= 1.0) or (cache.prergb is None) or (not self.optimize):
-            # apply visual changes prior to color mapping (cut levels, etc)
-            vmax = rgbmap.get_hash_size() - 1
-            newdata = self.apply_visuals(viewer, cache.cutout, 0, vmax)
-
-            # result becomes an index array fed to the RGB mapper
-            if not np.issubdtype(newdata.dtype, np.dtype('uint')):
-                newdata = newdata.astype(np.uint)
-            idx = newdata
-
-            self.logger.debug("shape of index is %s" % (str(idx.shape)))
-            cache.prergb = idx
+            viewer.check_render_cancel()
 
         dst_order = viewer.get_rgb_order()
         image_order = self.image.get_order()
@@ -466,17 +476,326 @@ class NormImage(Image):
         if ('A' in dst_order) and not ('A' in image_order):
             get_order = dst_order.replace('A', '')
 
+        # lookup table directly from data values to colors, if possible
+        lut = self._get_int_lut(viewer, cache, rgbmap, cache.cutout.dtype,
+                                dst_order, image_order, get_order)
+
+        num_pixels = cache.cutout.shape[0] * cache.cutout.shape[1]
+        pool = None
+        if not rgbmap.get_dist().data_dependent:
+            # row bands can be processed independently
+            pool = viewer.get_render_pool()
+
+        if lut is not None:
+            cache.prergb = None
+
+        elif (whence <= 1.0) or (cache.prergb is None) or (not self.optimize):
+            with stats.stage('cut_levels', pixels=num_pixels) as st:
+                if pool is not None:
+                    cache.prergb = self._cut_levels_bands(viewer, pool, rgbmap,
+                                                          cache.cutout)
+                else:
+                    # apply visual changes prior to color mapping (cut levels, etc)
+                    vmax = rgbmap.get_hash_size() - 1
+                    newdata = self.apply_visuals(viewer, cache.cutout, 0, vmax)
+
+                    # result becomes an index array fed to the RGB mapper
+                    if not np.issubdtype(newdata.dtype, np.dtype('uint')):
+                        newdata = newdata.astype(np.uint)
+                    idx = newdata
+
+                    self.logger.debug("shape of index is %s" % (str(idx.shape)))
+                    cache.prergb = idx
+                st.nbytes = cache.prergb.nbytes
+
+            viewer.check_render_cancel()
+
         if (whence <= 2.5) or (cache.rgbarr is None) or (not self.optimize):
-            # get RGB mapped array
-            rgbobj = rgbmap.get_rgbarray(cache.prergb, order=dst_order,
-                                         image_order=image_order)
-            cache.rgbarr = rgbobj.get_array(get_order)
+            # reuse the output array of the previous frame, if possible
+            shape = cache.cutout.shape
+            if len(image_order) > 1:
+                # data contains RGB axis
+                shape = shape[:-1]
+            with stats.stage('rgb_map', pixels=num_pixels):
+                out = self._get_buffer(viewer, cache,
+                                       shape + (len(get_order), ),
+                                       rgbmap.dtype)
+
+                if pool is not None:
+                    self._color_map_bands(viewer, pool, rgbmap, lut, cache,
+                                          out, get_order, image_order)
+                elif lut is not None:
+                    self._apply_int_lut(lut, cache.cutout, out=out)
+                else:
+                    # get RGB mapped array
+                    rgbmap.get_rgbarray(cache.prergb, out=out,
+                                        order=get_order,
+                                        image_order=image_order)
+                cache.rgbarr = out
+
+        rgbarr = cache.rgbarr
+        if cache.decimate > 1:
+            rgbarr = self._enlarge_draft(viewer, rgbarr, cache.decimate)
 
         # composite the image into the destination array at the
         # calculated position
-        trcalc.overlay_image(dstarr, cache.cvs_pos, cache.rgbarr,
-                             dst_order=dst_order, src_order=get_order,
-                             alpha=self.alpha, fill=True, flipy=False)
+        with stats.stage('composite', pixels=num_pixels):
+            trcalc.overlay_image(dstarr, cache.cvs_pos, rgbarr,
+                                 dst_order=dst_order, src_order=get_order,
+                                 alpha=self.alpha, fill=True, flipy=False)
+
+    def _calc_cutout_area(self, viewer):
+        # get extent of our data coverage in the window
+        pts = np.asarray(viewer.get_pan_rect()).T
+        xmin = int(np.min(pts[0]))
+        ymin = int(np.min(pts[1]))
+        xmax = int(np.ceil(np.max(pts[0])))
+        ymax = int(np.ceil(np.max(pts[1])))
+
+        # destination location in data_coords
+        dst_x, dst_y = self.crdmap.to_data((self.x, self.y))
+
+        a1, b1, a2, b2 = 0, 0, self.image.width - 1, self.image.height - 1
+
+        # calculate the cutout that we can make and scale to merge
+        # onto the final image--by only cutting out what is necessary
+        # this speeds scaling greatly at zoomed in sizes
+        ((dst_x, dst_y), (a1, b1), (a2, b2)) = \
+            trcalc.calc_image_merge_clip((xmin, ymin), (xmax, ymax),
+                                         (dst_x, dst_y),
+                                         (a1, b1), (a2, b2))
+
+        # is image completely off the screen?
+        if (a2 - a1 <= 0) or (b2 - b1 <= 0):
+            return None
+
+        return ((dst_x, dst_y), (a1, b1), (a2, b2))
+
+    def _use_tiles(self, viewer, rgbmap):
+        # tiled rendering is only possible for nearest neighbor sampling
+        # of unscaled 2D images with a color distribution that does not
+        # depend on the data
+        return (viewer.t_.get('tile_render', False) and self.optimize and
+                self.interpolation == 'basic' and
+                self.scale_x == 1.0 and self.scale_y == 1.0 and
+                len(self.image.shape) == 2 and
+                not rgbmap.get_dist().data_dependent)
+
+    def _render_tiles(self, viewer, cache, rgbmap, dstarr):
+        """Assemble the visible part of the image from color mapped
+        tiles, reusing tiles rendered for previous frames where possible.
+        """
+        area = self._calc_cutout_area(viewer)
+        if area is None:
+            return False
+        (dst_x, dst_y), (a1, b1), (a2, b2) = area
+
+        scale_x, scale_y = viewer.get_scale_xy()
+        scales = (scale_x, scale_y)
+        tile_size = max(16, int(viewer.t_.get('tile_size', 256)))
+        max_tiles = viewer.t_.get('tile_cache_size', 400)
+
+        # visible region, in pixel coordinates of the scaled image
+        wd, ht = self.image.get_size()
+        u_max = int(np.ceil(wd * scale_x))
+        v_max = int(np.ceil(ht * scale_y))
+        u1, v1 = int(a1 * scale_x), int(b1 * scale_y)
+        u2 = min(int(np.ceil((a2 + 1) * scale_x)), u_max)
+        v2 = min(int(np.ceil((b2 + 1) * scale_y)), v_max)
+        if (u2 <= u1) or (v2 <= v1):
+            return False
+
+        dst_order = viewer.get_rgb_order()
+        image_order = self.image.get_order()
+        get_order = dst_order
+        if ('A' in dst_order) and not ('A' in image_order):
+            get_order = dst_order.replace('A', '')
+
+        autocuts = self.autocuts
+        if autocuts is None:
+            autocuts = viewer.autocuts
+        # tiles are valid as long as none of these change
+        state = (scales, tuple(viewer.t_['cuts']), autocuts,
+                 rgbmap, rgbmap.get_version(), get_order)
+
+        tiles = cache.tiles
+        out = self._get_buffer(viewer, cache,
+                               (v2 - v1, u2 - u1, len(get_order)),
+                               rgbmap.dtype)
+
+        for ty in range(v1 // tile_size, (v2 - 1) // tile_size + 1):
+            tv1 = ty * tile_size
+            tv2 = min(tv1 + tile_size, v_max)
+            y1, y2 = max(v1, tv1), min(v2, tv2)
+
+            for tx in range(u1 // tile_size, (u2 - 1) // tile_size + 1):
+                tu1 = tx * tile_size
+                tu2 = min(tu1 + tile_size, u_max)
+                x1, x2 = max(u1, tu1), min(u2, tu2)
+
+                key = state + (tx, ty)
+                tile = tiles.get(key, None)
+                if tile is None:
+                    data = self.image.get_scaled_tile((tu1, tv1), (tu2, tv2),
+                                                      scales)
+                    tile = self._color_map(viewer, rgbmap, data, dst_order,
+                                           image_order, get_order)
+                    viewer.scratch.count_alloc(tile)
+                    tiles[key] = tile
+                    if len(tiles) > max_tiles:
+                        tiles.popitem(last=False)
+                else:
+                    tiles.move_to_end(key)
+
+                out[y1 - v1:y2 - v1, x1 - u1:x2 - u1] = \
+                    tile[y1 - tv1:y2 - tv1, x1 - tu1:x2 - tu1]
+
+        cache.rgbarr = out
+        cache.rgb_order = get_order
+
+        # calculate our offset from the pan position
+        dst_x += u1 / scale_x - a1
+        dst_y += v1 / scale_y - b1
+        pan_x, pan_y = viewer.get_pan()
+        pan_off = viewer.data_off
+        pan_x, pan_y = pan_x + pan_off, pan_y + pan_off
+        off_x, off_y = (dst_x - pan_x) * scale_x, (dst_y - pan_y) * scale_y
+
+        # dst position in the pre-transformed array should be calculated
+        # from the center of the array plus offsets
+        ht, wd, dp = dstarr.shape
+        cvs_x = int(np.round(wd / 2.0 + off_x))
+        cvs_y = int(np.round(ht / 2.0 + off_y))
+        cache.cvs_pos = (cvs_x, cvs_y)
+        return True
+
+    def _color_map(self, viewer, rgbmap, data, dst_order, image_order,
+                   get_order):
+        lut = self._get_int_lut(viewer, self.get_cache(viewer), rgbmap,
+                                data.dtype, dst_order, image_order, get_order)
+        if lut is not None:
+            return self._apply_int_lut(lut, data)
+
+        # apply visual changes prior to color mapping (cut levels, etc)
+        vmax = rgbmap.get_hash_size() - 1
+        newdata = self.apply_visuals(viewer, data, 0, vmax)
+
+        # result becomes an index array fed to the RGB mapper
+        if not np.issubdtype(newdata.dtype, np.dtype('uint')):
+            newdata = newdata.astype(np.uint)
+
+        rgbobj = rgbmap.get_rgbarray(newdata, order=dst_order,
+                                     image_order=image_order)
+        return rgbobj.get_array(get_order)
+
+    def _get_int_lut(self, viewer, cache, rgbmap, dtype, dst_order,
+                     image_order, get_order):
+        """Get a lookup table mapping every possible value of 8- or 16-bit
+        integer data directly to colors, or `None` if not applicable.
+        The table is indexed by the bit pattern of the value (i.e. the
+        data viewed as unsigned).
+        """
+        dtype = np.dtype(dtype)
+        if (not viewer.t_.get('int_lut', True) or
+                dtype.kind not in ('i', 'u') or dtype.itemsize > 2 or
+                len(image_order) > 1 or rgbmap.get_dist().data_dependent):
+            return None
+
+        autocuts = self.autocuts
+        if autocuts is None:
+            autocuts = viewer.autocuts
+        vmax = rgbmap.get_hash_size() - 1
+        key = (dtype.newbyteorder('='), tuple(viewer.t_['cuts']), autocuts,
+               vmax, rgbmap, rgbmap.get_version(), dst_order, get_order)
+        if cache.int_lut_key == key:
+            return cache.int_lut
+
+        # all possible values, ordered by their unsigned bit pattern
+        values = np.arange(2 ** (8 * dtype.itemsize)).reshape(1, -1)
+        values = values.astype('u%d' % dtype.itemsize).view(key[0])
+
+        newdata = self.apply_visuals(viewer, values, 0, vmax)
+        if not np.issubdtype(newdata.dtype, np.dtype('uint')):
+            newdata = newdata.astype(np.uint)
+
+        rgbobj = rgbmap.get_rgbarray(newdata, order=dst_order,
+                                     image_order=image_order)
+        lut = np.ascontiguousarray(rgbobj.get_array(get_order)[0])
+        cache.int_lut, cache.int_lut_key = lut, key
+        return lut
+
+    def _apply_int_lut(self, lut, data, out=None):
+        # reinterpret signed data as unsigned to index the table
+        data = data.view(data.dtype.str.replace('i', 'u'))
+        if out is None:
+            out = np.empty(data.shape + lut.shape[1:], dtype=lut.dtype)
+        if (lut.shape[1] * lut.itemsize == 4) and out.flags.c_contiguous:
+            # map each output pixel as one 32-bit word
+            np.take(lut.view(np.uint32).reshape(lut.shape[0]), data,
+                    out=out.view(np.uint32).reshape(data.shape))
+        else:
+            np.take(lut, data, axis=0, out=out)
+        return out
+
+    def _run_bands(self, viewer, pool, func, ht):
+        """Call `func(y1, y2)` for row bands covering `ht` rows, in
+        parallel on the thread pool `pool`.
+        """
+        num_bands = viewer.t_.get('render_threads', 1)
+        band_ht = max(64, int(np.ceil(ht / num_bands)))
+        futures = [pool.submit(func, y1, min(y1 + band_ht, ht))
+                   for y1 in range(0, ht, band_ht)]
+        for future in futures:
+            # propagates any exception raised in a band
+            future.result()
+
+    def _enlarge_draft(self, viewer, rgbarr, decimate):
+        # replicate each pixel of a draft into a decimate x decimate block
+        ht, wd, dp = rgbarr.shape
+        out = viewer.scratch.get_buffer('draft',
+                                        (ht * decimate, wd * decimate, dp),
+                                        rgbarr.dtype)
+        out.reshape((ht, decimate, wd, decimate, dp))[:] = \
+            rgbarr[:, np.newaxis, :, np.newaxis, :]
+        return out
+
+    def _get_buffer(self, viewer, cache, shape, dtype):
+        # get an output array for the color mapped image, reusing the
+        # one from the previous frame if it has the right shape and type
+        arr = cache.rgbarr
+        if (arr is None or arr.shape != shape or arr.dtype != dtype or
+                not arr.flags.writeable):
+            arr = np.empty(shape, dtype=dtype)
+            viewer.scratch.count_alloc(arr)
+        return arr
+
+    def _cut_levels_bands(self, viewer, pool, rgbmap, cutout):
+        vmax = rgbmap.get_hash_size() - 1
+        idx = np.empty(cutout.shape, dtype=np.uint)
+
+        def _cut_levels(y1, y2):
+            idx[y1:y2] = self.apply_visuals(viewer, cutout[y1:y2], 0, vmax)
+
+        self._run_bands(viewer, pool, _cut_levels, cutout.shape[0])
+        return idx
+
+    def _color_map_bands(self, viewer, pool, rgbmap, lut, cache, out,
+                         order, image_order):
+        if lut is not None:
+            data = cache.cutout
+
+            def _color_map(y1, y2):
+                self._apply_int_lut(lut, data[y1:y2], out=out[y1:y2])
+
+        else:
+            idx = cache.prergb
+
+            def _color_map(y1, y2):
+                rgbmap.get_rgbarray(idx[y1:y2], out=out[y1:y2], order=order,
+                                    image_order=image_order)
+
+        self._run_bands(viewer, pool, _color_map, out.shape[0])
+        return out
 
     def apply_visuals(self, viewer, data, vmin, vmax):
         if self.autocuts is not None:
@@ -492,7 +811,9 @@ class NormImage(Image):
 
     def _reset_cache(self, cache):
         cache.setvals(cutout=None, prergb=None, rgbarr=None,
-                      drawn=False, cvs_pos=(0, 0))
+                      drawn=False, cvs_pos=(0, 0),
+                      tiled=False, tiles=OrderedDict(), rgb_order=None,
+                      int_lut=None, int_lut_key=None, decimate=1)
         return cache
 
     def set_image(self, image):
@@ -0,0 +1,273 @@
+#
+# markers.py -- classes for large collections of markers drawn on ginga
+#                 canvases.
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+import numpy as np
+
+from ginga.canvas.CanvasObject import (CanvasObjectBase, _bool, _color,
+                                       MovePoint, register_canvas_types,
+                                       colors_plus_none, coord_names)
+from ginga.misc.ParamSet import Param
+
+__all__ = ['MarkerCollection']
+
+
+class MarkerCollection(CanvasObjectBase):
+    """Draws a collection of markers on a DrawingCanvas.
+    Parameters are:
+    x, y: arrays of 0-based coordinates of the centers in the data space
+    radius: radius based on the number of pixels in data space; either
+      a single value or an array with a value for each marker
+    Optional parameters for linesize, color, style, etc.  `style` and
+    `color` may also be sequences with a value for each marker.
+    The styles are 'circle', 'square', 'diamond', 'cross' and 'plus'.
+
+    The positions, radii, styles and colors of the markers are kept in
+    arrays and all the markers are mapped to the canvas together, which
+    makes a collection much faster to draw and to pick from than the
+    same number of separate Point or Circle objects (e.g. for the sources
+    of a catalog).
+    """
+
+    marker_styles = ('circle', 'square', 'diamond', 'cross', 'plus')
+
+    @classmethod
+    def get_params_metadata(cls):
+        return [
+            Param(name='coord', type=str, default='data',
+                  valid=coord_names,
+                  description="Set type of coordinates"),
+            Param(name='linewidth', type=int, default=1,
+                  min=1, max=20, widget='spinbutton', incr=1,
+                  description="Width of outline"),
+            Param(name='linestyle', type=str, default='solid',
+                  valid=['solid', 'dash'],
+                  description="Style of outline (default solid)"),
+            Param(name='alpha', type=float, default=1.0,
+                  min=0.0, max=1.0, widget='spinfloat', incr=0.05,
+                  description="Opacity of outline"),
+            Param(name='fill', type=_bool,
+                  default=False, valid=[False, True],
+                  description="Fill the interior"),
+            Param(name='fillalpha', type=float, default=1.0,
+                  min=0.0, max=1.0, widget='spinfloat', incr=0.05,
+                  description="Opacity of fill"),
+            Param(name='color',
+                  valid=colors_plus_none, type=_color, default='yellow',
+                  description="Color of markers without their own color"),
+        ]
+
+    def __init__(self, x, y, radius=5.0, style='circle', color='yellow',
+                 linewidth=1, linestyle='solid', alpha=1.0, fill=False,
+                 fillalpha=1.0, **kwdargs):
+        self.kind = 'markercollection'
+        if isinstance(color, str):
+            default_color = color
+        else:
+            default_color = 'yellow'
+        CanvasObjectBase.__init__(self, color=default_color,
+                                  linewidth=linewidth, linestyle=linestyle,
+                                  alpha=alpha, fill=fill,
+                                  fillalpha=fillalpha, **kwdargs)
+        self.set_markers(x, y, radius=radius, style=style, color=color)
+
+    def _per_marker(self, value, num, dtype):
+        # NOTE: a dtype of None lets strings get an array of the right
+        # length
+        if np.isscalar(value):
+            return np.full(num, value, dtype=dtype)
+        arr = np.asarray(value, dtype=dtype)
+        if arr.shape != (num,):
+            raise ValueError("expected a value or %d values, got shape %s" % (
+                num, str(arr.shape)))
+        return arr
+
+    def _check_styles(self, styles):
+        bad = set(np.unique(styles)) - set(self.marker_styles)
+        if len(bad) > 0:
+            raise ValueError("Bad marker style(s) %s: must be one of %s" % (
+                list(bad), self.marker_styles))
+
+    def set_markers(self, x, y, radius=5.0, style='circle', color=None):
+        """Replace all the markers.
+
+        Parameters
+        ----------
+        x, y : array-like
+            Coordinates of the centers of the markers.
+
+        radius : float or array-like
+            Radius of all the markers, or of each one.
+
+        style : str or sequence of str
+            Style of all the markers, or of each one.
+
+        color : str, sequence of str or `None`
+            Color of all the markers, or of each one.  If `None`, the
+            ``color`` attribute of the collection is used.
+
+        """
+        points = np.asarray((np.ravel(x), np.ravel(y)), dtype=np.double).T
+        num = len(points)
+        if color is None:
+            color = self.color
+        styles = self._per_marker(style, num, None)
+        self._check_styles(styles)
+
+        self.points = points
+        self.radius = self._per_marker(radius, num, np.double)
+        self.style = styles
+        self.colors = self._per_marker(color, num, None)
+
+    def add_markers(self, x, y, radius=5.0, style='circle', color=None):
+        """Add markers to the collection.  Parameters are as for
+        :meth:`set_markers`.
+        """
+        points = np.asarray((np.ravel(x), np.ravel(y)), dtype=np.double).T
+        num = len(points)
+        if color is None:
+            color = self.color
+        styles = self._per_marker(style, num, None)
+        self._check_styles(styles)
+
+        self.points = np.concatenate((self.points, points))
+        self.radius = np.concatenate((self.radius,
+                                      self._per_marker(radius, num,
+                                                       np.double)))
+        self.style = np.concatenate((self.style, styles))
+        self.colors = np.concatenate((self.colors,
+                                      self._per_marker(color, num, None)))
+
+    def get_center_pt(self):
+        if len(self.points) == 0:
+            return (0.0, 0.0)
+        return CanvasObjectBase.get_center_pt(self)
+
+    def get_llur(self):
+        points = np.asarray(self.get_data_points(), dtype=np.double)
+        if len(points) == 0:
+            return (0.0, 0.0, 0.0, 0.0)
+        x, y = points.T[:2]
+        return ((x - self.radius).min(), (y - self.radius).min(),
+                (x + self.radius).max(), (y + self.radius).max())
+
+    def get_edit_points(self, viewer):
+        return [MovePoint(*self.get_center_pt())]
+
+    def get_markers_at(self, pt, scales=(1.0, 1.0), min_radius=0.0):
+        """Get the indexes of the markers whose radius covers point `pt`
+        (in data coordinates).  If `scales` are given, distances and
+        radii are scaled by them; markers are considered at least
+        `min_radius` (in the scaled units) in size.
+        """
+        if len(self.points) == 0:
+            return np.zeros(0, dtype=int)
+        scale_x, scale_y = scales
+        x, y = pt[:2]
+        points = np.asarray(self.get_data_points(), dtype=np.double)
+        a_arr, b_arr = points.T[:2]
+        dist = np.hypot((a_arr - x) * scale_x, (b_arr - y) * scale_y)
+        radius = np.maximum(self.radius * min(scale_x, scale_y), min_radius)
+        return np.flatnonzero(dist <= radius)
+
+    def select_markers_at(self, viewer, pt):
+        """Get the indexes of the markers near point `pt` (in data
+        coordinates) as seen in `viewer`; small markers are hit within
+        ``cap_radius`` pixels.
+        """
+        return self.get_markers_at(pt, scales=viewer.get_scale_xy(),
+                                   min_radius=self.cap_radius)
+
+    def contains_pts(self, pts):
+        return np.asarray([len(self.get_markers_at(pt)) > 0
+                           for pt in pts], dtype=bool)
+
+    def select_contains_pt(self, viewer, pt):
+        return len(self.select_markers_at(viewer, pt)) > 0
+
+    def _get_visible(self, viewer, points):
+        # indexes of markers that may be visible in the window
+        pts = np.asarray(viewer.get_pan_rect())
+        x1, y1 = pts[:, 0].min(), pts[:, 1].min()
+        x2, y2 = pts[:, 0].max(), pts[:, 1].max()
+        margin = self.radius + (self.linewidth + 1) / viewer.get_scale_min()
+        a_arr, b_arr = points.T[:2]
+        return np.flatnonzero((a_arr + margin >= x1) &
+                              (a_arr - margin <= x2) &
+                              (b_arr + margin >= y1) &
+                              (b_arr - margin <= y2))
+
+    def draw(self, viewer):
+        if len(self.points) == 0:
+            return
+        points = np.asarray(self.get_data_points(), dtype=np.double)
+        idx = self._get_visible(viewer, points)
+        if len(idx) == 0:
+            return
+        points = points[idx, :2]
+        radius = self.radius[idx]
+
+        # map centers, and points offset by the radius, to the canvas
+        # in one go
+        edges = points + np.asarray((0.0, 1.0)) * radius[:, np.newaxis]
+        cpoints = np.asarray(self.get_cpoints(viewer, points=points))
+        cedges = np.asarray(self.get_cpoints(viewer, points=edges))
+        cx, cy = cpoints.T[:2]
+        cradius = np.hypot(*(cedges - cpoints).T[:2])
+
+        cr = viewer.renderer.setup_cr(self)
+
+        # draw the markers in groups of the same color and style
+        colors, c_idx = np.unique(self.colors[idx], return_inverse=True)
+        styles, s_idx = np.unique(self.style[idx], return_inverse=True)
+        groups = c_idx * len(styles) + s_idx
+        for group in np.unique(groups):
+            color = colors[group // len(styles)]
+            style = styles[group % len(styles)]
+            sel = (groups == group)
+
+            cr.set_line(color, alpha=self.alpha, linewidth=self.linewidth,
+                        style=self.linestyle)
+            if self.fill:
+                cr.set_fill(color, alpha=self.fillalpha)
+            else:
+                cr.set_fill(None)
+            self._draw_markers(cr, style, cx[sel], cy[sel], cradius[sel])
+
+    def _draw_markers(self, cr, style, cx, cy, cradius):
+        cx1, cy1 = (cx - cradius).tolist(), (cy - cradius).tolist()
+        cx2, cy2 = (cx + cradius).tolist(), (cy + cradius).tolist()
+
+        if style == 'circle':
+            for x, y, r in zip(cx.tolist(), cy.tolist(), cradius.tolist()):
+                cr.draw_circle(x, y, r)
+
+        elif style == 'square':
+            for x1, y1, x2, y2 in zip(cx1, cy1, cx2, cy2):
+                cr.draw_polygon(((x1, y1), (x2, y1), (x2, y2), (x1, y2)))
+
+        elif style == 'diamond':
+            for x, y, x1, y1, x2, y2 in zip(cx.tolist(), cy.tolist(),
+                                            cx1, cy1, cx2, cy2):
+                cr.draw_polygon(((x, y1), (x2, y), (x, y2), (x1, y)))
+
+        elif style == 'cross':
+            for x1, y1, x2, y2 in zip(cx1, cy1, cx2, cy2):
+                cr.draw_line(x1, y1, x2, y2)
+                cr.draw_line(x1, y2, x2, y1)
+
+        else:
+            # plus
+            for x, y, x1, y1, x2, y2 in zip(cx.tolist(), cy.tolist(),
+                                            cx1, cy1, cx2, cy2):
+                cr.draw_line(x1, y, x2, y)
+                cr.draw_line(x, y1, x, y2)
+
+
+# register our types
+register_canvas_types(dict(markercollection=MarkerCollection))
+
+# END
@@ -198,9 +198,11 @@ class OnePointOneRadiusMixin(OnePointMixin):
 
     def scale_by_factors(self, factors):
         self.radius *= np.asarray(factors).max()
+        self.update_index()
 
     def scale_by(self, scale_x, scale_y):
         self.radius *= max(scale_x, scale_y)
+        self.update_index()
 
 
 class OnePointTwoRadiusMixin(OnePointMixin):
@@ -259,11 +261,13 @@ class OnePointTwoRadiusMixin(OnePointMixin):
     def rotate_by_deg(self, thetas):
         new_rot = math.fmod(self.rot_deg + thetas[0], 360.0)
         self.rot_deg = new_rot
+        self.update_index()
         return new_rot
 
     def scale_by(self, scale_x, scale_y):
         self.xradius *= scale_x
         self.yradius *= scale_y
+        self.update_index()
 
     def get_llur(self):
         points = (self.crdmap.offset_pt((self.x, self.y),
@@ -158,6 +158,7 @@ class GingaVision(object):
                 # Update the image data in-place.  Viewer frame will be
                 # updated at the next refresh interval.
                 self.pdata[::] = img[::]
+                self.viewer.redraw(whence=0)
 
         except Exception as e:
             self.logger.error("Error updating image: %s" % (str(e)))
@@ -16,6 +16,9 @@ class Callbacks(object):
 
     def __init__(self):
         self.cb = {}
+        # blocking state of callbacks, only created for a callback when
+        # it is first blocked (saves memory for objects with many
+        # callbacks that are never blocked, like canvas objects)
         self._cb_block = {}
 
     # TODO: This should raise KeyError or simply do nothing if unknown key
@@ -25,7 +28,7 @@ class Callbacks(object):
             self.cb[name][:] = []
         except KeyError:
             self.cb[name] = []
-        self._cb_block[name] = dict(count=0, defer_list=[], defer_type=None)
+        self._cb_block.pop(name, None)
 
     # TODO: Should this call clear_callback()? Should create empty list here
     # only
@@ -52,11 +55,20 @@ class Callbacks(object):
             raise CallbackError("No callback category of '%s'" % (
                 name))
 
+    def _get_cb_block(self, name):
+        d = self._cb_block.get(name, None)
+        if d is None:
+            if name not in self.cb:
+                raise KeyError(name)
+            d = dict(count=0, defer_list=[], defer_type=None)
+            self._cb_block[name] = d
+        return d
+
     def block_callback(self, name):
-        self._cb_block[name]['count'] += 1
+        self._get_cb_block(name)['count'] += 1
 
     def unblock_callback(self, name):
-        self._cb_block[name]['count'] -= 1
+        self._get_cb_block(name)['count'] -= 1
 
     def suppress_callback(self, name, defer_type=None):
         return SuppressCallback(self, name, defer_type=defer_type)
@@ -115,9 +127,9 @@ class Callbacks(object):
         if len(self.cb[name]) == 0:
             return False
 
-        if self._cb_block[name]['count'] > 0:
+        d = self._cb_block.get(name, None)
+        if d is not None and d['count'] > 0:
             # callback temporarily blocked
-            d = self._cb_block[name]
             defer_list = d['defer_list']
             defer_type = d['defer_type']
             if defer_type == 'all':
@@ -131,8 +143,8 @@ class Callbacks(object):
         return self._do_callbacks(name, args, kwargs)
 
     def do_suppressed_callbacks(self, name):
-        if self._cb_block[name]['count'] == 0:
-            d = self._cb_block[name]
+        d = self._cb_block.get(name, None)
+        if d is not None and d['count'] == 0:
             defer_list = d['defer_list']
             d['defer_list'] = []
             d['defer_type'] = None
@@ -190,7 +202,7 @@ class SuppressCallback(object):
 
     def __enter__(self):
         try:
-            d = self.cb_obj._cb_block[self.cb_name]
+            d = self.cb_obj._get_cb_block(self.cb_name)
             d['count'] += 1
             d['defer_type'] = self.defer_type
         except KeyError:
@@ -6,8 +6,14 @@
 #
 # TODO: use (or subclass) python collections.deque instead?
 #
+import itertools
 import threading
 
+from ginga.misc import Callback
+
+# ticks of a clock for the times that items are added and used
+_clock = itertools.count()
+
 
 class TimeoutError(Exception):
     pass
@@ -17,17 +23,131 @@ class Empty(Exception):
     pass
 
 
-class Datasrc(object):
-    """Class to handle internal data cache."""
-    def __init__(self, length=0):
+def get_nbytes(value):
+    """Get the number of bytes of memory used by `value` (e.g. an image),
+    including its derived data, if that can be found, otherwise 0.
+    """
+    if hasattr(value, 'get_memory_usage'):
+        return value.get_memory_usage()
+    return getattr(value, 'nbytes', 0)
+
+
+class MemoryBudget(object):
+    """A limit on the memory used by the items of several data caches
+    together (e.g. the images in all the channels of the reference viewer).
+
+    When the items of the caches use more than `max_bytes`, the least
+    recently used items are ejected from whichever cache holds them:
+    first the items that were never used (in the order they were added),
+    then the others in the order they were last used.
+
+    Parameters
+    ----------
+    max_bytes : int or `None`
+        Memory budget (in bytes).  If `None` or 0, there is no limit.
+
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.datasrcs = []
+        self.lock = threading.RLock()
+
+    def add_datasrc(self, datasrc):
+        with self.lock:
+            if datasrc not in self.datasrcs:
+                self.datasrcs.append(datasrc)
+
+    def remove_datasrc(self, datasrc):
+        with self.lock:
+            if datasrc in self.datasrcs:
+                self.datasrcs.remove(datasrc)
+
+    def get_nbytes(self):
+        """Get the memory used by the items of all the caches."""
+        with self.lock:
+            return sum([datasrc.get_nbytes() for datasrc in self.datasrcs])
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.eject_old()
+
+    def eject_old(self, keep=None):
+        """Eject the least recently used items until the items of all the
+        caches fit in the budget.  The most recently used item, and item
+        `keep` (a ``(datasrc, key)`` pair, e.g. an item just added), are
+        kept in any case.
+        """
+        with self.lock:
+            if not self.max_bytes:
+                return
+            usage = [datasrc.get_usage() for datasrc in self.datasrcs]
+            items = sorted([(used, nbytes, key, datasrc)
+                            for datasrc, items in zip(self.datasrcs, usage)
+                            for key, used, nbytes in items],
+                           key=lambda item: item[0])
+            nbytes = sum([item[1] for item in items])
+            for used, size, key, datasrc in items[:-1]:
+                if nbytes <= self.max_bytes:
+                    break
+                if (datasrc, key) == keep:
+                    continue
+                if datasrc.eject(key):
+                    nbytes -= size
+
+    def fits(self, nbytes):
+        """Check whether `nbytes` more would fit in the budget, without
+        ejecting any items.
+        """
+        return (not self.max_bytes or
+                self.get_nbytes() + nbytes <= self.max_bytes)
+
+
+class Datasrc(Callback.Callbacks):
+    """Class to handle internal data cache.
+
+    Parameters
+    ----------
+    length : int or `None`
+        Maximum number of items held.  If `None` or 0, there is no limit.
+
+    max_bytes : int or `None`
+        Maximum memory (in bytes) used by the items held (see
+        `get_nbytes`).  If `None` or 0, there is no limit.
+
+    budget : `MemoryBudget` or `None`
+        A limit on the memory used by the items of this and other caches
+        together.
+
+    Items are ejected in the order they were added to keep within
+    `length`.  To keep within the memory limits, the items that were
+    never marked as used with `touch` (e.g. images that were preloaded,
+    but not viewed) are ejected first, in the order they were added,
+    then the others in the order they were last used.  An "ejected"
+    callback is made for each ejected item.
+    """
+    def __init__(self, length=0, max_bytes=None, budget=None):
+        super(Datasrc, self).__init__()
+
         self.length = length
+        self.max_bytes = max_bytes
+        self.budget = budget
         self.cursor = -1
         self.datums = {}
         self.history = []
         self.sortedkeys = []
+        # ``(used, time)`` that items were added or last used, in the
+        # order they are kept (see get_usage())
+        self.used = {}
         self.cond = threading.Condition()
         self.newdata = threading.Event()
 
+        for name in ('ejected',):
+            self.enable_callback(name)
+
+        if budget is not None:
+            budget.add_datasrc(self)
+
     def __getitem__(self, key):
         with self.cond:
             return self.datums[key]
@@ -59,11 +179,24 @@ class Datasrc(object):
             self.history.append(key)
 
             self.datums[key] = value
-            self._eject_old()
+            # not used until marked with touch()
+            self.used[key] = (False, next(_clock))
+            ejected = self._eject_old(keep=key)
 
             self.newdata.set()
             self.cond.notify()
 
+        self._ejected(ejected, keep=key)
+
+    def touch(self, key):
+        """Mark item `key` as used now (e.g. an image being viewed), so
+        that it is among the last to be ejected to keep within the memory
+        limits.
+        """
+        with self.cond:
+            if key in self.datums:
+                self.used[key] = (True, next(_clock))
+
     def pop_one(self):
         with self.cond:
             if len(self.history) == 0:
@@ -83,21 +216,79 @@ class Datasrc(object):
             val = self.datums[key]
             self.history.remove(key)
             del self.datums[key]
+            self.used.pop(key, None)
 
             self.sortedkeys = list(self.datums.keys())
             self.sortedkeys.sort()
             return val
 
-    def _eject_old(self):
+    def _eject_old(self, keep=None):
+        ejected = []
         # Eject oldest cache unless there is no cache limit
         if (self.length is not None) and (self.length > 0):
             while len(self.history) > self.length:
                 oldest = self.history.pop(0)
-                del self.datums[oldest]
+                ejected.append((oldest, self.datums.pop(oldest)))
+                self.used.pop(oldest, None)
+
+        if self.max_bytes:
+            # Eject least recently used items to keep within the memory
+            # limit, but keep the most recently used one and `keep`
+            items = sorted(self.get_usage(), key=lambda item: item[1])
+            nbytes = sum([item[2] for item in items])
+            for key, used, size in items[:-1]:
+                if nbytes <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self.history.remove(key)
+                ejected.append((key, self.datums.pop(key)))
+                self.used.pop(key, None)
+                nbytes -= size
 
         # Update sorted keys regardless
         self.sortedkeys = list(self.datums.keys())
         self.sortedkeys.sort()
+        return ejected
+
+    def _ejected(self, ejected, keep=None):
+        # NOTE: called without holding the lock
+        for key, value in ejected:
+            self.make_callback('ejected', key, value)
+
+        if self.budget is not None:
+            if keep is not None:
+                keep = (self, keep)
+            self.budget.eject_old(keep=keep)
+
+    def eject(self, key):
+        """Eject item `key`, as if to keep within the limits of the
+        cache.  Returns `True` if the item was there.
+        """
+        with self.cond:
+            if key not in self.datums:
+                return False
+            self.history.remove(key)
+            value = self.datums.pop(key)
+            self.used.pop(key, None)
+            self.sortedkeys = sorted(self.datums.keys())
+
+        self.make_callback('ejected', key, value)
+        return True
+
+    def get_usage(self):
+        """Get a list of ``(key, used, nbytes)`` for the items held, where
+        `used` orders the items from the least to the most recently used
+        (items never marked with `touch` first) and `nbytes` is the memory
+        used by the item.
+        """
+        with self.cond:
+            return [(key, self.used.get(key, (False, -1)), get_nbytes(value))
+                    for key, value in self.datums.items()]
+
+    def get_nbytes(self):
+        """Get the memory (in bytes) used by the items held."""
+        return sum([item[2] for item in self.get_usage()])
 
     def index(self, key):
         with self.cond:
@@ -149,6 +340,19 @@ class Datasrc(object):
     def set_bufsize(self, length):
         with self.cond:
             self.length = length
-            self._eject_old()
+            ejected = self._eject_old()
+
+        self._ejected(ejected)
+
+    def get_max_bytes(self):
+        with self.cond:
+            return self.max_bytes
+
+    def set_max_bytes(self, max_bytes):
+        with self.cond:
+            self.max_bytes = max_bytes
+            ejected = self._eject_old()
+
+        self._ejected(ejected)
 
 #END
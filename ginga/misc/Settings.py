@@ -7,6 +7,7 @@
 import os
 import re
 import ast
+from contextlib import contextmanager
 
 import numpy as np
 
@@ -22,6 +23,15 @@ class SettingError(Exception):
     pass
 
 
+def _same_value(value1, value2):
+    try:
+        return bool(value1 == value2)
+
+    except Exception:
+        # e.g. arrays
+        return value1 is value2
+
+
 class Setting(Callback.Callbacks):
 
     def __init__(self, value=unset_value, name=None, logger=None,
@@ -40,9 +50,21 @@ class Setting(Callback.Callbacks):
         for name in ('set', ):
             self.enable_callback(name)
 
+        # for deferring callbacks in a transaction (see
+        # SettingGroup.transaction())
+        self._txn_level = 0
+        self._txn_pending = False
+
     def _check_none(self, value):
         return value
 
+    def make_callback(self, name, *args, **kwargs):
+        if name == 'set' and self._txn_level > 0:
+            # in a transaction: call back when it ends
+            self._txn_pending = True
+            return False
+        return super(Setting, self).make_callback(name, *args, **kwargs)
+
     def set(self, value, callback=True):
         self.value = self.check_fn(value)
         if callback:
@@ -210,6 +232,68 @@ class SettingGroup(object):
     def __contains__(self, key):
         return key in self.group
 
+    @contextmanager
+    def transaction(self):
+        """Context manager that defers the callbacks of the settings in
+        this group until the end of the ``with`` block.
+
+        Settings still take their new values immediately, but each
+        setting that was changed makes a single callback (with its last
+        value) when the block is left, in the order of the settings in
+        the group.  If those callbacks change settings again, another
+        round of callbacks is made for the settings whose value is
+        different from the one they were last called back with.
+        Transactions can be nested; callbacks are made when the
+        outermost one ends.
+
+        Example::
+
+            with settings.transaction():
+                settings.set(scale=(2.0, 2.0), pan=(100.0, 100.0))
+                settings.set(scale=(4.0, 4.0))
+
+        """
+        settings, seen = [], set()
+        for setting in self.group.values():
+            # a setting may be shared under more than one key
+            if id(setting) not in seen:
+                seen.add(id(setting))
+                settings.append(setting)
+
+        for setting in settings:
+            setting._txn_level += 1
+        try:
+            yield self
+
+        finally:
+            try:
+                if all(setting._txn_level == 1 for setting in settings):
+                    self._commit(settings)
+            finally:
+                for setting in settings:
+                    setting._txn_level -= 1
+
+    def _commit(self, settings, max_rounds=10):
+        # make the callbacks deferred by transaction()
+        notified = {}
+        for i in range(max_rounds):
+            pending = [setting for setting in settings
+                       if setting._txn_pending]
+            if len(pending) == 0:
+                break
+            for setting in pending:
+                setting._txn_pending = False
+                value = setting.value
+                if (id(setting) in notified and
+                        _same_value(notified[id(setting)], value)):
+                    continue
+                notified[id(setting)] = value
+                Callback.Callbacks.make_callback(setting, 'set', value)
+        else:
+            if self.logger is not None:
+                self.logger.warning("settings still changing after %d "
+                                    "rounds of callbacks" % (max_rounds))
+
     def clear_callbacks(self, keylist=None):
         if keylist is None:
             keylist = self.group.keys()
@@ -416,4 +416,27 @@ class TestCallbacks(object):
         actual = test_callbacks.make_callback("test_name")
         assert expected == actual
 
+    def test_suppress_callback(self):
+        test_callbacks = Callback.Callbacks()
+        calls = []
+
+        def test_callback_function(obj, *args, **kwargs):
+            calls.append(args)
+
+        test_callbacks.set_callback("test_name", test_callback_function)
+        # blocking state is only made when a callback is first blocked
+        assert "test_name" not in test_callbacks._cb_block
+
+        with test_callbacks.suppress_callback("test_name", 'last'):
+            test_callbacks.make_callback("test_name", 1)
+            test_callbacks.make_callback("test_name", 2)
+            assert calls == []
+        assert calls == [(2, )]
+
+        test_callbacks.block_callback("test_name")
+        test_callbacks.make_callback("test_name", 3)
+        test_callbacks.unblock_callback("test_name")
+        test_callbacks.make_callback("test_name", 4)
+        assert calls == [(2, ), (4, )]
+
 # END
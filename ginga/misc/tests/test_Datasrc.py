@@ -0,0 +1,94 @@
+"""Unit Tests for the Datasrc class"""
+
+import numpy as np
+
+from ginga.misc.Datasrc import Datasrc, MemoryBudget
+
+
+class TestDatasrc(object):
+
+    def _ejected_cb(self, datasrc, key, value, ejected):
+        ejected.append(key)
+
+    def test_length(self):
+        datasrc = Datasrc(2)
+        for key in 'abc':
+            datasrc[key] = np.zeros(10)
+        assert datasrc.keys(sort='time') == ['b', 'c']
+
+    def test_max_bytes(self):
+        ejected = []
+        datasrc = Datasrc(0, max_bytes=250)
+        datasrc.add_callback('ejected', self._ejected_cb, ejected)
+        datasrc['a'] = np.zeros(10)
+        datasrc['b'] = np.zeros(10)
+        datasrc['c'] = np.zeros(10)
+        assert datasrc.get_nbytes() == 240
+
+        # items never used are ejected first, in the order they were
+        # added
+        datasrc.touch('a')
+        datasrc['d'] = np.zeros(10)
+        assert ejected == ['b']
+        assert sorted(datasrc.keys()) == ['a', 'c', 'd']
+
+        # the item added and the most recently used one are kept even if
+        # they are too big
+        datasrc['e'] = np.zeros(100)
+        assert ejected == ['b', 'c', 'd']
+        assert sorted(datasrc.keys()) == ['a', 'e']
+
+        datasrc.set_max_bytes(None)
+        datasrc['f'] = np.zeros(100)
+        assert len(datasrc) == 3
+
+    def test_budget(self):
+        ejected = []
+        budget = MemoryBudget(max_bytes=250)
+        datasrc1 = Datasrc(0, budget=budget)
+        datasrc2 = Datasrc(0, budget=budget)
+        for datasrc in (datasrc1, datasrc2):
+            datasrc.add_callback('ejected', self._ejected_cb, ejected)
+
+        datasrc1['a'] = np.zeros(10)
+        datasrc2['b'] = np.zeros(10)
+        datasrc1['c'] = np.zeros(10)
+        datasrc1.touch('a')
+        datasrc2['d'] = np.zeros(10)
+        assert ejected == ['b']
+        assert budget.get_nbytes() == 240
+        assert sorted(datasrc1.keys()) == ['a', 'c']
+
+        budget.set_max_bytes(100)
+        assert ejected == ['b', 'c', 'd']
+        assert list(datasrc1.keys()) == ['a']
+        assert budget.fits(0) and not budget.fits(80)
+
+    def test_budget_viewed(self):
+        # images shown in two channels, with images preloaded (added but
+        # not viewed) in the second one
+        ejected = []
+        budget = MemoryBudget(max_bytes=250)
+        ch1 = Datasrc(0, budget=budget)
+        ch2 = Datasrc(0, budget=budget)
+        for datasrc in (ch1, ch2):
+            datasrc.add_callback('ejected', self._ejected_cb, ejected)
+
+        ch1['shown'] = np.zeros(10)
+        ch1.touch('shown')
+        ch2['cur'] = np.zeros(10)
+        ch2.touch('cur')
+        ch2['pre1'] = np.zeros(10)
+        ch2['pre2'] = np.zeros(10)
+
+        # the images being viewed are kept
+        assert ejected == ['pre1']
+        assert list(ch1.keys()) == ['shown']
+        assert sorted(ch2.keys()) == ['cur', 'pre2']
+
+        # until other images are viewed
+        ch2.touch('pre2')
+        ch2['new'] = np.zeros(10)
+        ch2.touch('new')
+        assert ejected == ['pre1', 'shown']
+        assert list(ch1.keys()) == []
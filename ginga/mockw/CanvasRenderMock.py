@@ -98,9 +98,17 @@ class CanvasRenderer(render.RendererBase):
     def __init__(self, viewer):
         render.RendererBase.__init__(self, viewer)
 
+        self.kind = 'mock'
         self.rgb_order = 'BGRA'
         self.surface = None
 
+    def render_image(self, rgbobj, dst_x, dst_y):
+        """Render the image represented by (rgbobj) at dst_x, dst_y
+        in the pixel space.
+        *** internal method-- do not use ***
+        """
+        self.viewer.render_image(rgbobj, dst_x, dst_y)
+
     def setup_cr(self, shape):
         cr = RenderContext(self, self.viewer, self.surface)
         cr.initialize_from_shape(shape, font=False)
@@ -4,6 +4,7 @@
 # This is open-source software licensed under a BSD license.
 # Please see the file LICENSE.txt for details.
 #
+import threading
 import time
 
 from ginga.misc import Bunch, Datasrc, Callback, Future, Settings
@@ -30,8 +31,12 @@ class Channel(Callback.Callbacks):
     datasrc : `~ginga.misc.Datasrc.Datasrc`
         Data cache.
 
+    budget : `~ginga.misc.Datasrc.MemoryBudget` or `None`
+        Memory budget shared with other channels, if no `datasrc` is
+        given.
+
     """
-    def __init__(self, name, fv, settings, datasrc=None):
+    def __init__(self, name, fv, settings, datasrc=None, budget=None):
         super(Channel, self).__init__()
 
         self.logger = fv.logger
@@ -53,18 +58,47 @@ class Channel(Callback.Callbacks):
         self.viewer_dict = {}
         if datasrc is None:
             num_images = self.settings.get('numImages', 1)
-            datasrc = Datasrc.Datasrc(num_images)
+            max_mb = self.settings.get('image_cache_mb', 0)
+            datasrc = Datasrc.Datasrc(num_images,
+                                      max_bytes=int(max_mb * 1024 ** 2),
+                                      budget=budget)
+            self.settings.get_setting('image_cache_mb').add_callback(
+                'set', self._image_cache_cb)
         self.datasrc = datasrc
+        self.datasrc.add_callback('ejected', self._image_ejected_cb)
         self.cursor = -1
         self.history = []
         self.image_index = {}
         # external entities can attach stuff via this attribute
         self.extdata = Bunch.Bunch()
+        # direction of the last navigation (1 = next, -1 = previous)
+        self.nav_direction = 1
+        # images being preloaded, and the ones that should be
+        self._preloads = {}
+        self._preload_names = []
+        self._preload_pending = {}
+        self._preload_lock = threading.RLock()
 
         self._configure_sort()
         self.settings.get_setting('sort_order').add_callback(
             'set', self._sort_changed_ext_cb)
 
+    def _image_cache_cb(self, setting, value):
+        self.datasrc.set_max_bytes(int(value * 1024 ** 2))
+
+    def _image_ejected_cb(self, datasrc, imname, image):
+        # image was dropped from memory to keep within the limits of the
+        # cache; it can be reloaded from its image future
+        self.logger.debug("image '%s' ejected from memory" % (imname))
+        if imname in self.image_index:
+            info = self.image_index[imname]
+            self.fv.make_async_gui_callback('add-image-info', self, info)
+
+            if self.fv.spill_cache is not None:
+                # keep the data on local disk, to reopen it quickly
+                self.fv.nongui_do(self.fv.spill_cache.spill,
+                                  (self.name, imname), image)
+
     def connect_viewer(self, viewer):
         if viewer not in self.viewers:
             self.viewers.append(viewer)
@@ -115,6 +149,9 @@ class Channel(Callback.Callbacks):
             if cur_image == image:
                 self.refresh_cursor_image()
 
+        if self.fv.spill_cache is not None:
+            self.fv.spill_cache.discard((self.name, imname))
+
         self.fv.make_async_gui_callback('remove-image', self.name,
                                         info.name, info.path)
 
@@ -154,6 +191,23 @@ class Channel(Callback.Callbacks):
         self.logger.debug("Adding image '%s' in channel %s" % (
             imname, self.name))
 
+        eject = []
+        with self._preload_lock:
+            nbytes = self._preload_pending.get(imname, None)
+            if silent and nbytes is not None:
+                # preloaded image (see end_preload): make room for it,
+                # unless it no longer fits
+                eject = self._preload_room(imname, nbytes)
+                self._preload_pending.pop(imname, None)
+                if eject is None:
+                    self.logger.debug("not enough memory to preload %s" % (
+                        imname))
+                    return
+
+        for key in eject:
+            self.logger.debug("ejecting %s to preload %s" % (key, imname))
+            self.datasrc.eject(key)
+
         self.datasrc[imname] = image
 
         # Has this image been loaded into a channel before?
@@ -264,6 +318,7 @@ class Channel(Callback.Callbacks):
         else:
             self.cursor -= 1
 
+        self.nav_direction = -1
         self.refresh_cursor_image()
 
         return True
@@ -279,10 +334,149 @@ class Channel(Callback.Callbacks):
         else:
             self.cursor += 1
 
+        self.nav_direction = 1
         self.refresh_cursor_image()
 
         return True
 
+    def get_neighbors(self):
+        """Get the infos of the images around the current one, in the
+        order they should be preloaded: alternately ahead of and behind
+        the current image in the direction of navigation, nearest first.
+        """
+        num = len(self.history)
+        if not (0 <= self.cursor < num):
+            return []
+        num_ahead = self.settings.get('preload_ahead', 2)
+        num_behind = self.settings.get('preload_behind', 1)
+        # don't preload images just to have them ejected again
+        length = self.datasrc.get_bufsize()
+        if length:
+            num_ahead = min(num_ahead, length - 1)
+            num_behind = min(num_behind, length - 1 - num_ahead)
+
+        offsets = []
+        for i in range(1, max(num_ahead, num_behind) + 1):
+            if i <= num_ahead:
+                offsets.append(i * self.nav_direction)
+            if i <= num_behind:
+                offsets.append(-i * self.nav_direction)
+
+        # NOTE: navigation wraps around the ends of the history
+        infos, seen = [], set([self.cursor])
+        for offset in offsets:
+            index = (self.cursor + offset) % num
+            if index not in seen:
+                seen.add(index)
+                infos.append(self.history[index])
+        return infos
+
+    def preload_neighbors(self):
+        """Preload the images around the current one (see
+        `get_neighbors`) in the background, and cancel the preloading of
+        images that are no longer around it.
+        """
+        infos = [info for info in self.get_neighbors()
+                 if info.path is not None]
+        autocuts = self.settings.get('preload_autocuts', False)
+        with self._preload_lock:
+            self._preload_names = [info.name for info in infos]
+            for imname, ticket in list(self._preloads.items()):
+                if imname not in self._preload_names:
+                    self.logger.debug("cancelling preload of %s" % (imname))
+                    ticket.cancelled = True
+                    del self._preloads[imname]
+
+            for info in infos:
+                if info.name in self.datasrc or info.name in self._preloads:
+                    continue
+                ticket = Bunch.Bunch(cancelled=False)
+                self._preloads[info.name] = ticket
+                self.fv.add_preload(self.name, info, autocuts=autocuts,
+                                    ticket=ticket)
+
+    def end_preload(self, imname, image, ticket):
+        """Called (from a non-gui thread) when image `imname` was
+        preloaded with `ticket` (see `preload_neighbors`), or failed to be
+        if `image` is `None`.  Returns `True` if the image should be added
+        to the channel: the preload was not cancelled, and the image fits
+        within the limits of the channel and of the memory budget shared
+        with other channels, together with the current image and its
+        neighbors.  Room is made for it when it is added (see `add_image`).
+        """
+        with self._preload_lock:
+            if self._preloads.get(imname, None) is ticket:
+                del self._preloads[imname]
+            if image is None or ticket.cancelled:
+                return False
+
+            nbytes = Datasrc.get_nbytes(image)
+            if self._preload_room(imname, nbytes) is None:
+                self.logger.debug("not enough memory to preload %s" % (
+                    imname))
+                return False
+
+            self._preload_pending[imname] = nbytes
+            return True
+
+    def _preload_room(self, imname, nbytes):
+        """Find the images to eject from memory to make room for the
+        preloaded image `imname`, of `nbytes` bytes.  Returns their names,
+        least recently viewed first, or `None` if the image does not fit.
+        """
+        # NOTE: called with the preload lock held
+        keep = set(self._preload_names)
+        keep.discard(imname)
+        if 0 <= self.cursor < len(self.history):
+            keep.add(self.history[self.cursor].name)
+        usage = self.datasrc.get_usage()
+        kept = [item for item in usage if item[0] in keep]
+        others = sorted([item for item in usage if item[0] not in keep],
+                        key=lambda item: item[1])
+        # images accepted before, but maybe not added yet
+        names = set([item[0] for item in usage])
+        self._preload_pending = dict(
+            [(name, size) for name, size in self._preload_pending.items()
+             if (name in keep or name == imname) and name not in names])
+        pending = [size for name, size in self._preload_pending.items()
+                   if name != imname]
+
+        max_bytes = int(self.settings.get('preload_max_mb', 0) *
+                        1024 ** 2)
+        if max_bytes:
+            # memory used by the preloaded neighbors
+            used = sum([item[2] for item in kept
+                        if item[0] in self._preload_names] + pending)
+            if used + nbytes > max_bytes:
+                return None
+
+        num = len(kept) + len(pending) + 1
+        total = nbytes + sum([item[2] for item in kept] + pending)
+        length = self.datasrc.get_bufsize()
+        max_bytes = self.datasrc.get_max_bytes()
+        # room left in the budget by the images of the other channels
+        budget = self.datasrc.budget
+        budget_bytes = None
+        if budget is not None and budget.max_bytes:
+            budget_bytes = (budget.max_bytes - budget.get_nbytes() +
+                            sum([item[2] for item in usage]))
+
+        def fits(num, total):
+            return ((not length or num <= length) and
+                    (not max_bytes or total <= max_bytes) and
+                    (budget_bytes is None or total <= budget_bytes))
+
+        if not fits(num, total):
+            return None
+
+        eject = []
+        while len(others) > 0:
+            if fits(num + len(others),
+                    total + sum([item[2] for item in others])):
+                break
+            eject.append(others.pop(0)[0])
+        return eject
+
     def _add_info(self, info):
         if info.name in self.image_index:
             # image info is already present
@@ -372,6 +566,11 @@ class Channel(Callback.Callbacks):
 
     def switch_image(self, image):
 
+        imname = image.get('name', None)
+        if imname is not None:
+            # image is the least likely to be ejected from memory
+            self.datasrc.touch(imname)
+
         curimage = self.get_current_image()
         if curimage != image:
             self.logger.debug("updating viewer...")
@@ -391,17 +590,7 @@ class Channel(Callback.Callbacks):
             if not preload:
                 return
 
-            # queue next and previous files for preloading
-            index = self.cursor
-            if index < len(self.history) - 1:
-                info = self.history[index + 1]
-                if info.path is not None:
-                    self.fv.add_preload(self.name, info)
-
-            if index > 0:
-                info = self.history[index - 1]
-                if info.path is not None:
-                    self.fv.add_preload(self.name, info)
+            self.preload_neighbors()
 
         else:
             self.logger.debug("Apparently no need to set channel viewer.")
@@ -422,28 +611,50 @@ class Channel(Callback.Callbacks):
 
         # Do we have a way to reconstruct this image from a future?
         info = self.image_index[imname]
-        if info.image_future is not None:
+        spill_cache = self.fv.spill_cache
+        spilled = (spill_cache is not None and
+                   (self.name, imname) in spill_cache)
+        if info.image_future is not None or spilled:
             self.logger.info("Image '%s' is no longer in memory; attempting "
                              "image future" % (imname))
 
             # TODO: recode this--it's a bit messy
-            def _switch(image):
+            def _switch(image, from_spill):
                 # this will be executed in the gui thread
                 self.add_image(image, silent=True)
                 self.switch_image(image)
 
-                # reset modified timestamp
-                info.time_modified = None
+                if not from_spill:
+                    # reset modified timestamp
+                    info.time_modified = None
                 self.fv.make_async_gui_callback('add-image-info', self, info)
 
             def _load_n_switch(imname, path, image_future):
                 # this will be executed in a non-gui thread
-                # reconstitute the image
-                image = self.fv.error_wrap(image_future.thaw)
-                if isinstance(image, Exception):
-                    errmsg = "Error reconstituting image: %s" % (str(image))
-                    self.logger.error(errmsg)
-                    raise image
+                image = None
+                if spilled:
+                    # reopen the image from the disk cache
+                    image = self.fv.error_wrap(spill_cache.load,
+                                               (self.name, imname),
+                                               logger=self.logger)
+                    if isinstance(image, Exception):
+                        self.logger.warning("Error reopening image from "
+                                            "disk cache: %s" % (str(image)))
+                        image = None
+                from_spill = image is not None
+                if not from_spill:
+                    if image_future is None:
+                        errmsg = "No way to recreate image '%s'" % (imname)
+                        self.logger.error(errmsg)
+                        raise ChannelError(errmsg)
+
+                    # reconstitute the image
+                    image = self.fv.error_wrap(image_future.thaw)
+                    if isinstance(image, Exception):
+                        errmsg = "Error reconstituting image: %s" % (
+                            str(image))
+                        self.logger.error(errmsg)
+                        raise image
 
                 profile = info.get('profile', None)
                 if profile is None:
@@ -453,7 +664,7 @@ class Channel(Callback.Callbacks):
                 image.set(image_future=image_future, name=imname, path=path,
                           image_info=info, profile=profile)
 
-                self.fv.gui_do(_switch, image)
+                self.fv.gui_do(_switch, image, from_spill)
 
             self.fv.nongui_do(_load_n_switch, imname, info.path,
                               info.image_future)
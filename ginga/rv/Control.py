@@ -25,8 +25,8 @@ import queue as Queue  # noqa
 from ginga import cmap, imap
 from ginga import AstroImage, BaseImage
 from ginga.table import AstroTable
-from ginga.misc import Bunch, Timer, Future
-from ginga.util import catalog, iohelper, loader, io_fits, toolbox
+from ginga.misc import Bunch, Timer, Future, Datasrc
+from ginga.util import catalog, iohelper, loader, io_fits, toolbox, spill
 from ginga.canvas.CanvasObject import drawCatalog
 from ginga.canvas.types.layer import DrawingCanvas
 from ginga.canvas import render
@@ -118,7 +118,7 @@ class GingaShell(GwMain.GwMain, Widgets.Application):
         self.wscount = 0
         self.statustask = None
         self.preload_lock = threading.RLock()
-        self.preload_list = deque([], 4)
+        self.preload_list = deque([])
 
         # Create general preferences
         self.settings = self.prefs.create_category('general')
@@ -129,14 +129,35 @@ class GingaShell(GwMain.GwMain, Widgets.Application):
                                    scrollbars='off',
                                    share_readout=True,
                                    numImages=10,
+                                   # memory limit for the images of all
+                                   # channels (MB, 0 = unlimited)
+                                   image_cache_total_mb=0,
+                                   # disk cache for images dropped from
+                                   # memory (MB, 0 = disabled)
+                                   spill_cache_mb=0,
+                                   spill_cache_dir=None,
                                    # Offset to add to numpy-based coords
                                    pixel_coords_offset=1.0,
                                    # inherit from primary header
                                    inherit_primary_header=False,
+                                   lazy_load=False,
                                    cursor_interval=0.050,
                                    save_layout=False,
                                    channel_prefix="Image")
         self.settings.load(onError='silent')
+
+        # memory budget shared by the images of all channels
+        self.image_budget = Datasrc.MemoryBudget()
+        self.settings.get_setting('image_cache_total_mb').add_callback(
+            'set', self._image_budget_cb)
+        self._image_budget_cb(None, self.settings['image_cache_total_mb'])
+
+        # local disk cache for images ejected from the channels
+        self.spill_cache = None
+        self.settings.get_setting('spill_cache_mb').add_callback(
+            'set', self._spill_cache_cb)
+        self._spill_cache_cb(None, self.settings['spill_cache_mb'])
+
         # Load bindings preferences
         bindprefs = self.prefs.create_category('bindings')
         bindprefs.load(onError='silent')
@@ -567,10 +588,12 @@ class GingaShell(GwMain.GwMain, Widgets.Application):
         """
         inherit_prihdr = self.settings.get('inherit_primary_header',
                                            False)
+        lazy = self.settings.get('lazy_load', False)
         try:
             image = loader.load_data(filepath, logger=self.logger,
                                      idx=idx,
-                                     inherit_primary_header=inherit_prihdr)
+                                     inherit_primary_header=inherit_prihdr,
+                                     lazy=lazy)
         except Exception as e:
             errmsg = "Failed to load file '%s': %s" % (
                 filepath, str(e))
@@ -721,36 +744,65 @@ class GingaShell(GwMain.GwMain, Widgets.Application):
         # Return the image
         return image
 
-    def add_preload(self, chname, image_info):
-        bnch = Bunch.Bunch(chname=chname, info=image_info)
+    def add_preload(self, chname, image_info, autocuts=False, ticket=None):
+        bnch = Bunch.Bunch(chname=chname, info=image_info,
+                           autocuts=autocuts, ticket=ticket)
         with self.preload_lock:
             self.preload_list.append(bnch)
         self.nongui_do(self.preload_scan)
 
     def preload_scan(self):
-        # preload any pending files
+        # preload any pending files, in the order they were added
         # TODO: do we need any throttling of loading here?
         with self.preload_lock:
             while len(self.preload_list) > 0:
-                bnch = self.preload_list.pop()
+                bnch = self.preload_list.popleft()
                 self.nongui_do(self.preload_file, bnch.chname,
                                bnch.info.name, bnch.info.path,
-                               image_future=bnch.info.image_future)
+                               image_future=bnch.info.image_future,
+                               autocuts=bnch.autocuts, ticket=bnch.ticket)
+
+    def preload_file(self, chname, imname, path, image_future=None,
+                     autocuts=False, ticket=None):
+        """Load an image in the background and add it silently to a
+        channel.  If `autocuts` is `True`, the cut levels of the image
+        are calculated too, for the channel's viewer.  A `ticket` from
+        the channel (see `Channel.preload_neighbors`) lets the channel
+        cancel the preload, or drop the image if it does not fit in
+        memory.
+        """
+        if ticket is not None and ticket.cancelled:
+            self.logger.debug("preload: %s cancelled" % (imname))
+            return
 
-    def preload_file(self, chname, imname, path, image_future=None):
         # sanity check to see if the file is already in memory
         self.logger.debug("preload: checking %s in %s" % (imname, chname))
         channel = self.get_channel(chname)
 
-        if imname not in channel.datasrc:
-            # not there--load image in a non-gui thread, then have the
-            # gui add it to the channel silently
-            self.logger.info("preloading image %s" % (path))
-            if image_future is None:
-                # TODO: need index info?
-                image = self.load_image(path)
-            else:
-                image = image_future.thaw()
+        image = None
+        try:
+            if imname not in channel.datasrc:
+                # not there--load image in a non-gui thread, then have the
+                # gui add it to the channel silently
+                self.logger.info("preloading image %s" % (path))
+                if image_future is None:
+                    # TODO: need index info?
+                    image = self.load_image(path)
+                else:
+                    image = image_future.thaw()
+
+        finally:
+            if ticket is not None and not channel.end_preload(imname, image,
+                                                              ticket):
+                image = None
+
+        if image is not None:
+            viewer = channel.fitsimage
+            if (autocuts and hasattr(viewer, 'autocuts') and
+                    viewer.get_settings().get('autocuts', 'off') != 'off'):
+                # calculate the cut levels now, rather than when the
+                # image is viewed
+                image.calc_cut_levels(viewer.autocuts, keep=True)
 
             self.gui_do(self.add_image, imname, image,
                         chname=chname, silent=True)
@@ -1248,13 +1300,17 @@ class GingaShell(GwMain.GwMain, Widgets.Application):
                 num_images = settings.get('numImages',
                                           self.settings.get('numImages', 1))
             settings.set_defaults(switchnew=True, numImages=num_images,
+                                  image_cache_mb=0,
                                   raisenew=True, genthumb=True,
                                   focus_indicator=False,
-                                  preload_images=False, sort_order='loadtime')
+                                  preload_images=False, preload_ahead=2,
+                                  preload_behind=1, preload_max_mb=0,
+                                  preload_autocuts=False,
+                                  sort_order='loadtime')
 
             self.logger.debug("Adding channel '%s'" % (chname))
             channel = Channel(chname, self, datasrc=None,
-                              settings=settings)
+                              settings=settings, budget=self.image_budget)
 
             bnch = self.add_viewer(chname, settings,
                                    workspace=workspace)
@@ -1318,6 +1374,7 @@ class GingaShell(GwMain.GwMain, Widgets.Application):
 
             self.ds.remove_tab(chname)
             del self.channel[name]
+            self.image_budget.remove_datasrc(channel.datasrc)
             self.prefs.remove_settings('channel_' + chname)
 
             # pick new channel
@@ -1331,6 +1388,31 @@ class GingaShell(GwMain.GwMain, Widgets.Application):
 
         self.make_gui_callback('delete-channel', channel)
 
+    def _image_budget_cb(self, setting, value):
+        self.image_budget.set_max_bytes(int(value * 1024 ** 2))
+
+    def _spill_cache_cb(self, setting, value):
+        max_bytes = int(value * 1024 ** 2)
+        if max_bytes <= 0:
+            # NOTE: an existing cache is kept until the program exits
+            return
+        if self.spill_cache is None:
+            cache_dir = self.settings.get('spill_cache_dir', None)
+            if cache_dir is None:
+                cache_dir = self.tmpdir
+            self.spill_cache = spill.SpillCache(cache_dir=cache_dir,
+                                                max_bytes=max_bytes,
+                                                logger=self.logger)
+            atexit.register(self.spill_cache.clear)
+        else:
+            self.spill_cache.set_max_bytes(max_bytes)
+
+    def get_image_memory_usage(self):
+        """Get the memory (in bytes) used by the images held in all
+        the channels.
+        """
+        return self.image_budget.get_nbytes()
+
     def get_channel_names(self):
         with self.lock:
             return self.channel_names
@@ -20,6 +20,11 @@ Click again to sort the other way.
           This can be customized by setting the "columns" parameter in
           the "plugin_Contents.cfg" settings file.
 
+The "Memory" column shows the memory used by each image that is held in
+memory (see the ``image_cache_mb`` channel setting); images that have
+been dropped from memory show "N/A", and are reloaded when they are
+displayed again.
+
 The active image in the currently focused channel will normally be
 highlighted. Double-click on an image will force that image to be
 shown in the associated channel. Single-click on any image to
@@ -52,7 +57,7 @@ class Contents(GingaPlugin.GlobalPlugin):
 
         columns = [('Name', 'NAME'), ('Object', 'OBJECT'),
                    ('Date', 'DATE-OBS'), ('Time UT', 'UT'),
-                   ('Modified', 'MODIFIED')]
+                   ('Modified', 'MODIFIED'), ('Memory', 'MEMORY')]
 
         prefs = self.fv.get_preferences()
         self.settings = prefs.create_category('plugin_Contents')
@@ -215,6 +220,12 @@ class Contents(GingaPlugin.GlobalPlugin):
             timestamp = timestamp.strftime('%Y-%m-%d %H:%M:%SZ')
         bnch.MODIFIED = timestamp
 
+        # Memory used, if the image is held in memory
+        if image is not None and hasattr(image, 'get_memory_usage'):
+            bnch.MEMORY = '%.1f MB' % (image.get_memory_usage() / 1024 ** 2)
+        else:
+            bnch.MEMORY = 'N/A'
+
         return bnch
 
     def recreate_toc(self):
@@ -275,6 +286,11 @@ class Contents(GingaPlugin.GlobalPlugin):
             file_dict[name] = bnch
         else:
             # old image
+            if image is None:
+                # image is no longer in memory; keep the header values
+                for hdr, key in self.columns:
+                    if key not in ('NAME', 'MODIFIED', 'MEMORY'):
+                        bnch.pop(key, None)
             file_dict[name].update(bnch)
 
         # TODO: either make add_tree() merge updates or make an
@@ -88,6 +88,7 @@ class Info(GingaPlugin.GlobalPlugin):
                     ('Dimensions:', 'label', 'Dimensions', 'llabel'),
                     ('Min:', 'label', 'Min', 'llabel'),
                     ('Max:', 'label', 'Max', 'llabel'),
+                    ('Memory:', 'label', 'Memory', 'llabel'),
                     )
         w, b = Widgets.build_info(captions)
 
@@ -402,6 +403,17 @@ class Info(GingaPlugin.GlobalPlugin):
         dim_txt = "%dx%d" % (width, height)
         info.winfo.dimensions.set_text(dim_txt)
 
+        # Show memory used by the image, the images held in the channel
+        # and the images of all channels
+        mb = 1024.0 ** 2
+        nbytes = 0
+        if hasattr(image, 'get_memory_usage'):
+            nbytes = image.get_memory_usage()
+        mem_txt = "%.1f MB (channel %.1f MB, total %.1f MB)" % (
+            nbytes / mb, info.chinfo.datasrc.get_nbytes() / mb,
+            self.fv.get_image_memory_usage() / mb)
+        info.winfo.memory.set_text(mem_txt)
+
     def field_info(self, viewer, channel, info):
         if '_info_info' not in channel.extdata:
             return
@@ -1,9 +1,60 @@
 import logging
+import threading
+import time
+import concurrent.futures
+import itertools
 
 import numpy as np
 
 from ginga import AstroImage
+from ginga.misc import Callback
 from ginga.mockw.ImageViewCanvasMock import ImageViewCanvas
+from ginga.canvas.types.basic import Circle
+
+
+class DummyTimer(Callback.Callbacks):
+    """A timer that only expires when told to."""
+
+    def __init__(self):
+        super(DummyTimer, self).__init__()
+        self.duration = None
+        self.enable_callback('expired')
+
+    def set(self, duration):
+        self.duration = duration
+
+    start = set
+
+    def stop(self):
+        self.duration = None
+
+    clear = stop
+
+    def expire(self):
+        self.duration = None
+        self.make_callback('expired')
+
+
+class TimerImageViewCanvas(ImageViewCanvas):
+
+    def make_timer(self):
+        return DummyTimer()
+
+
+class VersionImageViewCanvas(ImageViewCanvas):
+    """A viewer that records its reference point when the transform
+    version changes."""
+
+    @property
+    def _tform_version(self):
+        return self.__dict__.get('_version', 0)
+
+    @_tform_version.setter
+    def _tform_version(self, version):
+        self.__dict__['_version'] = version
+        self.version_orgs = getattr(self, 'version_orgs', [])
+        self.version_orgs.append((getattr(self, '_org_x', None),
+                                  getattr(self, '_org_y', None)))
 
 
 class TestImageView(object):
@@ -50,4 +101,520 @@ class TestImageView(object):
         ## print (x1, y2)
         ## print (dst_x, dst_y)
 
+    def test_tile_render(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.set_window_size(300, 200)
+        data = np.random.RandomState(0).randint(0, 1000, (500, 700))
+        image = AstroImage.AstroImage(data_np=data.astype(np.float32),
+                                      logger=self.logger)
+        viewer.set_image(image)
+        viewer.cut_levels(100, 900)
+        viewer.t_.set(tile_size=64)
+
+        for scale in (1.0, 2.0):
+            for pan in ((100, 100), (350.3, 250.7), (699, 2)):
+                viewer.scale_to(scale, scale)
+                viewer.set_pan(*pan)
+                viewer.t_.set(tile_render=False)
+                arr1 = viewer.get_rgb_object(whence=0).get_array('RGB')
+                arr1 = arr1.copy()
+                viewer.t_.set(tile_render=True)
+                arr2 = viewer.get_rgb_object(whence=0).get_array('RGB')
+                assert np.array_equal(arr1, arr2)
+
+        # panning back and forth reuses the cached tiles
+        cache = viewer.get_canvas_image().get_cache(viewer)
+        viewer.set_pan(300, 300)
+        viewer.get_rgb_object(whence=0)
+        viewer.set_pan(310, 300)
+        viewer.get_rgb_object(whence=0)
+        num_tiles = len(cache.tiles)
+        viewer.set_pan(300, 300)
+        viewer.get_rgb_object(whence=0)
+        assert len(cache.tiles) == num_tiles
+
+        # changing the data invalidates the tiles
+        data[:] = 0
+        image.set_data(data.astype(np.float32))
+        assert len(cache.tiles) == 0
+
+    def test_int_lut(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.set_window_size(300, 200)
+        rs = np.random.RandomState(0)
+        for dtype in ('>i2', 'u2', 'u1'):
+            info = np.iinfo(np.dtype(dtype))
+            data = rs.randint(info.min, info.max, (500, 700)).astype(dtype)
+            image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+            viewer.set_image(image)
+            viewer.cut_levels(info.min // 2, info.max // 3)
+
+            viewer.t_.set(int_lut=False)
+            arr1 = viewer.get_rgb_object(whence=0).get_array('RGB').copy()
+            viewer.t_.set(int_lut=True)
+            arr2 = viewer.get_rgb_object(whence=0).get_array('RGB')
+            cache = viewer.get_canvas_image().get_cache(viewer)
+            assert cache.int_lut is not None
+            assert np.array_equal(arr1, arr2)
+
+    def test_render_threads(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.set_window_size(300, 200)
+        rs = np.random.RandomState(0)
+        for dtype in ('>f4', 'i2'):
+            data = rs.randint(0, 30000, (500, 700)).astype(dtype)
+            image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+            viewer.set_image(image)
+            viewer.scale_to(0.7, 0.7)
+            viewer.cut_levels(1000, 20000)
+
+            viewer.t_.set(render_threads=1)
+            arr1 = viewer.get_rgb_object(whence=0).get_array('RGB').copy()
+            viewer.t_.set(render_threads=4)
+            assert viewer.get_render_pool() is not None
+            arr2 = viewer.get_rgb_object(whence=0).get_array('RGB')
+            assert np.array_equal(arr1, arr2)
+        viewer.t_.set(render_threads=1)
+        assert viewer.get_render_pool() is None
+
+    def test_render_allocs(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.set_window_size(300, 200)
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+        viewer.set_image(image)
+        viewer.get_rgb_object(whence=0)
+        assert viewer.get_render_stats()['allocs'] > 0
+
+        # redrawing the same view reuses all buffers
+        viewer.reset_render_stats()
+        for whence in (0, 1, 2, 2.5):
+            viewer.get_rgb_object(whence=whence)
+        stats = viewer.get_render_stats()
+        assert stats['allocs'] == 0
+        assert stats['reuses'] > 0
+
+        # a new window size needs new buffers
+        viewer.set_window_size(400, 300)
+        viewer.get_rgb_object(whence=0)
+        assert viewer.get_render_stats()['allocs'] > 0
+
+    def test_backing_size(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.set_window_size(400, 200)
+        viewer.set_image(self.image)
+        viewer.get_rgb_object(whence=0)
+        ht, wd = viewer._rgbarr.shape[:2]
+        assert (400 <= wd < 410) and (200 <= ht < 210)
+
+        # rotation by 90 deg swaps the dimensions of the backing image
+        viewer.rotate(90.0)
+        viewer.get_rgb_object(whence=0)
+        ht, wd = viewer._rgbarr.shape[:2]
+        assert (200 <= wd < 210) and (400 <= ht < 410)
+        out = viewer.get_image_as_array()
+        assert out.shape[:2] == (200, 400)
+
+        # arbitrary rotation needs room to rotate
+        viewer.rotate(30.0)
+        viewer.get_rgb_object(whence=0)
+        ht, wd = viewer._rgbarr.shape[:2]
+        assert wd == ht and wd >= np.hypot(400, 200)
+
+    def test_rotate90_placement(self):
+        data = np.zeros((200, 300))
+        data[70, 120] = 1.0
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(data)
+        pts = [(120, 70), (0, 0), (250, 10)]
+        flips = list(itertools.product([False, True], repeat=3))
+
+        for win_wd, win_ht in [(100, 80), (101, 81)]:
+            viewer = ImageViewCanvas(logger=self.logger)
+            viewer.set_window_size(win_wd, win_ht)
+            viewer.enable_autocuts('off')
+            viewer.set_image(image)
+            viewer.cut_levels(0.0, 1.0)
+            viewer.scale_to(1.0, 1.0)
+            viewer.set_pan(125, 67)
+
+            def render(rot_deg, flip):
+                viewer.transform(*flip)
+                viewer.rotate(rot_deg)
+                viewer.get_rgb_object(whence=0)
+                out = viewer.get_image_as_array()
+                ys, xs = np.nonzero(out[..., 0] > 128)
+                assert len(xs) == 1
+                cvs = [tuple(viewer.get_canvas_xy(*pt)) for pt in pts]
+                return (xs[0], ys[0]), cvs
+
+            # window pixels of the data pixel with only flips and swaps
+            ref = {}
+            for flip in flips:
+                pix, cvs = render(0.0, flip)
+                ref[tuple(cvs)] = pix
+
+            for rot_deg in [90.0, 180.0, 270.0]:
+                for flip in flips:
+                    # pixel lands where it does for the equivalent flips
+                    pix, cvs = render(rot_deg, flip)
+                    assert pix == ref[tuple(cvs)]
+                    cx, cy = cvs[0]
+                    assert cx - 1 <= pix[0] <= cx and cy - 1 <= pix[1] <= cy
+
+    def test_render_stats(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.configure_window(300, 200)
+        frames = []
+        viewer.add_callback('render-stats',
+                            lambda viewer, frame: frames.append(frame))
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+        viewer.set_image(image)
+        viewer.reset_render_stats()
+
+        for i in range(3):
+            viewer.redraw_now(whence=0)
+            viewer.redraw_now(whence=2)
+
+        stats = viewer.get_render_stats()
+        assert stats['frames'] == 6
+        stages = stats['stages']
+        for name in ('backing', 'cutout', 'cut_levels', 'rgb_map',
+                     'composite', 'transform', 'blit'):
+            assert name in stages
+        assert stages['cutout']['count'] == 3
+        assert stages['rgb_map']['count'] == 6
+        assert stages['rgb_map']['whence'] == 2
+        assert stages['cutout']['pixels'] > 0
+        assert sum(stages['blit']['hist']) == 6
+
+        assert len(frames) == 6
+        assert 'cutout' not in frames[-1]
+        assert frames[-1]['rgb_map'].whence == 2
+
+    def test_progressive(self):
+        viewer = TimerImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+        viewer.set_image(image)
+        viewer.scale_to(1.0, 1.0)
+        viewer.settings.set(progressive_render=True,
+                            progressive_idle_ms=60000)
+        timer = viewer._refine_timer
+        cache = viewer.get_canvas_image().get_cache(viewer)
+
+        # an isolated change is rendered at full quality
+        viewer.set_pan(300, 200)
+        assert viewer.get_draft_params() is None
+        assert cache.decimate == 1
+        full = viewer.get_image_as_array().copy()
+
+        # a burst of changes is rendered as drafts...
+        viewer.set_pan(310, 210)
+        viewer.set_pan(300, 200)
+        assert viewer.get_draft_params() == (2, 'basic')
+        assert cache.decimate == 2
+        assert timer.duration == 60.0
+        draft = viewer.get_image_as_array()
+        assert draft.shape == full.shape
+        assert not np.array_equal(draft, full)
+
+        # ...until the idle timer refines it
+        timer.expire()
+        assert viewer.get_draft_params() is None
+        assert cache.decimate == 1
+        assert np.array_equal(viewer.get_image_as_array(), full)
+
+    def test_async_render(self):
+        viewer = TimerImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+        viewer.set_image(image)
+        viewer.set_pan(300, 200)
+        expected = viewer.get_image_as_array().copy()
+        viewer.set_pan(350, 250)
+        viewer.set_color_map('rainbow3')
+        expected2 = viewer.get_image_as_array().copy()
+        viewer.set_color_map('gray')
+
+        viewer.settings.set(async_render=True)
+        timer = viewer._async_timer
+
+        def finish():
+            while viewer._async_future is not None:
+                try:
+                    viewer._async_future.result()
+                except Exception:
+                    pass
+                timer.expire()
+
+        # the frame is rendered on the worker thread and shown once the
+        # GUI timer finds it finished
+        viewer.set_pan(300, 200)
+        assert viewer._async_future is not None
+        finish()
+        assert np.array_equal(viewer.get_image_as_array(), expected)
+
+        # hold up the worker, so that the next render is superseded
+        # before it starts
+        viewer._async_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1)
+        ev = threading.Event()
+        viewer._async_pool.submit(ev.wait)
+        viewer.set_pan(350, 250)
+        viewer.set_color_map('rainbow3')
+        assert viewer._async_whence == 2
+        # an overlay redraw does not wait for the render in progress
+        stats = viewer.get_render_stats()
+        viewer.redraw_now(whence=3)
+        assert viewer.get_render_stats()['frames'] == stats['frames']
+        assert np.array_equal(viewer.get_image_as_array(), expected)
+
+        ev.set()
+        finish()
+        assert np.array_equal(viewer.get_image_as_array(), expected2)
+
+    def test_async_render_off(self):
+        viewer = TimerImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+        viewer.set_image(image)
+        viewer.set_pan(300, 200)
+        expected = viewer.get_image_as_array().copy()
+        viewer.set_pan(350, 250)
+        expected2 = viewer.get_image_as_array().copy()
+
+        viewer.settings.set(async_render=True)
+        viewer.set_pan(300, 200)
+        while viewer._async_future is not None:
+            viewer._async_future.result()
+            viewer._async_timer.expire()
+        assert np.array_equal(viewer.get_image_as_array(), expected)
+
+        # turning asynchronous rendering off while a render is in
+        # progress, just after a frame was shown
+        viewer.set_pan(350, 250)
+        assert viewer._async_future is not None
+        viewer.settings.set(async_render=False)
+        assert viewer._async_future is None
+        assert np.array_equal(viewer.get_image_as_array(), expected2)
+
+        # later renders are synchronous, and are not cancelled
+        viewer.set_pan(300, 200)
+        assert np.array_equal(viewer.get_image_as_array(), expected)
+        arr = viewer.getwin_array(order='RGBA', dtype=np.uint8)
+        viewer.set_pan(350, 250)
+        assert not np.array_equal(viewer.getwin_array(order='RGBA',
+                                                      dtype=np.uint8), arr)
+
+    def test_async_render_geometry(self):
+        viewer = TimerImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+        viewer.set_image(image)
+        viewer.settings.set(async_render=True)
+        # renders in progress are never abandoned
+        viewer._async_max_stale_sec = 0.0
+        timer = viewer._async_timer
+
+        def finish():
+            while viewer._async_future is not None:
+                viewer._async_future.result()
+                timer.expire()
+
+        viewer.set_pan(300, 200)
+        finish()
+        version = viewer.get_transform_version()
+        data_pt = tuple(viewer.get_data_xy(150, 100))
+
+        # hold up the worker, with a render queued and another pending
+        viewer._async_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1)
+        ev = threading.Event()
+        viewer._async_pool.submit(ev.wait)
+        viewer.set_pan(320, 220)
+        viewer.set_pan(350, 250)
+        assert viewer._async_whence is not None
+
+        shown = []
+
+        def redraw_cb(viewer, whence):
+            shown.append((tuple(viewer.get_data_xy(150, 100)),
+                          viewer._async_future is None))
+
+        viewer.add_callback('redraw', redraw_cb)
+
+        # the geometry follows the frame shown, not the one rendered
+        ev.set()
+        viewer._async_future.result()
+        assert viewer.get_transform_version() == version
+        assert tuple(viewer.get_data_xy(150, 100)) == data_pt
+
+        # the finished frame is shown (with its geometry) before the
+        # superseding render starts
+        timer.expire()
+        assert shown == [((data_pt[0] + 20, data_pt[1] + 20), True)]
+        assert viewer.get_transform_version() != version
+        finish()
+        assert shown[-1][0] == (data_pt[0] + 50, data_pt[1] + 50)
+
+    def test_refresh_whence(self):
+        viewer = TimerImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        image = AstroImage.AstroImage(data_np=data, logger=self.logger)
+        viewer.set_image(image)
+        viewer.set_refresh_rate(10)
+        viewer.reset_render_stats()
+
+        def tick():
+            viewer.rf_deadline = time.time()
+            viewer.refresh_timer_cb(viewer.rf_timer, viewer.rf_flags)
+
+        # first tick draws everything
+        viewer.start_refresh()
+        assert viewer.get_render_stats()['frames'] == 1
+
+        # changes are only drawn at the next tick...
+        viewer.set_color_map('rainbow3')
+        assert viewer.get_render_stats()['frames'] == 1
+        tick()
+        stats = viewer.get_render_stats()
+        assert stats['frames'] == 2
+        # ...and only as much as needed
+        assert stats['stages']['cutout']['count'] == 1
+        assert stats['stages']['rgb_map']['whence'] == 2
+
+        # nothing changed
+        tick()
+        tick()
+        assert viewer.get_render_stats()['frames'] == 2
+
+        # far behind: the redraw is dropped, but not forgotten
+        viewer.redraw(whence=0)
+        viewer.rf_deadline = time.time() - 1.0
+        viewer.refresh_timer_cb(viewer.rf_timer, viewer.rf_flags)
+        assert viewer.get_render_stats()['frames'] == 2
+        tick()
+        assert viewer.get_render_stats()['frames'] == 3
+
+        viewer.stop_refresh()
+        rf_stats = viewer.get_refresh_stats()
+        assert rf_stats['skipped'] == 2
+        assert rf_stats['dropped'] == 1
+
+        # outside of timed refresh, redraws are immediate again
+        viewer.set_color_map('gray')
+        assert viewer.get_render_stats()['frames'] == 4
+
+    def test_transform_version(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.zeros((500, 700), dtype=np.float32)
+        viewer.set_image(AstroImage.AstroImage(data_np=data,
+                                               logger=self.logger))
+        circle = Circle(100, 100, 10)
+        viewer.get_canvas().add(circle)
+
+        version = viewer.get_transform_version()
+        cpoints = circle.get_cpoints(viewer)
+        # overlay redraws do not change the transforms
+        viewer.redraw_now(whence=3)
+        assert viewer.get_transform_version() == version
+        assert circle.get_cpoints(viewer) is cpoints
+
+        # moving the object recomputes its points
+        circle.move_delta_pt((5, 0))
+        cpoints2 = circle.get_cpoints(viewer)
+        assert cpoints2 is not cpoints
+        assert cpoints2[0][0] > cpoints[0][0]
+
+        for change in (lambda: viewer.set_pan(200, 300),
+                       lambda: viewer.scale_to(2.0, 2.0),
+                       lambda: viewer.rotate(30.0),
+                       lambda: viewer.transform(True, False, False),
+                       lambda: viewer.configure_window(400, 200)):
+            change()
+            assert viewer.get_transform_version() > version
+            version = viewer.get_transform_version()
+            cpoints = circle.get_cpoints(viewer)
+            crdmap = viewer.get_coordmap('native')
+            assert np.allclose(cpoints,
+                               crdmap.data_to(circle.get_points()))
+
+    def test_transform_version_order(self):
+        viewer = VersionImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.zeros((500, 700), dtype=np.float32)
+        viewer.set_image(AstroImage.AstroImage(data_np=data,
+                                               logger=self.logger))
+
+        # the new reference point is in place when the version changes
+        viewer.set_pan(200, 300)
+        assert viewer.version_orgs[-1] == (199.5, 299.5)
+
+    def test_transaction(self):
+        viewer = ImageViewCanvas(logger=self.logger)
+        viewer.set_redraw_lag(0.0)
+        viewer.configure_window(300, 200)
+        data = np.random.RandomState(0).rand(500, 700).astype(np.float32)
+        viewer.set_image(AstroImage.AstroImage(data_np=data,
+                                               logger=self.logger))
+
+        redraws, scales = [], []
+        redraw_now = viewer.redraw_now
+
+        def _redraw_now(whence=0):
+            redraws.append(whence)
+            redraw_now(whence=whence)
+
+        viewer.redraw_now = _redraw_now
+        viewer.get_settings().get_setting('scale').add_callback(
+            'set', lambda setting, value: scales.append(value))
+
+        with viewer.transaction():
+            viewer.set_pan(100.0, 200.0)
+            viewer.scale_to(2.0, 2.0)
+            viewer.scale_to(3.0, 3.0)
+            viewer.rotate(45.0)
+            viewer.cut_levels(0.1, 0.9)
+            assert redraws == []
+            assert scales == []
+        assert redraws == [0]
+        assert scales == [(3.0, 3.0)]
+        assert viewer.get_scale_xy() == (3.0, 3.0)
+
+        # only as much redrawing as needed
+        del redraws[:]
+        with viewer.transaction():
+            viewer.cut_levels(0.2, 0.8)
+            viewer.set_color_map('rainbow3')
+        assert redraws == [1]
+
+        # copying attributes redraws the destination once
+        viewer2 = ImageViewCanvas(logger=self.logger)
+        viewer2.set_redraw_lag(0.0)
+        viewer2.configure_window(300, 200)
+        viewer2.set_image(AstroImage.AstroImage(data_np=data,
+                                                logger=self.logger))
+        del redraws[:]
+        viewer2.redraw_now = _redraw_now
+        viewer.copy_attributes(viewer2, ['transforms', 'rotation',
+                                         'cutlevels', 'zoom', 'pan'])
+        assert redraws == [0]
+        assert viewer2.get_scale_xy() == (3.0, 3.0)
+        assert viewer2.get_cut_levels() == (0.2, 0.8)
+
 # END
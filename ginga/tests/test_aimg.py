@@ -1,13 +1,17 @@
 
+import os
+import shutil
+import tempfile
+
 import numpy as np
 
 from astropy import nddata
 from astropy.io import fits
 from astropy.wcs import WCS
 
-from ginga import AstroImage
+from ginga import AstroImage, AutoCuts
 from ginga.misc import log
-from ginga.util import wcs, wcsmod
+from ginga.util import io_fits, wcs, wcsmod
 wcsmod.use('astropy')
 
 
@@ -86,4 +90,115 @@ class TestAstroImage(object):
         hdu2 = self.image.as_hdu()
         assert isinstance(hdu2, fits.PrimaryHDU)
 
+    def test_calc_cut_levels(self):
+        """Test that cut levels calculated ahead of time are used once.
+        """
+        image = AstroImage.AstroImage(data_np=np.arange(100.0).reshape(10, 10),
+                                      logger=self.logger)
+        autocuts = AutoCuts.Minmax(self.logger)
+        assert image.calc_cut_levels(autocuts, keep=True) == (0.0, 99.0)
+
+        autocuts.calc_cut_levels = lambda image: (1.0, 2.0)
+        assert image.calc_cut_levels(autocuts) == (0.0, 99.0)
+        assert image.calc_cut_levels(autocuts) == (1.0, 2.0)
+
+        # kept levels are dropped with the data
+        image.calc_cut_levels(autocuts, keep=True)
+        image.set_data(np.zeros((10, 10)))
+        autocuts.calc_cut_levels = lambda image: (3.0, 4.0)
+        assert image.calc_cut_levels(autocuts) == (3.0, 4.0)
+
+
+class TestLazyLoad(object):
+    def setup_class(self):
+        self.logger = log.get_logger("TestLazyLoad", null=True)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_class(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _load(self, name, hdu, **kwargs):
+        path = os.path.join(self.tmpdir, name)
+        hdu.writeto(path)
+        lazy = AstroImage.AstroImage(logger=self.logger)
+        lazy.load_file(path, lazy=True, **kwargs)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.load_file(path, **kwargs)
+        return lazy, image
+
+    def _check(self, lazy, image):
+        assert lazy.is_lazy()
+        # lazily loaded data is read in the native byte order
+        assert lazy.dtype == image.dtype.newbyteorder('=')
+        assert lazy.shape == image.shape
+        np.testing.assert_array_equal(lazy.cutout_data(3, 5, 40, 30),
+                                      image.cutout_data(3, 5, 40, 30))
+        assert lazy.get_data_xy(7, 9) == image.get_data_xy(7, 9)
+        res1 = lazy.get_scaled_cutout2((0, 0), (49, 59), (0.3, 0.4))
+        res2 = image.get_scaled_cutout2((0, 0), (49, 59), (0.3, 0.4))
+        np.testing.assert_array_equal(res1.data, res2.data)
+        assert lazy.get_minmax() == image.get_minmax()
+        assert lazy.is_lazy()
+
+        # reading all the data
+        np.testing.assert_array_equal(lazy.get_data(), image.get_data())
+        assert not lazy.is_lazy()
+
+    def test_scaled_int(self):
+        data = np.arange(60 * 50, dtype=np.uint16).reshape(60, 50) * 20
+        lazy, image = self._load('uint16.fits', fits.PrimaryHDU(data))
+        assert lazy.dtype == np.uint16
+        self._check(lazy, image)
+
+        data = np.arange(60 * 50, dtype=np.int16).reshape(60, 50)
+        hdu = fits.ImageHDU(data)
+        hdu.header.update(BSCALE=0.5, BZERO=10.0, BLANK=7)
+        lazy, image = self._load('scaled.fits', hdu, numhdu=1)
+        assert np.isnan(lazy.get_data_xy(7, 0))
+        self._check(lazy, image)
+
+    def test_cube(self):
+        data = np.random.uniform(0, 1, (3, 60, 50)).astype(np.float32)
+        lazy, image = self._load('cube.fits', fits.PrimaryHDU(data))
+        lazy.set_naxispath([1])
+        image.set_naxispath([1])
+        self._check(lazy, image)
+
+    def test_compressed(self):
+        # compressed images are read by tiles
+        data = np.arange(60 * 50, dtype=np.int32).reshape(60, 50)
+        lazy, image = self._load('comp.fits', fits.CompImageHDU(data),
+                                 numhdu=1)
+        self._check(lazy, image)
+
+        data = np.random.normal(100.0, 10.0, (60, 50)).astype(np.float32)
+        hdu = fits.CompImageHDU(data, compression_type='RICE_1',
+                                quantize_method=1, tile_size=(16, 16))
+        lazy, image = self._load('dithered.fits', hdu, numhdu=1)
+        self._check(lazy, image)
+
+    def test_compressed_tiles(self):
+        data = np.arange(200 * 300, dtype=np.int32).reshape(200, 300)
+        path = os.path.join(self.tmpdir, 'tiles.fits')
+        fits.CompImageHDU(data).writeto(path)
+        with fits.open(path) as fits_f:
+            opener = io_fits.PyFitsFileHandler(self.logger)
+            section = opener.get_lazy_data(fits_f[1])
+        assert isinstance(section, io_fits.CompImageSection)
+        section.prefetch = False
+        assert section.tile_shape == (1, 300)
+
+        np.testing.assert_array_equal(section[10:20, 30:40],
+                                      data[10:20, 30:40])
+        np.testing.assert_array_equal(section[::-7, [4, 1, 4]],
+                                      data[::-7, [4, 1, 4]])
+        # only the first tile, and the tiles with the indexed rows, were
+        # decompressed
+        rows = set([0]) | set(range(10, 20)) | set(range(199, -1, -7))
+        assert section.get_cache_size() == len(rows) * 300 * 4
+
+        section.max_bytes = 5 * 300 * 4
+        np.testing.assert_array_equal(section[100:150], data[100:150])
+        assert section.get_cache_size() == section.max_bytes
+
 # END
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+from ginga.util import batchrender
+
+try:
+    from astropy.io import fits
+    have_astropy = True
+except ImportError:
+    have_astropy = False
+
+try:
+    import PIL.Image as PILimage
+    have_pil = True
+except ImportError:
+    have_pil = False
+
+
+class TestBatchRender(object):
+
+    def setup_class(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_class(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_outpath(self):
+        assert (batchrender.get_outpath('/data/foo.fits[1]', '/out') ==
+                '/out/foo[1].png')
+        assert (batchrender.get_outpath('/data/foo.fits', None,
+                                        format='jpeg') ==
+                '/data/foo.jpeg')
+
+    def test_render_files(self):
+        if not (have_astropy and have_pil):
+            pytest.skip("astropy and PIL are needed for this test")
+
+        data = np.arange(200 * 300, dtype=np.float32).reshape((200, 300))
+        for i in range(3):
+            fits.PrimaryHDU(data).writeto(
+                os.path.join(self.tmpdir, 'img%d.fits' % i))
+        outdir = os.path.join(self.tmpdir, 'out')
+        os.mkdir(outdir)
+
+        options = dict(size=(150, 100), color_map='gray', zoom=0.5)
+        results = list(batchrender.render_files(
+            [os.path.join(self.tmpdir, '*.fits')], outdir=outdir,
+            numprocs=1, options=options))
+
+        assert len(results) == 3
+        for res in results:
+            assert res.error is None
+            assert res.render >= 0.0
+            img = np.asarray(PILimage.open(res.outpath))
+            assert img.shape == (100, 150, 3)
+            # a gray ramp from left to right
+            assert img[50, 0, 0] < img[50, 149, 0]
+
+        # nothing left to do
+        results = list(batchrender.render_files(
+            [os.path.join(self.tmpdir, '*.fits')], outdir=outdir,
+            numprocs=1, options=options, skip_existing=True))
+        assert len(results) == 0
@@ -0,0 +1,66 @@
+import logging
+
+import numpy as np
+import pytest
+
+from ginga import AstroImage
+from ginga.canvas.CanvasObject import get_canvas_types
+from ginga.mockw.ImageViewCanvasMock import ImageViewCanvas
+
+
+class TestMarkerCollection(object):
+
+    def setup_class(self):
+        self.logger = logging.getLogger("TestMarkerCollection")
+        self.dc = get_canvas_types()
+        self.viewer = ImageViewCanvas(logger=self.logger)
+        self.viewer.set_redraw_lag(0.0)
+        self.viewer.configure_window(200, 100)
+        data = np.zeros((1000, 1000), dtype=np.float32)
+        self.viewer.set_image(AstroImage.AstroImage(data_np=data,
+                                                    logger=self.logger))
+        self.viewer.scale_to(1.0, 1.0)
+        self.viewer.set_pan(500, 500)
+        self.canvas = self.dc.DrawingCanvas()
+        self.viewer.get_canvas().add(self.canvas)
+
+    def test_markers(self):
+        x = np.array([100.0, 500.0, 510.0, 900.0])
+        y = np.array([100.0, 500.0, 500.0, 900.0])
+        obj = self.dc.MarkerCollection(x, y, radius=[2, 3, 4, 5],
+                                       style=['circle', 'cross', 'square',
+                                              'plus'],
+                                       color='red')
+        self.canvas.add(obj)
+
+        assert obj.get_num_points() == 4
+        assert tuple(obj.get_llur()) == (98.0, 98.0, 905.0, 905.0)
+        assert list(obj.get_markers_at((509.0, 501.0))) == [2]
+        assert list(obj.contains_pts([(500, 502), (300, 300)])) == [True,
+                                                                    False]
+        # small markers can be picked within the cap radius
+        assert list(obj.select_markers_at(self.viewer, (103.5, 100))) == [0]
+        assert obj in self.canvas.select_items_at(self.viewer, (500, 500))
+
+        obj.add_markers([300], [300], radius=1, style='diamond',
+                        color='green')
+        assert obj.get_num_points() == 5
+        assert list(obj.colors) == ['red'] * 4 + ['green']
+
+        with pytest.raises(ValueError):
+            obj.add_markers([300], [300], style='bogus')
+
+    def test_draw_visible(self):
+        drawn = []
+        obj = self.dc.MarkerCollection(np.arange(0, 1000, 10),
+                                       np.full(100, 500.0), radius=2,
+                                       color=['red', 'green'] * 50)
+        obj._draw_markers = (lambda cr, style, cx, cy, cradius:
+                             drawn.extend(cx.tolist()))
+        self.canvas.add(obj, redraw=False)
+
+        obj.draw(self.viewer)
+        # only the markers within (or touching) the 200 pixel wide
+        # window around the pan position are drawn
+        assert 18 <= len(drawn) <= 23
+        assert min(drawn) < 10 and max(drawn) > 190
@@ -0,0 +1,64 @@
+"""Test pyramid.py and the pyramid support in BaseImage.py"""
+
+import numpy as np
+
+from ginga import AstroImage
+from ginga.misc import log
+from ginga.util.pyramid import ImagePyramid
+
+
+class TestImagePyramid(object):
+
+    def setup_class(self):
+        self.logger = log.get_logger("TestImagePyramid", null=True)
+        self.data = np.arange(1024 * 1024, dtype=np.float32).reshape(
+            (1024, 1024))
+
+    def test_build(self):
+        pyramid = ImagePyramid(self.data, min_size=128)
+        pyramid.build()
+        assert pyramid.is_complete()
+        # 1024 -> 512 -> 256 -> 128
+        assert len(pyramid) == 4
+        assert pyramid.levels[2].shape == (256, 256)
+        assert pyramid.levels[2][1, 1] == self.data[4, 4]
+
+    def test_budget(self):
+        budget = 512 * 512 * self.data.itemsize
+        pyramid = ImagePyramid(self.data, max_bytes=budget, min_size=16)
+        pyramid.build()
+        assert len(pyramid) == 2
+        assert pyramid.nbytes <= budget
+
+    def test_get_level(self):
+        pyramid = ImagePyramid(self.data, min_size=128)
+        pyramid.build()
+        assert pyramid.get_level(1.0, 1.0)[0] == 0
+        assert pyramid.get_level(0.6, 0.6)[0] == 0
+        assert pyramid.get_level(0.5, 0.5)[0] == 1
+        assert pyramid.get_level(0.2, 0.3)[0] == 1
+        assert pyramid.get_level(0.01, 0.01)[0] == 3
+
+    def test_image_cutout(self):
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(self.data)
+        res1 = image.get_scaled_cutout2((0, 0), (1023, 1023), (0.25, 0.25))
+
+        image.enable_pyramid(True, min_size=128, background=False)
+        res2 = image.get_scaled_cutout2((0, 0), (1023, 1023), (0.25, 0.25))
+        assert len(image.get_pyramid()) == 4
+        assert res2.data.shape == res1.data.shape
+        assert np.all(res2.data == res1.data)
+        assert res2.scale_x == res1.scale_x
+
+    def test_invalidate(self):
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.set_data(self.data)
+        image.enable_pyramid(True, min_size=128, background=False)
+        pyramid = image.get_pyramid()
+
+        data2 = self.data * 2
+        image.set_data(data2)
+        pyramid2 = image.get_pyramid()
+        assert pyramid2 is not pyramid
+        assert pyramid2.levels[0] is data2
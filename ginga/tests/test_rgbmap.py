@@ -0,0 +1,42 @@
+import logging
+
+import numpy as np
+
+from ginga import RGBMap
+
+
+class TestRGBMap(object):
+
+    def setup_class(self):
+        self.logger = logging.getLogger("TestRGBMap")
+        rs = np.random.RandomState(0)
+        self.idx = rs.randint(0, 70000, (300, 400)).astype(np.uint)
+
+    def _compare(self, rgbmap, order):
+        rgbmap.fused_lut = True
+        arr1 = rgbmap.get_rgbarray(self.idx, order=order).get_array(order)
+        rgbmap.fused_lut = False
+        arr2 = rgbmap.get_rgbarray(self.idx, order=order).get_array(order)
+        rgbmap.fused_lut = True
+        assert np.array_equal(arr1, arr2)
+
+    def test_fused_lut(self):
+        rgbmap = RGBMap.RGBMapper(self.logger)
+        for order in ('RGB', 'RGBA', 'BGRA', 'ARGB'):
+            for name in ('linear', 'log', 'sqrt', 'histeq'):
+                rgbmap.set_hash_algorithm(name)
+                self._compare(rgbmap, order)
+
+    def test_fused_lut_changes(self):
+        rgbmap = RGBMap.RGBMapper(self.logger)
+        self._compare(rgbmap, 'RGBA')
+        rgbmap.set_color_map('rainbow3')
+        self._compare(rgbmap, 'RGBA')
+        rgbmap.set_intensity_map('neg')
+        self._compare(rgbmap, 'RGBA')
+        rgbmap.scale_and_shift(0.6, 0.2)
+        self._compare(rgbmap, 'RGBA')
+        rgbmap.invert_cmap()
+        self._compare(rgbmap, 'RGBA')
+        rgbmap.set_hash_size(256)
+        self._compare(rgbmap, 'RGBA')
@@ -0,0 +1,100 @@
+import logging
+
+import numpy as np
+
+from ginga import AstroImage
+from ginga.canvas.spatial import GridIndex
+from ginga.canvas.CanvasObject import get_canvas_types
+from ginga.mockw.ImageViewCanvasMock import ImageViewCanvas
+
+
+class TestGridIndex(object):
+
+    def test_insert_query(self):
+        idx = GridIndex(cell_size=10.0, max_cells=16)
+        idx.insert('a', (0, 0, 5, 5))
+        idx.insert('b', (100, 100, 105, 105))
+        idx.insert('big', (-1000, -1000, 1000, 1000))
+        idx.insert('any', None)
+
+        assert idx.query(-2, -2, 3, 3) == set(['a', 'big', 'any'])
+        assert idx.query_pt(102, 102) == set(['b', 'big', 'any'])
+        assert idx.query(2000, 2000, 3000, 3000) == set(['any'])
+        assert len(idx) == 4
+
+        idx.remove('a')
+        idx.insert('b', (0, 0, 1, 1))
+        assert 'a' not in idx
+        assert idx.query(-2, -2, 3, 3) == set(['b', 'big', 'any'])
+        assert idx.query_pt(102, 102) == set(['big', 'any'])
+
+
+class TestSpatialCanvas(object):
+
+    def setup_class(self):
+        self.logger = logging.getLogger("TestSpatialCanvas")
+        self.dc = get_canvas_types()
+        self.viewer = ImageViewCanvas(logger=self.logger)
+        self.viewer.set_redraw_lag(0.0)
+        self.viewer.configure_window(200, 100)
+        data = np.zeros((2000, 2000), dtype=np.float32)
+        self.viewer.set_image(AstroImage.AstroImage(data_np=data,
+                                                    logger=self.logger))
+        self.viewer.scale_to(1.0, 1.0)
+
+    def _make_canvas(self, indexed):
+        canvas = self.dc.DrawingCanvas()
+        self.viewer.get_canvas().add(canvas)
+        if indexed:
+            canvas.enable_spatial_index(True, cell_size=32.0)
+        rs = np.random.RandomState(42)
+        for x, y in rs.uniform(0, 2000, (500, 2)):
+            canvas.add(self.dc.Circle(x, y, 4), redraw=False)
+        return canvas
+
+    def test_draw_culls(self):
+        drawn = []
+        canvas = self._make_canvas(True)
+        for obj in canvas.objects:
+            obj.draw = lambda viewer, obj=obj: drawn.append(obj)
+
+        self.viewer.set_pan(1000, 1000)
+        drawn[:] = []
+        canvas.draw(self.viewer)
+        assert 0 < len(drawn) < len(canvas.objects)
+        # every object within the window is drawn
+        x1, y1, x2, y2 = canvas._get_view_bounds(self.viewer)
+        for obj in canvas.objects:
+            if x1 <= obj.x <= x2 and y1 <= obj.y <= y2:
+                assert obj in drawn
+
+    def test_select_same(self):
+        canvas1 = self._make_canvas(False)
+        canvas2 = self._make_canvas(True)
+        for obj1, obj2 in zip(canvas1.objects[:20], canvas2.objects[:20]):
+            pt = (obj1.x + 1, obj1.y)
+            res1 = canvas1.select_items_at(self.viewer, pt)
+            res2 = canvas2.select_items_at(self.viewer, pt)
+            assert ([canvas1.objects.index(obj) for obj in res1] ==
+                    [canvas2.objects.index(obj) for obj in res2])
+            assert len(canvas2.get_items_at(pt)) == len(res2)
+
+    def test_moved_objects(self):
+        canvas = self._make_canvas(True)
+        obj = canvas.objects[0]
+        bbox = canvas._spatial.bboxes[obj]
+        obj.move_to_pt((10000, 10000))
+        # only the entry of the moved object is updated
+        assert not canvas._spatial_dirty
+        assert canvas._spatial.bboxes[obj] != bbox
+        assert len(canvas._spatial) == len(canvas.objects)
+        assert obj in canvas.select_items_at(self.viewer, (10000, 10000))
+
+        # after changing the attributes directly
+        obj.x, obj.y = 20000, 20000
+        canvas.update_object(obj)
+        assert not canvas._spatial_dirty
+        assert obj in canvas.select_items_at(self.viewer, (20000, 20000))
+
+        canvas.delete_object(obj)
+        assert len(canvas.select_items_at(self.viewer, (10000, 10000))) == 0
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from astropy.io import fits
+
+from ginga import AstroImage
+from ginga.misc import log
+from ginga.util.spill import SpillCache
+
+
+class TestSpillCache(object):
+
+    def setup_class(self):
+        self.logger = log.get_logger("TestSpillCache", null=True)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_class(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _load(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        hdu = fits.PrimaryHDU(data)
+        hdu.header.update(OBJECT='M31', CRPIX1=10.0, CRPIX2=20.0,
+                          CTYPE1='RA---TAN', CTYPE2='DEC--TAN',
+                          CRVAL1=10.68, CRVAL2=41.27,
+                          CDELT1=-0.0002, CDELT2=0.0002)
+        hdu.writeto(path, overwrite=True)
+        image = AstroImage.AstroImage(logger=self.logger)
+        image.load_file(path)
+        image.set(name=name, path=path)
+        return image
+
+    def test_spill_load(self):
+        cache = SpillCache(cache_dir=self.tmpdir, logger=self.logger)
+        data = np.arange(60 * 50, dtype='>f4').reshape(60, 50)
+        data[3, 4] = np.nan
+        data[5, 6] = np.inf
+        image = self._load('img1.fits', data)
+
+        assert cache.spill(('Image', 'img1'), image)
+        assert ('Image', 'img1') in cache
+        image2 = cache.load(('Image', 'img1'))
+        assert image2.get('name') == 'img1.fits'
+
+        # data is read-only memory mapped, in native byte order
+        data2 = image2.get_data()
+        assert isinstance(data2, np.memmap)
+        assert not data2.flags.writeable
+        assert data2.dtype == np.dtype('=f4')
+        np.testing.assert_array_equal(data2, data)
+
+        assert image2.get_minmax() == image.get_minmax()
+        assert image2.get_minmax(noinf=True) == image.get_minmax(noinf=True)
+        assert image2.get_keyword('OBJECT') == 'M31'
+        assert (image2.pixtoradec(10.0, 20.0) ==
+                image.pixtoradec(10.0, 20.0))
+
+        # spilling a reopened image again doesn't rewrite it
+        nbytes = cache.get_nbytes()
+        assert cache.spill(('Image', 'img1'), image2)
+        assert cache.get_nbytes() == nbytes
+
+        cache.discard(('Image', 'img1'))
+        assert cache.load(('Image', 'img1')) is None
+        cache.clear()
+        assert not os.path.exists(cache.cache_dir)
+
+    def test_max_bytes(self):
+        cache = SpillCache(cache_dir=self.tmpdir, logger=self.logger)
+        for i in range(3):
+            data = np.full((100, 100), i, dtype=np.float64)
+            image = self._load('img%d.fits' % i, data)
+            cache.spill(('Image', i), image)
+        nbytes = cache.get_nbytes()
+        assert nbytes > 3 * 100 * 100 * 8
+
+        # least recently used image is removed first
+        # NOTE: the sizes of the metadata files differ by a few bytes
+        cache.load(('Image', 0))
+        max_bytes = nbytes * 2 // 3 + 1000
+        cache.set_max_bytes(max_bytes)
+        assert ('Image', 1) not in cache
+        assert ('Image', 0) in cache and ('Image', 2) in cache
+        assert cache.get_nbytes() <= max_bytes
+        assert len(os.listdir(cache.cache_dir)) == 2 * 3
+        cache.clear()
+
+    def test_modified_file(self):
+        cache = SpillCache(cache_dir=self.tmpdir, logger=self.logger)
+        image = self._load('mod.fits', np.zeros((10, 10)))
+        cache.spill(('Image', 'mod'), image)
+
+        # image is not reopened from the cache if its file has changed
+        path = image.get('path')
+        mtime = os.path.getmtime(path)
+        os.utime(path, (mtime + 10, mtime + 10))
+        assert cache.load(('Image', 'mod')) is None
+        assert ('Image', 'mod') not in cache
+        cache.clear()
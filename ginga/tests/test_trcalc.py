@@ -0,0 +1,116 @@
+import numpy as np
+
+from ginga import trcalc
+
+
+class TestOverlayImage(object):
+
+    def setup_class(self):
+        rs = np.random.RandomState(42)
+        self.dst = rs.randint(0, 256, (60, 50, 4)).astype(np.uint8)
+        self.src = rs.randint(0, 256, (20, 30, 4)).astype(np.uint8)
+
+    def _blend_float(self, dst, src, pos, alpha):
+        res = dst.astype(np.double)
+        x, y = pos
+        ht, wd = src.shape[:2]
+        res[y:y + ht, x:x + wd, :3] = (alpha * src[..., :3] +
+                                       (1.0 - alpha) *
+                                       res[y:y + ht, x:x + wd, :3])
+        return res
+
+    def test_per_pixel_alpha(self):
+        res = trcalc.overlay_image(self.dst, (10, 5), self.src, copy=True)
+        alpha = self.src[..., 3:4] / 255.0
+        exp = self._blend_float(self.dst, self.src, (10, 5), alpha)
+        assert res.dtype == np.uint8
+        assert np.abs(res - exp).max() <= 0.5
+        # alpha of the destination is filled in
+        assert np.all(res[5:25, 10:40, 3] == self.dst[5:25, 10:40, 3])
+
+    def test_scalar_alpha(self):
+        src = np.ascontiguousarray(self.src[..., :3])
+        res = trcalc.overlay_image(self.dst, (-5, 50), src, src_order='RGB',
+                                   alpha=0.3, copy=True)
+        exp = self._blend_float(self.dst[:, 0:25],
+                                src[0:10, 5:30], (0, 50), 0.3)
+        # alpha is rounded to 1/255
+        assert np.abs(res[:, 0:25] - exp).max() <= 1.0
+        assert np.all(res[:, 25:] == self.dst[:, 25:])
+
+    def test_opaque_and_transparent(self):
+        src = self.src.copy()
+        src[..., 3] = 255
+        res = trcalc.overlay_image(self.dst, (10, 5), src, copy=True)
+        assert np.all(res[5:25, 10:40, :3] == src[..., :3])
+
+        src[..., 3] = 0
+        res = trcalc.overlay_image(self.dst, (10, 5), src, copy=True)
+        assert np.all(res == self.dst)
+
+    def test_clipped_away(self):
+        dst = np.zeros((10, 10, 4), dtype=np.uint8)
+        src = self.src[:5, :5]
+        for pos in [(20, 20), (-10, 2), (2, -10)]:
+            res = trcalc.overlay_image(dst, pos, src, copy=True)
+            assert np.all(res == 0)
+
+    def test_float_fallback(self):
+        dst = self.dst.astype(np.uint16)
+        src = self.src.astype(np.uint16) * 257
+        res = trcalc.overlay_image(dst, (10, 5), src, copy=True)
+        alpha = src[..., 3:4] / 65535.0
+        exp = self._blend_float(dst, src, (10, 5), alpha)
+        # both terms are truncated
+        assert np.abs(res - exp).max() < 2.0
+
+
+class TestAreaInterpolation(object):
+
+    def _area_1d(self, arr, scale):
+        # brute force area averaging along the first axis
+        inv = 1.0 / scale
+        num = max(int(round(scale * len(arr))), 1)
+        res = []
+        for i in range(num):
+            x1, x2 = i * inv, min((i + 1) * inv, len(arr))
+            tot = sum((min(x2, j + 1) - max(x1, j)) * arr[j]
+                      for j in range(int(x1), int(np.ceil(x2))))
+            res.append(tot / (x2 - x1))
+        return np.array(res)
+
+    def test_downsample_area(self):
+        rs = np.random.RandomState(42)
+        for num, scale in [(10, 0.5), (11, 0.5), (17, 1 / 3.0), (10, 0.3),
+                           (13, 0.37), (100, 0.01), (7, 0.9)]:
+            arr = rs.uniform(0, 100, num)
+            res = trcalc.downsample_area(arr, 0, scale)
+            np.testing.assert_allclose(res, self._area_1d(arr, scale))
+
+    def test_scaled_cutout(self):
+        data = np.arange(60 * 40, dtype=np.float32).reshape(60, 40)
+        res, scales = trcalc.get_scaled_cutout_basic(
+            data, 0, 0, 39, 59, 0.25, 0.5, interpolation='area')
+        assert res.shape == (30, 10) and res.dtype == np.float32
+        assert scales == (0.25, 0.5)
+        assert res[0, 0] == data[0:2, 0:4].mean()
+
+        # NaNs only spread to the pixels that cover them
+        data[3, 3] = np.nan
+        res, scales = trcalc.get_scaled_cutout_basic(
+            data, 0, 0, 39, 59, 0.3, 0.3, interpolation='area')
+        assert list(zip(*np.nonzero(np.isnan(res)))) == [(0, 0), (0, 1),
+                                                         (1, 0), (1, 1)]
+
+    def test_rgb_and_enlarge(self):
+        rs = np.random.RandomState(42)
+        data = rs.randint(0, 256, (30, 20, 3)).astype(np.uint8)
+        res, scales = trcalc.get_scaled_cutout_basic(
+            data, 0, 0, 19, 29, 2.0, 1 / 3.0, interpolation='area')
+        assert res.shape == (10, 40, 3) and res.dtype == np.uint8
+        exp = np.rint(data[0:3, 0].mean(axis=0))
+        assert np.all(res[0, 0] == exp) and np.all(res[0, 1] == exp)
+
+        res, scales = trcalc.get_scaled_cutout_basic2(
+            data, (0, 0), (19, 29), (0.5, 0.5), interpolation='area')
+        assert res.shape == (15, 10, 3)
@@ -4,10 +4,11 @@
 # This is open-source software licensed under a BSD license.
 # Please see the file LICENSE.txt for details.
 #
+import functools
 import math
 import numpy as np
 
-interpolation_methods = ['basic']
+interpolation_methods = ['area', 'basic']
 
 
 def use(pkgname):
@@ -26,7 +27,7 @@ def use(pkgname):
         }
         have_opencv = True
         if 'nearest' not in interpolation_methods:
-            interpolation_methods = list(set(['basic'] +
+            interpolation_methods = list(set(['area', 'basic'] +
                                              list(cv2_resize.keys())))
             interpolation_methods.sort()
 
@@ -97,6 +98,10 @@ def rotate_pt(x_arr, y_arr, theta_deg, xoff=0, yoff=0):
     b_arr = y_arr - yoff
     cos_t = np.cos(np.radians(theta_deg))
     sin_t = np.sin(np.radians(theta_deg))
+    if np.all(np.fmod(theta_deg, 90.0) == 0.0):
+        # quarter turns are exact, so that points on the pixel grid
+        # stay on it
+        cos_t, sin_t = np.rint(cos_t), np.rint(sin_t)
     ap = (a_arr * cos_t) - (b_arr * sin_t)
     bp = (a_arr * sin_t) + (b_arr * cos_t)
     return np.asarray((ap + xoff, bp + yoff))
@@ -413,6 +418,14 @@ def get_scaled_cutout_wdht(data_np, x1, y1, x2, y2, new_wd, new_ht,
                                                                         x1, y1, x2, y2,
                                                                         scale_x, scale_y)
 
+    elif interpolation == 'area':
+        if logger is not None:
+            logger.debug("resizing by area averaging")
+        old_wd, old_ht = max(x2 - x1 + 1, 1), max(y2 - y1 + 1, 1)
+        scale_x, scale_y = float(new_wd) / old_wd, float(new_ht) / old_ht
+        newdata, (scale_x, scale_y) = get_scaled_cutout_area(
+            data_np, (x1, y1), (x2, y2), (scale_x, scale_y), dtype=dtype)
+
     elif interpolation not in ('basic', 'nearest'):
         raise ValueError("Interpolation method not supported: '%s'" % (
             interpolation))
@@ -465,6 +478,156 @@ def get_scaled_cutout_basic_view(shp, p1, p2, scales):
     return get_scaled_cutout_wdhtdp_view(shp, p1, p2, (new_wd, new_ht, new_dp))
 
 
+def get_scaled_tile_view(shp, p1, p2, scales):
+    """
+    Returns the view/slice to extract a region of an image scaled by
+    `scales`, where the region is given by `p1` (x1, y1) and `p2` (x2, y2)
+    (exclusive) in the coordinates of the *scaled* image.
+
+    Unlike get_scaled_cutout_basic_view(), output pixel (u, v) always
+    samples data pixel (int(u / scale_x), int(v / scale_y)), independent
+    of the region requested, so that adjacent regions (tiles) can be
+    assembled without seams.
+    """
+    u1, v1 = int(p1[0]), int(p1[1])
+    u2, v2 = int(p2[0]), int(p2[1])
+    scale_x, scale_y = scales[:2]
+    max_x, max_y = shp[1] - 1, shp[0] - 1
+
+    def _mkidx(i1, i2, scale, max_i):
+        inv = 1.0 / scale
+        step = int(round(inv))
+        if step >= 1 and inv == step and (i2 - 1) * step <= max_i:
+            # integer decimation (or unity scale): a simple stepped view
+            return slice(i1 * step, (i2 - 1) * step + 1, step)
+        idx = (np.arange(i1, i2) / scale).astype(np.int, copy=False)
+        return idx.clip(0, max_i)
+
+    xi = _mkidx(u1, u2, scale_x, max_x)
+    yi = _mkidx(v1, v2, scale_y, max_y)
+    if isinstance(xi, slice) or isinstance(yi, slice):
+        # a single index array combined with a slice does not need to
+        # be broadcast
+        return (yi, xi)
+    return np.s_[yi.reshape(-1, 1), xi.reshape(1, -1)]
+
+
+@functools.lru_cache(maxsize=32)
+def _get_area_plan(old_n, scale):
+    """Calculate how to downsample an axis of length `old_n` by `scale`
+    (< 1) by area averaging.  Output pixel ``i`` is the mean of the
+    input over ``[i / scale, (i + 1) / scale)``, clipped to the axis.
+
+    Returns ``(new_n, step, idx, wts)``.  If ``1 / scale`` is an integer
+    `step`, output pixels are means of whole blocks of input pixels and
+    `idx` and `wts` are `None`.  Otherwise they are arrays of shape
+    ``(num_taps, new_n)`` with the indexes of the input pixels that
+    contribute to each output pixel and their weights.  Plans are
+    cached, since the same scales (zoom levels) are used over and over.
+    """
+    new_n = max(int(round(scale * old_n)), 1)
+    inv = 1.0 / scale
+    step = int(round(inv))
+    if inv == step:
+        return (new_n, step, None, None)
+
+    start = np.arange(new_n) * inv
+    end = np.minimum(start + inv, old_n)
+    i1 = np.floor(start).astype(int)
+    idx = i1 + np.arange(int(math.ceil(inv)) + 1).reshape(-1, 1)
+    overlap = (np.minimum(end, idx + 1) - np.maximum(start, idx)).clip(0, None)
+    wts = overlap / (end - start)
+    # pixels that do not contribute use the first one, which always does,
+    # so that a NaN in them does not spread to their neighbors
+    idx = np.where(wts > 0, idx, i1)
+    return (new_n, None, idx, wts)
+
+
+def downsample_area(data_np, axis, scale):
+    """Downsample `data_np` along `axis` by `scale` (< 1) by averaging
+    the data in the area of each output pixel.  Returns a float array.
+    """
+    old_n = data_np.shape[axis]
+    shp = data_np.shape
+    new_n, step, idx, wts = _get_area_plan(old_n, scale)
+    # float32 is accurate enough for averages of 8- and 16-bit data
+    res_type = np.result_type(data_np.dtype, np.float32)
+    pre = (slice(None),) * axis
+
+    if step is not None:
+        # block averaging: add up the strided slices of the whole blocks
+        # and take the mean of the partial block at the end, if any
+        num = old_n // step
+        res = np.empty(shp[:axis] + (new_n,) + shp[axis + 1:], dtype=res_type)
+        out = res[pre + (slice(0, num),)]
+        end = num * step
+        np.copyto(out, data_np[pre + (slice(0, end, step),)])
+        for i in range(1, step):
+            out += data_np[pre + (slice(i, end, step),)]
+        out /= step
+        if new_n > num:
+            np.mean(data_np[pre + (slice(end, None),)], axis=axis,
+                    dtype=res_type, keepdims=True,
+                    out=res[pre + (slice(num, None),)])
+        return res
+
+    # area interpolation: add up the weighted input pixels for each
+    # output pixel
+    bcast = [1] * data_np.ndim
+    bcast[axis] = -1
+    res = None
+    for i in range(len(idx)):
+        wt = wts[i].astype(res_type).reshape(bcast)
+        vals = np.take(data_np, idx[i], axis=axis)
+        vals = vals.astype(res_type, copy=False)
+        vals *= wt
+        if res is None:
+            res = vals
+        else:
+            res += vals
+    return res
+
+
+def get_scaled_cutout_area(data_np, p1, p2, scales, dtype=None):
+    """Extract a cutout of `data_np` between points `p1` and `p2`
+    (inclusive) and scale it by `scales` (along x, y[, z]).  Reduced
+    axes are downsampled by averaging the data in the area of each output
+    pixel ("area" interpolation); enlarged axes are sampled by nearest
+    neighbor.  Any further axes of `data_np` (e.g. the color planes of an
+    RGB image) are kept.
+
+    Returns the scaled cutout and the actual scales used.
+    """
+    if dtype is None:
+        dtype = data_np.dtype
+    # data axes are (y, x[, z])
+    axes = (1, 0, 2)[:len(scales)]
+    view = [slice(None)] * data_np.ndim
+    for i, axis in enumerate(axes):
+        view[axis] = slice(int(p1[i]), int(p2[i]) + 1)
+    newdata = data_np[tuple(view)]
+
+    actual = list(scales)
+    # do the y axis first, so that there is less data to do along x
+    for i in sorted(range(len(axes)), key=axes.__getitem__):
+        axis, scale = axes[i], scales[i]
+        old_n = max(newdata.shape[axis], 1)
+        if scale < 1.0:
+            newdata = downsample_area(newdata, axis, scale)
+        elif scale > 1.0:
+            new_n = int(round(scale * old_n))
+            iscale = float(old_n) / new_n
+            idx = (np.arange(new_n) * iscale).astype(int, copy=False)
+            newdata = np.take(newdata, idx.clip(0, old_n - 1), axis=axis)
+        actual[i] = float(newdata.shape[axis]) / old_n
+
+    if newdata.dtype.kind == 'f' and np.issubdtype(dtype, np.integer):
+        newdata = np.rint(newdata)
+    newdata = newdata.astype(dtype, copy=False)
+
+    return newdata, tuple(actual)
+
+
 def get_scaled_cutout_basic(data_np, x1, y1, x2, y2, scale_x, scale_y,
                             interpolation='basic', logger=None,
                             dtype=None):
@@ -506,6 +669,12 @@ def get_scaled_cutout_basic(data_np, x1, y1, x2, y2, scale_x, scale_y,
         newdata, (scale_x, scale_y) = trcalc_cl.get_scaled_cutout_basic(
             data_np, x1, y1, x2, y2, scale_x, scale_y)
 
+    elif interpolation == 'area':
+        if logger is not None:
+            logger.debug("resizing by area averaging")
+        newdata, (scale_x, scale_y) = get_scaled_cutout_area(
+            data_np, (x1, y1), (x2, y2), (scale_x, scale_y), dtype=dtype)
+
     elif interpolation not in ('basic', 'nearest'):
         raise ValueError("Interpolation method not supported: '%s'" % (
             interpolation))
@@ -527,6 +696,11 @@ def get_scaled_cutout_basic(data_np, x1, y1, x2, y2, scale_x, scale_y,
 def get_scaled_cutout_basic2(data_np, p1, p2, scales,
                              interpolation='basic', logger=None):
 
+    if interpolation == 'area':
+        if logger is not None:
+            logger.debug("resizing by area averaging")
+        return get_scaled_cutout_area(data_np, p1, p2, scales)
+
     if interpolation not in ('basic', 'nearest'):
         raise ValueError("Interpolation method not supported: '%s'" % (
             interpolation))
@@ -617,6 +791,76 @@ def calc_image_merge_clip(p1, p2, dst, q1, q2):
         return ((dst_x, dst_y), (a1, b1), (a2, b2))
 
 
+def blend_into(dst, src, alpha=1.0, src_alpha=None, max_val=255):
+    """Alpha blend the color planes `src` into `dst`, in place.
+
+    Parameters
+    ----------
+    dst : ndarray
+        Destination color planes (the last axis), e.g. a view of the area
+        of an RGB(A) image being overlaid.  Written in place.
+
+    src : ndarray
+        Source color planes of the same shape as `dst`.
+
+    alpha : float
+        Opacity (0..1) of the source; ignored if `src_alpha` is given.
+
+    src_alpha : ndarray or `None`
+        Opacity of each source pixel (0..`max_val`), with the shape of
+        `src` without the last axis.
+
+    max_val : int
+        Value of a fully opaque pixel in `src_alpha`.
+
+    """
+    if dst.size == 0 or (src_alpha is not None and src_alpha.size == 0):
+        # e.g. source clipped entirely away
+        return
+
+    if src_alpha is not None:
+        a_min, a_max = src_alpha.min(), src_alpha.max()
+        if a_min == a_max:
+            # uniform opacity (e.g. a fully opaque or transparent source)
+            alpha, src_alpha = a_min / float(max_val), None
+
+    if src_alpha is None:
+        if alpha >= 1.0:
+            # optimization to avoid alpha blending
+            dst[...] = src
+            return
+        if alpha <= 0.0:
+            return
+
+    if dst.dtype == np.uint8 and src.dtype == np.uint8 and max_val == 255:
+        # fixed-point blend in 16-bit integers:
+        #   Co = (Ca * Aa + Cb * (255 - Aa) + 128) / 255
+        # where the division by 255 is done (with rounding) as
+        #   x / 255 = (x + (x >> 8)) >> 8
+        # all terms fit in 16 bits
+        if src_alpha is None:
+            a = np.uint16(int(round(alpha * 255)))
+        else:
+            a = src_alpha.astype(np.uint16)[..., np.newaxis]
+        res = np.multiply(src, a, dtype=np.uint16)
+        tmp = np.multiply(dst, 255 - a, dtype=np.uint16)
+        res += tmp
+        res += 128
+        np.right_shift(res, 8, out=tmp)
+        res += tmp
+        res >>= 8
+        np.copyto(dst, res, casting='unsafe')
+        return
+
+    # calculate alpha blending in floating point
+    #   Co = CaAa + CbAb(1 - Aa)
+    if src_alpha is not None:
+        alpha = (src_alpha / float(max_val))[..., np.newaxis]
+    a_arr = (alpha * src).astype(dst.dtype, copy=False)
+    b_arr = ((1.0 - alpha) * dst).astype(dst.dtype, copy=False)
+    dst[...] = a_arr + b_arr
+
+
 def overlay_image_2d(dstarr, pos, srcarr, dst_order='RGBA',
                      src_order='RGBA',
                      alpha=1.0, copy=False, fill=False, flipy=False):
@@ -680,12 +924,12 @@ def overlay_image_2d(dstarr, pos, srcarr, dst_order='RGBA',
     if fill and (da_idx >= 0):
         dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd, da_idx] = dst_max_val
 
+    src_alpha = None
     if (src_ch > 3) and ('A' in src_order):
         sa_idx = src_order.index('A')
         # if overlay source contains an alpha channel, extract it
         # and use it, otherwise use scalar keyword parameter
-        alpha = srcarr[0:src_ht, 0:src_wd, sa_idx] / float(src_max_val)
-        alpha = np.dstack((alpha, alpha, alpha))
+        src_alpha = srcarr[0:src_ht, 0:src_wd, sa_idx]
 
     # reorder srcarr if necessary to match dstarr for alpha merge
     get_order = dst_order
@@ -694,23 +938,10 @@ def overlay_image_2d(dstarr, pos, srcarr, dst_order='RGBA',
     if get_order != src_order:
         srcarr = reorder_image(get_order, srcarr, src_order)
 
-    if np.isscalar(alpha) and alpha == 1.0:
-        # optimization to avoid alpha blending
-        # Place our srcarr into this dstarr at dst offsets
-        dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd, slc] = (
-            srcarr[0:src_ht, 0:src_wd, slc])
-    else:
-        # calculate alpha blending
-        #   Co = CaAa + CbAb(1 - Aa)
-        a_arr = (alpha * srcarr[0:src_ht, 0:src_wd, slc]).astype(dst_type,
-                                                                 copy=False)
-        b_arr = ((1.0 - alpha) * dstarr[dst_y:dst_y + src_ht,
-                                        dst_x:dst_x + src_wd,
-                                        slc]).astype(dst_type, copy=False)
-
-        # Place our srcarr into this dstarr at dst offsets
-        dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd, slc] = (
-            a_arr[0:src_ht, 0:src_wd, slc] + b_arr[0:src_ht, 0:src_wd, slc])
+    # Place our srcarr into this dstarr at dst offsets
+    blend_into(dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd, slc],
+               srcarr[0:src_ht, 0:src_wd, slc],
+               alpha=alpha, src_alpha=src_alpha, max_val=src_max_val)
 
     return dstarr
 
@@ -792,15 +1023,12 @@ def overlay_image_3d(dstarr, pos, srcarr, dst_order='RGBA', src_order='RGBA',
         dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd,
                dst_z:dst_z + src_dp, da_idx] = dst_max_val
 
+    src_alpha = None
     if (src_ch > 3) and ('A' in src_order):
         sa_idx = src_order.index('A')
         # if overlay source contains an alpha channel, extract it
         # and use it, otherwise use scalar keyword parameter
-        alpha = srcarr[0:src_ht, 0:src_wd, 0:src_dp, sa_idx] / float(src_max_val)
-        alpha = np.concatenate([alpha[..., np.newaxis],
-                                alpha[..., np.newaxis],
-                                alpha[..., np.newaxis]],
-                               axis=-1)
+        src_alpha = srcarr[0:src_ht, 0:src_wd, 0:src_dp, sa_idx]
 
     # reorder srcarr if necessary to match dstarr for alpha merge
     get_order = dst_order
@@ -809,27 +1037,11 @@ def overlay_image_3d(dstarr, pos, srcarr, dst_order='RGBA', src_order='RGBA',
     if get_order != src_order:
         srcarr = reorder_image(get_order, srcarr, src_order)
 
-    if np.isscalar(alpha) and alpha == 1.0:
-        # optimization to avoid alpha blending
-        # Place our srcarr into this dstarr at dst offsets
-        dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd,
-               dst_z:dst_z + src_dp, slc] = (
-            srcarr[0:src_ht, 0:src_wd, 0:src_dp, slc])
-    else:
-        # calculate alpha blending
-        #   Co = CaAa + CbAb(1 - Aa)
-        a_arr = (alpha * srcarr[0:src_ht, 0:src_wd,
-                                0:src_dp, slc]).astype(dst_type, copy=False)
-        b_arr = ((1.0 - alpha) * dstarr[dst_y:dst_y + src_ht,
-                                        dst_x:dst_x + src_wd,
-                                        dst_z:dst_z + src_dp,
-                                        slc]).astype(dst_type, copy=False)
-
-        # Place our srcarr into this dstarr at dst offsets
-        dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd,
-               dst_z:dst_z + src_dp, slc] = (
-            a_arr[0:src_ht, 0:src_wd, 0:src_dp, slc] +
-            b_arr[0:src_ht, 0:src_wd, 0:src_dp, slc])
+    # Place our srcarr into this dstarr at dst offsets
+    blend_into(dstarr[dst_y:dst_y + src_ht, dst_x:dst_x + src_wd,
+                      dst_z:dst_z + src_dp, slc],
+               srcarr[0:src_ht, 0:src_wd, 0:src_dp, slc],
+               alpha=alpha, src_alpha=src_alpha, max_val=src_max_val)
 
     return dstarr
 
@@ -902,24 +1114,27 @@ def get_bounds(pts):
 
 
 def fill_array(dstarr, order, r, g, b, a):
-    """Fill array dstarr with a color value. order defines the color planes
-    in the array.  (r, g, b, a) are expected to be in the range 0..1 and
-    are scaled to the appropriate values.
+    """Fill array dstarr in place with a color value. order defines the
+    color planes in the array.  (r, g, b, a) are expected to be in the
+    range 0..1 and are scaled to the appropriate values.
 
-    dstarr can be a 2D or 3D array.
+    dstarr can be a 2D or 3D array.  Returns dstarr.
     """
-    # TODO: can we make this more efficient?
     dtype = dstarr.dtype
     maxv = np.iinfo(dtype).max
     bgval = dict(A=int(maxv * a), R=int(maxv * r), G=int(maxv * g),
                  B=int(maxv * b))
     bgtup = tuple([bgval[order[i]] for i in range(len(order))])
-    if dtype is np.uint8 and len(bgtup) == 4:
-        # optimiztion
-        bgtup = np.array(bgtup, dtype=dtype).view(np.uint32)[0]
-        dstarr = dstarr.view(np.uint32)
+    if (dtype == np.uint8 and len(bgtup) == 4 and
+            dstarr.flags.c_contiguous):
+        # optimiztion when dealing with 32-bit RGBA arrays
+        fill_val = np.array(bgtup, dtype=dtype).view(np.uint32)
+        rgba_i = dstarr.view(np.uint32)
+        rgba_i[:] = fill_val
+        return dstarr
 
     dstarr[..., :] = bgtup
+    return dstarr
 
 
 def make_filled_array(shp, dtype, order, r, g, b, a):
@@ -929,18 +1144,7 @@ def make_filled_array(shp, dtype, order, r, g, b, a):
 
     shp can define a 2D or 3D array.
     """
-    # TODO: can we make this more efficient?
-    maxv = np.iinfo(dtype).max
-    bgval = dict(A=int(maxv * a), R=int(maxv * r), G=int(maxv * g),
-                 B=int(maxv * b))
-    bgtup = tuple([bgval[order[i]] for i in range(len(order))])
-    if dtype is np.uint8 and len(bgtup) == 4:
-        # optimiztion when dealing with 32-bit RGBA arrays
-        fill_val = np.array(bgtup, dtype=dtype).view(np.uint32)
-        rgba = np.zeros(shp, dtype=dtype)
-        rgba_i = rgba.view(np.uint32)
-        rgba_i[:] = fill_val
-        return rgba
-    return np.full(shp, bgtup, dtype=dtype)
+    rgba = np.empty(shp, dtype=dtype)
+    return fill_array(rgba, order, r, g, b, a)
 
 # END
@@ -0,0 +1,398 @@
+#
+# batchrender.py -- render image files to PNG/JPEG previews in batch
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Render a large number of image files (e.g. FITS) to preview images,
+without a GUI, using the same rendering pipeline (cut levels, color
+distribution, color and intensity maps) as the Ginga viewers.
+
+Files are rendered in parallel by a pool of worker processes, each of
+which keeps one headless viewer for all the files it renders.  Each
+preview is written as soon as it is rendered, and a line with the time
+spent loading, rendering and writing it is printed as it completes.
+
+Usage::
+
+    $ ginga-render -o previews --cmap=rainbow3 --autocuts=zscale \\
+          --size=512x512 --numprocs=8 "night1/*.fits"
+
+Quote glob patterns to have them expanded by ``ginga-render`` instead
+of the shell (avoids command line length limits for large numbers of
+files), or use ``--filelist`` to read the names from a file.
+"""
+import sys
+import os
+import glob
+import time
+import multiprocessing
+from optparse import OptionParser
+
+from ginga.misc import log, Bunch, Settings
+from ginga.util import iohelper, loader
+
+try:
+    from ginga.version import version
+except ImportError:
+    version = 'unknown'
+
+__all__ = ['expand_filespecs', 'get_outpath', 'render_file',
+           'render_files']
+
+# headless viewer used by this (worker) process
+_viewer = None
+
+
+def expand_filespecs(filespecs):
+    """Expand glob patterns in `filespecs`, keeping any HDU suffix
+    (e.g. ``"*.fits[1]"``).  Names that do not match any file are passed
+    through unchanged.
+    """
+    res = []
+    for filespec in filespecs:
+        info = iohelper.get_fileinfo(filespec)
+        suffix = iohelper.get_hdu_suffix(info.numhdu)
+        paths = sorted(glob.glob(info.filepath))
+        if len(paths) == 0:
+            res.append(filespec)
+        else:
+            res.extend([path + suffix for path in paths])
+    return res
+
+
+def get_outpath(filespec, outdir, format='png'):
+    """Get the path of the preview file for `filespec`."""
+    info = iohelper.get_fileinfo(filespec)
+    name = info.name
+    if outdir is None:
+        outdir = os.path.dirname(info.filepath)
+    return os.path.join(outdir, name + '.' + format)
+
+
+def make_viewer(options, logger=None):
+    """Create a headless viewer configured according to `options`.
+
+    Parameters
+    ----------
+    options : dict
+        See :func:`render_files`.
+
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for tracing and debugging.
+
+    Returns
+    -------
+    viewer : `~ginga.pilw.ImageViewPil.CanvasView`
+        The viewer.
+
+    """
+    # NOTE: imported here so that importing this module does not
+    # require PIL
+    from ginga.pilw.ImageViewPil import CanvasView
+
+    if logger is None:
+        logger = log.get_logger(null=True)
+
+    settings = None
+    if options.get('settings', None) is not None:
+        settings = Settings.SettingGroup(name='batchrender', logger=logger,
+                                         preffile=options['settings'])
+        settings.load(onError='raise')
+
+    viewer = CanvasView(logger=logger, settings=settings)
+    viewer.set_redraw_lag(0.0)
+    wd, ht = options.get('size', (512, 512))
+    viewer.configure_window(wd, ht)
+
+    t_ = viewer.get_settings()
+    for key in ('color_map', 'intensity_map', 'color_algorithm'):
+        value = options.get(key, None)
+        if value is not None:
+            t_.set(**{key: value})
+    if options.get('autocuts', None) is not None:
+        viewer.set_autocut_params(options['autocuts'])
+
+    if options.get('cuts', None) is not None:
+        t_.set(autocuts='off')
+    else:
+        t_.set(autocuts='on')
+
+    if options.get('zoom', None) is None:
+        t_.set(autozoom='on')
+    else:
+        t_.set(autozoom='off')
+        scale = options['zoom']
+        viewer.scale_to(scale, scale)
+
+    return viewer
+
+
+def _init_worker(options):
+    global _viewer
+    logger = log.get_logger(name='ginga-render', null=True)
+    _viewer = make_viewer(options, logger=logger)
+
+
+def _render_file(args):
+    # pool worker: catch errors, so that one bad file does not stop
+    # the batch
+    filespec, outpath, options = args
+    try:
+        return render_file(_viewer, filespec, outpath, options)
+
+    except Exception as e:
+        return Bunch.Bunch(filespec=filespec, outpath=outpath,
+                           error=str(e))
+
+
+def render_file(viewer, filespec, outpath, options):
+    """Render one file with `viewer` and write the preview.
+
+    Parameters
+    ----------
+    viewer : `~ginga.pilw.ImageViewPil.CanvasView`
+        A viewer made by :func:`make_viewer`.
+
+    filespec : str
+        Path of the file to load, optionally with an HDU suffix.
+
+    outpath : str
+        Path of the preview file to write.
+
+    options : dict
+        See :func:`render_files`.
+
+    Returns
+    -------
+    res : `~ginga.misc.Bunch.Bunch`
+        ``filespec``, ``outpath``, ``error`` (`None` unless it failed) and
+        the times (in sec) spent in ``load``, ``render`` and ``save``.
+
+    """
+    fmt = options.get('format', 'png')
+    res = Bunch.Bunch(filespec=filespec, outpath=outpath, error=None)
+
+    time_start = time.time()
+    image = loader.load_data(filespec, logger=viewer.get_logger())
+    time_load = time.time()
+
+    with viewer.suppress_redraw:
+        viewer.set_image(image)
+        if options.get('cuts', None) is not None:
+            viewer.cut_levels(*options['cuts'])
+        if options.get('zoom', None) is not None:
+            viewer.center_image()
+    time_render = time.time()
+
+    viewer.save_rgb_image_as_file(outpath, format=fmt,
+                                  quality=options.get('quality', 90))
+    time_save = time.time()
+
+    res.update(dict(load=time_load - time_start,
+                    render=time_render - time_load,
+                    save=time_save - time_render))
+    return res
+
+
+def render_files(filespecs, outdir=None, numprocs=None, options=None,
+                 skip_existing=False, logger=None):
+    """Render files to previews in parallel.
+
+    Parameters
+    ----------
+    filespecs : list of str
+        Paths of the files to render (glob patterns are expanded).
+
+    outdir : str or `None`
+        Directory for the preview files; if `None` they are written next
+        to the input files.
+
+    numprocs : int or `None`
+        Number of worker processes; defaults to the number of CPUs.  If 1,
+        files are rendered in this process.
+
+    options : dict or `None`
+        Rendering options: ``size`` (``(width, height)``), ``zoom``
+        (scale factor, or `None` to fit the image to the size),
+        ``color_map``, ``intensity_map``, ``color_algorithm``,
+        ``autocuts`` (method name), ``cuts`` (``(lo, hi)``, overrides
+        ``autocuts``), ``settings`` (path of a viewer settings file),
+        ``format`` ("png" or "jpeg") and ``quality``.
+
+    skip_existing : bool
+        Do not render files whose preview already exists.
+
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for tracing and debugging.
+
+    Returns
+    -------
+    results : iterator
+        Yields the result of :func:`render_file` for each file, in the
+        order in which they finish.
+
+    """
+    if options is None:
+        options = {}
+    if numprocs is None:
+        numprocs = multiprocessing.cpu_count()
+    fmt = options.get('format', 'png')
+
+    jobs = []
+    for filespec in expand_filespecs(filespecs):
+        outpath = get_outpath(filespec, outdir, format=fmt)
+        if skip_existing and os.path.exists(outpath):
+            continue
+        jobs.append((filespec, outpath, options))
+
+    if logger is not None:
+        logger.info("rendering %d files with %d processes" % (
+            len(jobs), numprocs))
+
+    if numprocs <= 1:
+        viewer = make_viewer(options, logger=logger)
+        for filespec, outpath, options in jobs:
+            try:
+                yield render_file(viewer, filespec, outpath, options)
+
+            except Exception as e:
+                yield Bunch.Bunch(filespec=filespec, outpath=outpath,
+                                  error=str(e))
+        return
+
+    pool = multiprocessing.Pool(processes=numprocs,
+                                initializer=_init_worker,
+                                initargs=(options,))
+    try:
+        for res in pool.imap_unordered(_render_file, jobs, chunksize=1):
+            yield res
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _parse_size(size_s):
+    wd, ht = size_s.lower().split('x')
+    return (int(wd), int(ht))
+
+
+def main(options, args):
+
+    logger = log.get_logger(name="ginga-render", options=options)
+
+    filespecs = list(args)
+    if options.filelist is not None:
+        with open(options.filelist, 'r') as in_f:
+            filespecs.extend([line.strip() for line in in_f
+                              if len(line.strip()) > 0])
+
+    if options.outdir is not None and not os.path.isdir(options.outdir):
+        os.makedirs(options.outdir)
+
+    render_options = dict(size=_parse_size(options.size),
+                          color_map=options.cmap,
+                          intensity_map=options.imap,
+                          color_algorithm=options.calg,
+                          autocuts=options.autocuts,
+                          settings=options.settings,
+                          format=options.format,
+                          quality=options.quality)
+    if options.zoom is not None and options.zoom != 'fit':
+        render_options['zoom'] = float(options.zoom)
+    if options.cuts is not None:
+        render_options['cuts'] = tuple(map(float, options.cuts.split(',')))
+
+    time_start = time.time()
+    num_done, num_errors = 0, 0
+    for res in render_files(filespecs, outdir=options.outdir,
+                            numprocs=options.numprocs,
+                            options=render_options,
+                            skip_existing=options.skip_existing,
+                            logger=logger):
+        if res.error is not None:
+            num_errors += 1
+            logger.error("error rendering '%s': %s" % (res.filespec,
+                                                       res.error))
+            continue
+        num_done += 1
+        total = res.load + res.render + res.save
+        print("%s\t%s\t%.4f\t%.4f\t%.4f\t%.4f" % (
+            res.filespec, res.outpath, res.load, res.render, res.save,
+            total))
+        sys.stdout.flush()
+
+    elapsed = time.time() - time_start
+    logger.info("rendered %d files (%d errors) in %.2f sec" % (
+        num_done, num_errors, elapsed))
+    return 1 if num_errors > 0 else 0
+
+
+def _main():
+    """Run from command line."""
+    usage = "usage: %prog [options] file ..."
+    optprs = OptionParser(usage=usage, version=version)
+
+    optprs.add_option("--autocuts", dest="autocuts", metavar="METHOD",
+                      help="Set auto cut levels method to METHOD")
+    optprs.add_option("--calg", dest="calg", metavar="NAME",
+                      help="Set color distribution algorithm to NAME")
+    optprs.add_option("--cmap", dest="cmap", metavar="NAME",
+                      help="Set color map to NAME")
+    optprs.add_option("--cuts", dest="cuts", metavar="LO,HI",
+                      help="Set cut levels (overrides --autocuts)")
+    optprs.add_option("--debug", dest="debug", default=False,
+                      action="store_true",
+                      help="Enter the pdb debugger on main()")
+    optprs.add_option("--filelist", dest="filelist", metavar="FILE",
+                      help="Read names of files to render from FILE")
+    optprs.add_option("--format", dest="format", metavar="FORMAT",
+                      default='png',
+                      help="Write previews in FORMAT (png|jpeg)")
+    optprs.add_option("--imap", dest="imap", metavar="NAME",
+                      help="Set intensity map to NAME")
+    optprs.add_option("-n", "--numprocs", dest="numprocs", metavar="NUM",
+                      type="int", default=None,
+                      help="Use NUM worker processes (default: #cpus)")
+    optprs.add_option("-o", "--outdir", dest="outdir", metavar="DIR",
+                      help="Write previews to DIR")
+    optprs.add_option("--profile", dest="profile", action="store_true",
+                      default=False,
+                      help="Run the profiler on main()")
+    optprs.add_option("--quality", dest="quality", metavar="NUM",
+                      type="int", default=90,
+                      help="Set JPEG quality to NUM")
+    optprs.add_option("--settings", dest="settings", metavar="FILE",
+                      help="Load viewer settings from FILE")
+    optprs.add_option("--size", dest="size", metavar="WDxHT",
+                      default='512x512',
+                      help="Set size of previews to WDxHT")
+    optprs.add_option("--skip-existing", dest="skip_existing",
+                      default=False, action="store_true",
+                      help="Don't render files whose preview exists")
+    optprs.add_option("--zoom", dest="zoom", metavar="SCALE",
+                      default='fit',
+                      help="Set scale to SCALE or 'fit' (default)")
+    log.addlogopts(optprs)
+
+    (options, args) = optprs.parse_args(sys.argv[1:])
+
+    # Are we debugging this?
+    if options.debug:
+        import pdb
+
+        pdb.run('main(options, args)')
+
+    # Are we profiling this?
+    elif options.profile:
+        import profile
+
+        print("%s profile:" % sys.argv[0])
+        profile.run('main(options, args)')
+
+    else:
+        sys.exit(main(options, args))
+
+# END
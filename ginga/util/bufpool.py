@@ -0,0 +1,94 @@
+#
+# bufpool.py -- reusable scratch buffers for rendering
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+A pool of named scratch arrays that are reused from one rendered frame to
+the next.  A buffer is only (re)allocated when the requested shape or
+dtype differs from the one held under that name, e.g. when the window
+is resized.  Allocations are counted so that they can be reported in the
+viewer's render statistics.
+"""
+import threading
+
+import numpy as np
+
+__all__ = ['BufferPool']
+
+
+class BufferPool(object):
+    """A set of named, reusable numpy arrays.
+
+    Parameters
+    ----------
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for tracing and debugging.
+
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+
+        self._buffers = {}
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    def get_buffer(self, name, shape, dtype):
+        """Get the scratch buffer called `name`, which will have the given
+        `shape` and `dtype`.  The contents of the buffer are undefined.
+        """
+        shape, dtype = tuple(shape), np.dtype(dtype)
+        with self._lock:
+            buf = self._buffers.get(name, None)
+            if (buf is not None and buf.shape == shape and
+                    buf.dtype == dtype):
+                self.num_reuses += 1
+                return buf
+
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+            self.count_alloc(buf)
+
+        if self.logger is not None:
+            self.logger.debug("allocated scratch buffer '%s' %s %s" % (
+                str(name), str(shape), str(dtype)))
+        return buf
+
+    def count_alloc(self, arr):
+        """Record an allocation of array `arr` that was made outside of the
+        pool on behalf of the same rendering pipeline.
+        """
+        with self._lock:
+            self.num_allocs += 1
+            self.alloc_bytes += arr.nbytes
+
+    def clear(self):
+        """Release all buffers."""
+        with self._lock:
+            self._buffers = {}
+
+    def reset_stats(self):
+        """Reset the allocation counters."""
+        self.num_allocs = 0
+        self.num_reuses = 0
+        self.alloc_bytes = 0
+
+    def get_stats(self):
+        """Get allocation statistics.
+
+        Returns
+        -------
+        stats : dict
+            ``allocs`` (number of allocations), ``alloc_bytes`` (total bytes
+            allocated), ``reuses`` (number of times a buffer was reused)
+            and ``pool_bytes`` (size of the buffers currently held).
+
+        """
+        with self._lock:
+            pool_bytes = sum([buf.nbytes for buf in self._buffers.values()])
+            return dict(allocs=self.num_allocs, alloc_bytes=self.alloc_bytes,
+                        reuses=self.num_reuses, pool_bytes=pool_bytes)
+
+# END
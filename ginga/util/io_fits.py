@@ -19,6 +19,11 @@ To force the use of one, do:
 (replace 'package' with one of {'astropy', 'fitsio'}) before you load
 any images.  Otherwise Ginga will try to pick one for you.
 """
+import io
+import re
+import threading
+from collections import OrderedDict
+
 import numpy as np
 
 from ginga.misc import Bunch
@@ -66,6 +71,525 @@ def use(fitspkg, raise_err=True):
     return False
 
 
+class MemmapSection(object):
+    """Lazily read data of an uncompressed image HDU.
+
+    The data is memory mapped from the file, and only the parts that are
+    indexed are read (and scaled by BSCALE/BZERO, if necessary), so that
+    a huge image can be viewed without reading all of it.
+
+    Parameters
+    ----------
+    filepath : str
+        Path of the FITS file.
+
+    offset : int
+        Offset of the data of the HDU in the file.
+
+    header : dict-like
+        Header of the HDU.
+
+    """
+
+    # data types for BITPIX values
+    bitpix_types = {8: 'u1', 16: '>i2', 32: '>i4', 64: '>i8',
+                    -32: '>f4', -64: '>f8'}
+
+    def __init__(self, filepath, offset, header, _raw=None):
+        self.filepath = filepath
+        bitpix = header['BITPIX']
+        if _raw is None:
+            naxis = header['NAXIS']
+            shape = tuple(header['NAXIS%d' % (i + 1)]
+                          for i in reversed(range(naxis)))
+            _raw = np.memmap(filepath, dtype=self.bitpix_types[bitpix],
+                             mode='r', offset=offset, shape=shape)
+        self._raw = _raw
+        self._header = header
+
+        self.bscale = header.get('BSCALE', 1)
+        self.bzero = header.get('BZERO', 0)
+        self.blank = header.get('BLANK', None) if bitpix > 0 else None
+
+        raw_type = np.dtype(self.bitpix_types[bitpix]).newbyteorder('=')
+        self._uint_offset = None
+        if self.bscale == 1 and self.bzero == 0:
+            self.dtype = raw_type
+        elif (bitpix > 8 and self.bscale == 1 and
+              self.bzero == 2 ** (bitpix - 1)):
+            # signed integers with the offset of the unsigned type
+            self.dtype = np.dtype('u%d' % (bitpix // 8))
+            self._uint_offset = np.array(2 ** (bitpix - 1),
+                                         dtype=self.dtype)
+        elif bitpix == 8 and self.bscale == 1 and self.bzero == -128:
+            self.dtype = np.dtype(np.int8)
+            self._uint_offset = np.array(-128, dtype=self.dtype)
+        elif abs(bitpix) > 16:
+            self.dtype = np.dtype(np.float64)
+        else:
+            self.dtype = np.dtype(np.float32)
+
+    @property
+    def shape(self):
+        return self._raw.shape
+
+    @property
+    def ndim(self):
+        return self._raw.ndim
+
+    @property
+    def size(self):
+        return self._raw.size
+
+    @property
+    def nbytes(self):
+        return self._raw.size * self.dtype.itemsize
+
+    def _scale(self, raw):
+        if self._uint_offset is not None:
+            # e.g. 16-bit unsigned data stored as signed integers with an
+            # offset: flipping the sign bit adds the offset
+            data = raw.astype(self._uint_offset.dtype)
+            data ^= self._uint_offset
+            return data
+
+        if self.dtype.kind != 'f' or (self.bscale == 1 and self.bzero == 0):
+            return raw.astype(self.dtype, copy=False)
+
+        data = raw.astype(self.dtype)
+        if self.bscale != 1:
+            data *= self.bscale
+        if self.bzero != 0:
+            data += self.bzero
+        if self.blank is not None:
+            data[raw == self.blank] = np.nan
+        return data
+
+    def __getitem__(self, view):
+        """Read and return the data selected by `view` (any numpy index)."""
+        return self._scale(np.asarray(self._raw[view]))
+
+    def __array__(self, dtype=None):
+        data = self[...]
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
+
+    def get_plane(self, view):
+        """Get a `MemmapSection` of a part of the data (e.g. a plane of a
+        cube) selected by `view` (integers and slices), without reading
+        it.
+        """
+        return self.__class__(self.filepath, None, self._header,
+                              _raw=self._raw[view])
+
+
+class CompImageSection(object):
+    """Lazily read data of a tile compressed image HDU.
+
+    Only the tiles of the compressed image that intersect the parts that
+    are indexed are read and decompressed.  Decompressed tiles are kept
+    in a least recently used cache, whose size is limited to `max_bytes`,
+    and (if `prefetch` is `True`) the tiles neighboring an indexed region
+    are decompressed in a background thread, so that panning around a
+    huge image needs to decompress only what comes into view.
+
+    Parameters
+    ----------
+    filepath : str
+        Path of the FITS file.
+
+    offset : int
+        Offset of the data (the binary table) of the HDU in the file.
+
+    header : dict-like
+        Header of the HDU, as stored in the file (i.e. the header of the
+        binary table, with the ``Z*`` keywords).
+
+    max_bytes : int or `None`
+        Memory budget (in bytes) of the cache of decompressed tiles.  If
+        `None`, ``cache_bytes`` is used.
+
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for tracing and debugging.
+
+    """
+
+    # default size limit of the cache of decompressed tiles
+    cache_bytes = 256 * 1024 ** 2
+    # decompress the tiles neighboring an indexed region in the background
+    prefetch = True
+    # limit on the size of the tiles decompressed together
+    max_decode_bytes = 16 * 1024 ** 2
+
+    # sizes (in bytes) of binary table field types
+    _tform_sizes = {'L': 1, 'B': 1, 'I': 2, 'J': 4, 'K': 8, 'A': 1, 'E': 4,
+                    'D': 8, 'C': 8, 'M': 16, 'P': 8, 'Q': 16}
+    _tform_re = re.compile(r'\s*(\d*)([LXBIJKAEDCMPQ])([A-Z]?)')
+
+    def __init__(self, filepath, offset, header, max_bytes=None,
+                 logger=None, _parent=None, _plane=None):
+        if _parent is not None:
+            # a plane of the image of `_parent`; share the file and cache
+            self.__dict__.update(_parent.__dict__)
+            self._shape = _parent._shape[-2:]
+            self._row0 = _plane * self._tiles_per_plane
+            return
+
+        self.filepath = filepath
+        self.logger = logger
+        if max_bytes is None:
+            max_bytes = self.cache_bytes
+        self.max_bytes = max_bytes
+
+        naxis = header['ZNAXIS']
+        if naxis < 2:
+            raise FITSError("Need at least 2 axes to read image by tiles")
+        self._shape = tuple(header['ZNAXIS%d' % (i + 1)]
+                            for i in reversed(range(naxis)))
+        ht, wd = self._shape[-2:]
+        tile_shape = [header.get('ZTILE%d' % (i + 1), 1)
+                      for i in reversed(range(naxis))]
+        tile_shape[-1] = header.get('ZTILE1', wd)
+        if any(n != 1 for n in tile_shape[:-2]):
+            raise FITSError("Can't read tiles spanning image planes")
+        self.tile_shape = tuple(tile_shape[-2:])
+        th, tw = self.tile_shape
+        self._num_tiles = ((ht + th - 1) // th, (wd + tw - 1) // tw)
+        self._tiles_per_plane = self._num_tiles[0] * self._num_tiles[1]
+        self._row0 = 0
+
+        # memory map the table and heap, and find the array descriptors
+        # that point into the heap
+        row_size, num_rows = header['NAXIS1'], header['NAXIS2']
+        self._table = np.memmap(filepath, dtype=np.uint8, mode='r',
+                                offset=offset, shape=(num_rows, row_size))
+        heap_size = header.get('PCOUNT', 0)
+        self._heap = np.memmap(filepath, dtype=np.uint8, mode='r',
+                               offset=offset + header.get(
+                                   'THEAP', row_size * num_rows),
+                               shape=(max(1, heap_size),))
+        self._arrays = []
+        pos = 0
+        for i in range(header['TFIELDS']):
+            match = self._tform_re.match(header['TFORM%d' % (i + 1)])
+            repeat, kind, elt_kind = match.groups()
+            repeat = int(repeat) if len(repeat) > 0 else 1
+            if kind in ('P', 'Q'):
+                desc_type = '>i4' if kind == 'P' else '>i8'
+                self._arrays.append((pos, np.dtype(desc_type),
+                                     self._tform_sizes[elt_kind]))
+            if kind == 'X':
+                pos += (repeat + 7) // 8
+            else:
+                pos += repeat * self._tform_sizes[kind]
+
+        self._header = header
+        self._primary = pyfits.PrimaryHDU().header.tostring().encode('ascii')
+
+        self._cache = OrderedDict()
+        self._cache_info = Bunch.Bunch(nbytes=0, pending=None, thread=None)
+        self._lock = threading.RLock()
+
+        # decompress the first tile to find the type of the data
+        tile = self._get_tiles([0], [0])[0]
+        self.dtype = tile.dtype
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def ndim(self):
+        return len(self._shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self._shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def get_cache_size(self):
+        """Return the size (in bytes) of the decompressed tiles that are
+        cached.
+        """
+        return self._cache_info.nbytes
+
+    def _decode(self, rows, wd, ht):
+        # decompress the `wd` x `ht` tiles in `rows` of the table, by
+        # writing them (with a header for an image of the tiles stacked
+        # on top of each other) as a small FITS file in memory and
+        # letting astropy read that
+        table = self._table[rows]
+        parts, pos = [], 0
+        for offset, desc_type, elt_size in self._arrays:
+            desc = table[:, offset:offset + 2 * desc_type.itemsize].view(
+                desc_type)
+            for i in range(len(desc)):
+                count, start = int(desc[i, 0]), int(desc[i, 1])
+                parts.append(self._heap[start:start + count * elt_size])
+                desc[i, 1] = pos
+                pos += count * elt_size
+
+        header = self._header.copy()
+        header['NAXIS2'] = len(rows)
+        header['PCOUNT'] = pos
+        for i in range(2, len(self._shape)):
+            for kwd in ('ZNAXIS%d' % (i + 1), 'ZTILE%d' % (i + 1)):
+                header.remove(kwd, ignore_missing=True)
+        header['ZNAXIS'] = 2
+        header['ZNAXIS1'] = header['ZTILE1'] = wd
+        header['ZNAXIS2'] = ht * len(rows)
+        header['ZTILE2'] = ht
+        if 'ZDITHER0' in header:
+            # the dithering of a tile depends on its row in the table
+            header['ZDITHER0'] = ((header['ZDITHER0'] - 1 + rows[0]) %
+                                  10000) + 1
+        for kwd in ('THEAP', 'CHECKSUM', 'DATASUM'):
+            header.remove(kwd, ignore_missing=True)
+
+        buf = io.BytesIO()
+        buf.write(self._primary)
+        buf.write(header.tostring().encode('ascii'))
+        buf.write(table.tobytes())
+        for part in parts:
+            buf.write(part.tobytes())
+        buf.write(bytes(-buf.tell() % 2880))
+        buf.seek(0)
+        with pyfits.open(buf, memmap=False) as fits_f:
+            data = fits_f[1].data
+        return data.reshape((len(rows), ht, wd))
+
+    def _get_tiles(self, tys, txs, abandon=False):
+        # get the decompressed tiles at rows `tys` and columns `txs` of
+        # the tile grid, from the cache or by decompressing them
+        th, tw = self.tile_shape
+        ntx = self._num_tiles[1]
+        ht, wd = self._shape[-2:]
+        tiles = {}
+        with self._lock:
+            for ty in tys:
+                for tx in txs:
+                    row = self._row0 + ty * ntx + tx
+                    tile = self._cache.get(row, None)
+                    if tile is not None:
+                        self._cache.move_to_end(row)
+                        tiles[row - self._row0] = tile
+
+        # tiles of the same size can be decompressed together, except
+        # that dithered tiles must be consecutive rows of the table
+        dithered = str(self._header.get('ZQUANTIZ', '')).startswith(
+            'SUBTRACTIVE_DITHER')
+        itemsize = max(1, abs(self._header.get('ZBITPIX', 8)) // 8)
+        batches = {}
+        for idx in sorted(ty * ntx + tx for ty in tys for tx in txs):
+            if idx in tiles:
+                continue
+            ty, tx = divmod(idx, ntx)
+            shape = (min(th, ht - ty * th), min(tw, wd - tx * tw))
+            max_tiles = max(1, self.max_decode_bytes // (
+                shape[0] * shape[1] * itemsize))
+            runs = batches.setdefault(shape, [])
+            if (len(runs) > 0 and len(runs[-1]) < max_tiles and
+                    (not dithered or idx == runs[-1][-1] + 1)):
+                runs[-1].append(idx)
+            else:
+                runs.append([idx])
+
+        for (tile_ht, tile_wd), runs in batches.items():
+            for run in runs:
+                if abandon and self._cache_info.pending is not None:
+                    # a newer request for prefetching came in
+                    return tiles
+                data = self._decode(np.array(run) + self._row0,
+                                    tile_wd, tile_ht)
+                with self._lock:
+                    for idx, tile in zip(run, data):
+                        tiles[idx] = tile
+                        self._add_tile(self._row0 + idx, tile)
+        return tiles
+
+    def _add_tile(self, row, tile):
+        cache, info = self._cache, self._cache_info
+        if row in cache:
+            info.nbytes -= cache.pop(row).nbytes
+        cache[row] = tile
+        info.nbytes += tile.nbytes
+        while info.nbytes > self.max_bytes and len(cache) > 1:
+            _row, _tile = cache.popitem(last=False)
+            info.nbytes -= _tile.nbytes
+
+    def _gather(self, uy, ux):
+        # read the data at the (sorted, unique) rows `uy` and columns `ux`
+        th, tw = self.tile_shape
+        ntx = self._num_tiles[1]
+        res = np.empty((len(uy), len(ux)), dtype=self.dtype)
+        if res.size == 0:
+            return res
+        tys, txs = uy // th, ux // tw
+        ty_u, tx_u = np.unique(tys), np.unique(txs)
+        tiles = self._get_tiles(ty_u.tolist(), tx_u.tolist())
+
+        ybnds = np.searchsorted(tys, np.append(ty_u, ty_u[-1] + 1))
+        xbnds = np.searchsorted(txs, np.append(tx_u, tx_u[-1] + 1))
+        for i, ty in enumerate(ty_u.tolist()):
+            i1, i2 = ybnds[i], ybnds[i + 1]
+            ys = uy[i1:i2] - ty * th
+            if ys[-1] - ys[0] + 1 == len(ys):
+                ys = slice(ys[0], ys[-1] + 1)
+            for j, tx in enumerate(tx_u.tolist()):
+                j1, j2 = xbnds[j], xbnds[j + 1]
+                xs = ux[j1:j2] - tx * tw
+                if xs[-1] - xs[0] + 1 == len(xs):
+                    xs = slice(xs[0], xs[-1] + 1)
+                res[i1:i2, j1:j2] = tiles[ty * ntx + tx][ys][:, xs]
+        return res
+
+    def _prefetch_bg(self):
+        info = self._cache_info
+        while True:
+            with self._lock:
+                pending, info.pending = info.pending, None
+                if pending is None:
+                    info.thread = None
+                    return
+            try:
+                # NOTE: the request may be for another plane of a cube
+                section, tys, txs = pending
+                section._get_tiles(tys, txs, abandon=True)
+
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.error("error prefetching tiles: %s" % (
+                        str(e)))
+
+    def _prefetch(self, ty_u, tx_u):
+        # decompress the tiles around those at rows `ty_u` and columns
+        # `tx_u` of the tile grid in a background thread
+        nty, ntx = self._num_tiles
+        ty1, ty2 = ty_u[0], ty_u[-1]
+        tx1, tx2 = tx_u[0], tx_u[-1]
+        dy, dx = max(1, (ty2 - ty1 + 1) // 2), max(1, (tx2 - tx1 + 1) // 2)
+        tys = list(range(max(0, ty1 - dy), min(nty, ty2 + dy + 1)))
+        txs = list(range(max(0, tx1 - dx), min(ntx, tx2 + dx + 1)))
+        th, tw = self.tile_shape
+        nbytes = len(tys) * len(txs) * th * tw * self.dtype.itemsize
+        if len(tys) * len(txs) <= len(ty_u) * len(tx_u) or \
+           nbytes > self.max_bytes // 2:
+            # nothing around, or not enough room in the cache
+            return
+
+        info = self._cache_info
+        with self._lock:
+            info.pending = (self, tys, txs)
+            if info.thread is None:
+                info.thread = threading.Thread(target=self._prefetch_bg)
+                info.thread.daemon = True
+                info.thread.start()
+
+    def wait_prefetch(self, timeout=None):
+        """Wait for the tiles being prefetched to be decompressed."""
+        thread = self._cache_info.thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def _index(self, item, num):
+        # get the sorted indexes along an axis of length `num` selected by
+        # index `item`, and the equivalent index into those
+        if isinstance(item, slice):
+            idx = np.arange(num)[item]
+            if item.step is not None and item.step < 0:
+                return idx[::-1], slice(None, None, -1)
+            return idx, slice(None)
+
+        arr = np.asarray(item)
+        if arr.dtype.kind not in 'iu':
+            raise TypeError("unsupported index type")
+        arr = np.where(arr < 0, arr + num, arr)
+        if arr.size > 0 and (arr.min() < 0 or arr.max() >= num):
+            raise IndexError("index out of range for axis of size %d" % (
+                num))
+        if arr.ndim == 0:
+            return arr.reshape((1,)), 0
+        idx = np.unique(arr)
+        return idx, np.searchsorted(idx, arr)
+
+    def __getitem__(self, view):
+        """Read and return the data selected by `view` (any numpy index)."""
+        if not isinstance(view, tuple):
+            view = (view,)
+        if any(item is Ellipsis for item in view):
+            i = [item is Ellipsis for item in view].index(True)
+            view = (view[:i] + (slice(None),) * (self.ndim - len(view) + 1) +
+                    view[i + 1:])
+        view = view + (slice(None),) * (self.ndim - len(view))
+
+        if self.ndim > 2:
+            if all(isinstance(item, (int, np.integer)) for item in view[:-2]):
+                return self.get_plane(view[:-2])[view[-2:]]
+            planes = [self.get_plane(np.unravel_index(i, self._shape[:-2]))
+                      for i in range(int(np.prod(self._shape[:-2])))]
+            data = np.array([plane[:, :] for plane in planes])
+            return data.reshape(self._shape)[view]
+
+        try:
+            (uy, ys), (ux, xs) = [self._index(item, num)
+                                  for item, num in zip(view, self._shape)]
+        except TypeError:
+            # e.g. boolean masks or new axes
+            return self[:, :][view]
+
+        data = self._gather(uy, ux)
+        if self.prefetch and data.size > 0:
+            th, tw = self.tile_shape
+            self._prefetch(np.unique(uy // th), np.unique(ux // tw))
+        return data[ys, xs]
+
+    def __array__(self, dtype=None):
+        data = self[...]
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
+
+    def get_plane(self, view):
+        """Get a `CompImageSection` of a plane of a cube selected by `view`
+        (integers, one for each axis above the first two), without reading
+        it.
+        """
+        view = tuple(view)
+        lead, rest = view[:self.ndim - 2], view[self.ndim - 2:]
+        if (not all(isinstance(item, (int, np.integer)) for item in lead) or
+                any(item != slice(None) for item in rest)):
+            return np.asarray(self)[view]
+        if len(lead) == 0:
+            return self
+        plane = int(np.ravel_multi_index(lead, self._shape[:-2]))
+        return self.__class__(self.filepath, None, self._header,
+                              _parent=self, _plane=plane)
+
+    def get_sample(self, num_pixels):
+        """Get a sample of about `num_pixels` of the data, made up of a
+        grid of whole tiles spread over the image.
+        """
+        th, tw = self.tile_shape
+        nty, ntx = self._num_tiles
+        num_tiles = max(1, num_pixels // (th * tw))
+        if num_tiles >= nty * ntx:
+            return self[:, :]
+        nx = max(1, min(ntx, int(round(np.sqrt(num_tiles * ntx / nty)))))
+        ny = max(1, min(nty, num_tiles // nx))
+        ht, wd = self._shape[-2:]
+        uy = np.concatenate([np.arange(ty * th, min(ht, (ty + 1) * th))
+                             for ty in np.unique(np.linspace(
+                                 0, nty - 1, ny).round().astype(int))])
+        ux = np.concatenate([np.arange(tx * tw, min(wd, (tx + 1) * tw))
+                             for tx in np.unique(np.linspace(
+                                 0, ntx - 1, nx).round().astype(int))])
+        return self._gather(uy, ux)
+
+
 class BaseFitsFileHandler(object):
 
     # holds datatype/class objects for instantiating objects
@@ -90,6 +614,13 @@ class BaseFitsFileHandler(object):
         hdlr = self.__class__(self.logger)
         return hdlr
 
+    def get_lazy_data(self, hdu):
+        """Get an object for reading the data of image HDU `hdu` as
+        needed (see `MemmapSection` and `CompImageSection`), or `None` if
+        that is not possible.
+        """
+        return None
+
 
 class PyFitsFileHandler(BaseFitsFileHandler):
 
@@ -167,6 +698,7 @@ class PyFitsFileHandler(BaseFitsFileHandler):
 
             # For now, call back into the object to load it from pyfits-style
             # HDU in future migrate to storage-neutral format
+            kwargs.pop('lazy', None)
             dstobj.load_hdu(hdu, **kwargs)
 
         else:
@@ -174,15 +706,54 @@ class PyFitsFileHandler(BaseFitsFileHandler):
 
         return dstobj
 
+    def get_lazy_data(self, hdu):
+        info = hdu.fileinfo()
+        if info is None or info['file'].compression is not None:
+            return None
+
+        if isinstance(hdu, pyfits.CompImageHDU):
+            # read the header of the table as it is in the file
+            with open(info['file'].name, 'rb') as in_f:
+                in_f.seek(info['hdrLoc'])
+                header = pyfits.Header.fromfile(in_f)
+            if header.get('ZNAXIS', 0) < 2:
+                return None
+
+            try:
+                return CompImageSection(info['file'].name, info['datLoc'],
+                                        header, logger=self.logger)
+
+            except Exception as e:
+                self.logger.warning("Can't read data of HDU by tiles: %s" % (
+                    str(e)))
+                return None
+
+        if not isinstance(hdu, (pyfits.ImageHDU, pyfits.PrimaryHDU)):
+            return None
+
+        header = hdu.header
+        if (len(hdu.shape) == 0 or 0 in hdu.shape or
+                header['BITPIX'] not in MemmapSection.bitpix_types):
+            return None
+
+        try:
+            return MemmapSection(info['file'].name, info['datLoc'], header)
+
+        except Exception as e:
+            self.logger.warning("Can't memory map data of HDU: %s" % (
+                str(e)))
+            return None
+
     def load_file(self, filespec, numhdu=None, dstobj=None, memmap=None,
                   **kwargs):
         inherit_primary_header = kwargs.pop('inherit_primary_header', False)
+        lazy = kwargs.pop('lazy', False)
         opener = self.get_factory()
         opener.open_file(filespec, memmap=memmap, **kwargs)
         try:
             return opener.get_hdu(
                 numhdu, dstobj=dstobj,
-                inherit_primary_header=inherit_primary_header)
+                inherit_primary_header=inherit_primary_header, lazy=lazy)
         finally:
             opener.close()
 
@@ -275,11 +846,18 @@ class PyFitsFileHandler(BaseFitsFileHandler):
                                         )):
                     continue
 
-                if not isinstance(hdu.data, np.ndarray):
-                    # We need to open a numpy array
-                    continue
+                if isinstance(hdu, (pyfits.ImageHDU, pyfits.CompImageHDU,
+                                    pyfits.PrimaryHDU)):
+                    # check the shape in the header, rather than reading
+                    # (and possibly scaling or decompressing) all the data
+                    shape = hdu.shape
+                else:
+                    if not isinstance(hdu.data, np.ndarray):
+                        # We need to open a numpy array
+                        continue
+                    shape = hdu.data.shape
 
-                if 0 in hdu.data.shape:
+                if len(shape) == 0 or 0 in shape:
                     # non-pixel or zero-length data hdu?
                     continue
 
@@ -415,6 +993,8 @@ class FitsioFileHandler(BaseFitsFileHandler):
     def load_file(self, filespec, numhdu=None, dstobj=None, memmap=None,
                   **kwargs):
         inherit_primary_header = kwargs.pop('inherit_primary_header', False)
+        # NOTE: lazy loading is not supported with fitsio
+        kwargs.pop('lazy', None)
         opener = self.get_factory()
         opener.open_file(filespec, memmap=memmap, **kwargs)
         try:
@@ -0,0 +1,169 @@
+#
+# pyramid.py -- multi-resolution decimated copies of image data
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+A multi-resolution "pyramid" of decimated copies of an image's data array.
+
+Level 0 is the original array.  Each subsequent level is a contiguous copy
+of the previous level decimated by a factor of 2 in each of the X and Y
+dimensions.  When a viewer is zoomed out, a cutout can be taken from the
+coarsest level that still has at least as many pixels as the output
+requires, which avoids striding over the full resolution data.
+
+Levels are built incrementally (one at a time, each from the previous
+level) and can be built in a background thread.  The total size of the
+levels is constrained by a memory budget.
+"""
+import threading
+
+import numpy as np
+
+__all__ = ['ImagePyramid']
+
+
+class ImagePyramid(object):
+    """A set of decimated copies of a data array.
+
+    Parameters
+    ----------
+    data_np : ndarray
+        The full resolution data (level 0).  This array is referenced,
+        not copied.
+
+    max_bytes : int or `None`
+        Memory budget (in bytes) for all levels above level 0.  If `None`,
+        the budget is unconstrained (a full pyramid takes about 1/3 of the
+        size of the original array).
+
+    min_size : int
+        Do not build levels whose smaller dimension would be below this
+        number of pixels.
+
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for tracing and debugging.
+
+    """
+
+    def __init__(self, data_np, max_bytes=None, min_size=256, logger=None):
+        self.logger = logger
+        self.max_bytes = max_bytes
+        self.min_size = min_size
+
+        self.levels = [data_np]
+        self.nbytes = 0
+        self._done = False
+        self._cancel = threading.Event()
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def get_num_levels(self):
+        return len(self.levels)
+
+    def is_complete(self):
+        return self._done
+
+    def _next_level(self, data):
+        ht, wd = data.shape[:2]
+        if min(wd, ht) // 2 < self.min_size:
+            return None
+
+        # predict size of the next level before spending time on it
+        nbytes = (((ht + 1) // 2) * ((wd + 1) // 2) *
+                  int(np.prod(data.shape[2:])) * data.dtype.itemsize)
+        if (self.max_bytes is not None and
+                self.nbytes + nbytes > self.max_bytes):
+            return None
+
+        return np.ascontiguousarray(data[::2, ::2])
+
+    def build_next(self):
+        """Build the next level of the pyramid, if possible.
+
+        Returns
+        -------
+        built : bool
+            `True` if a new level was added, `False` if the pyramid is
+            complete or the build was cancelled.
+
+        """
+        with self._lock:
+            if self._done or self._cancel.is_set():
+                return False
+
+            newdata = self._next_level(self.levels[-1])
+            if newdata is None or self._cancel.is_set():
+                self._done = True
+                return False
+
+            self.nbytes += newdata.nbytes
+            # appending is atomic wrt. readers of self.levels
+            self.levels.append(newdata)
+
+        if self.logger is not None:
+            ht, wd = newdata.shape[:2]
+            self.logger.debug("built pyramid level %d (%dx%d)" % (
+                len(self.levels) - 1, wd, ht))
+        return True
+
+    def build(self):
+        """Build all remaining levels of the pyramid synchronously."""
+        while self.build_next():
+            pass
+
+    def _build_bg(self):
+        try:
+            self.build()
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.error("error building image pyramid: %s" % (
+                    str(e)))
+
+    def start(self):
+        """Build the remaining levels of the pyramid in a background
+        thread.
+        """
+        if self._done or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._build_bg)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for a background build to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def cancel(self):
+        """Stop building levels.  Levels already built remain valid."""
+        self._cancel.set()
+
+    def get_level(self, scale_x, scale_y):
+        """Choose the coarsest level that satisfies the requested scale.
+
+        Parameters
+        ----------
+        scale_x, scale_y : float
+            Desired scale factors relative to the full resolution data.
+
+        Returns
+        -------
+        (level, data_np) : tuple
+            Index of the level and its data array.  The decimation factor
+            of the level is ``2 ** level``.
+
+        """
+        levels = self.levels
+        scale = max(scale_x, scale_y)
+        level = 0
+        while (level + 1 < len(levels) and
+               scale * 2 ** (level + 1) <= 1.0):
+            level += 1
+        return level, levels[level]
+
+    def __len__(self):
+        return len(self.levels)
+
+# END
@@ -0,0 +1,160 @@
+#
+# renderstats.py -- per-stage instrumentation of the render pipeline
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+Collects timing and size measurements for the stages of rendering a
+frame in a viewer (backing image, cutout, cut levels, color mapping,
+compositing, ICC conversion, transforms and blit to the backend).
+
+The last `window` samples of each stage are kept, from which summary
+statistics and a histogram of the elapsed times are computed on request.
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from ginga.misc import Bunch
+
+__all__ = ['RenderStats']
+
+# edges of histogram bins for elapsed times (in msec)
+hist_edges_ms = np.array([0.0, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0,
+                          100.0, 200.0, 500.0, 1000.0, np.inf])
+
+
+class RenderStats(object):
+    """Rolling per-stage statistics for a render pipeline.
+
+    Parameters
+    ----------
+    window : int
+        Number of samples kept for each stage.
+
+    bufpool : `~ginga.util.bufpool.BufferPool` or `None`
+        If given, allocations counted by this pool during a stage are
+        attributed to that stage.
+
+    """
+
+    def __init__(self, window=100, bufpool=None):
+        self.window = window
+        self.bufpool = bufpool
+
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Discard all samples."""
+        with self._lock:
+            self.samples = {}
+            self.frame = {}
+            self.num_frames = 0
+
+    def start_frame(self, whence):
+        """Note the start of rendering a new frame."""
+        with self._lock:
+            self.frame = {}
+            self.whence = whence
+            self.num_frames += 1
+
+    def get_frame(self):
+        """Get the samples recorded for the last (or current) frame.
+
+        Returns
+        -------
+        frame : dict
+            Maps stage names to samples, each having the attributes
+            ``elapsed`` (sec), ``pixels``, ``nbytes`` (bytes allocated)
+            and ``whence``.
+
+        """
+        with self._lock:
+            return dict(self.frame)
+
+    def record(self, name, elapsed, pixels=0, nbytes=0, whence=None):
+        """Record a sample for stage `name`."""
+        if whence is None:
+            whence = getattr(self, 'whence', None)
+        sample = Bunch.Bunch(time=time.time(), elapsed=elapsed,
+                             pixels=int(pixels), nbytes=int(nbytes),
+                             whence=whence)
+        with self._lock:
+            dq = self.samples.get(name, None)
+            if dq is None:
+                dq = deque(maxlen=self.window)
+                self.samples[name] = dq
+            dq.append(sample)
+
+            if name in self.frame:
+                # stage ran more than once in this frame (e.g. several
+                # images on the canvas): accumulate
+                prev = self.frame[name]
+                sample = Bunch.Bunch(time=sample.time,
+                                     elapsed=prev.elapsed + elapsed,
+                                     pixels=prev.pixels + sample.pixels,
+                                     nbytes=prev.nbytes + sample.nbytes,
+                                     whence=whence)
+            self.frame[name] = sample
+        return sample
+
+    @contextmanager
+    def stage(self, name, pixels=0, whence=None):
+        """Context manager that times the enclosed code as stage `name`.
+        The yielded object can be used to set ``pixels`` and ``nbytes``
+        if they are only known inside the block.
+        """
+        res = Bunch.Bunch(pixels=pixels, nbytes=0)
+        alloc_start = 0
+        if self.bufpool is not None:
+            alloc_start = self.bufpool.alloc_bytes
+        time_start = time.time()
+        try:
+            yield res
+
+        finally:
+            elapsed = time.time() - time_start
+            nbytes = res.nbytes
+            if self.bufpool is not None:
+                nbytes += max(0, self.bufpool.alloc_bytes - alloc_start)
+            self.record(name, elapsed, pixels=res.pixels, nbytes=nbytes,
+                        whence=whence)
+
+    def get_stats(self):
+        """Get summary statistics for each stage.
+
+        Returns
+        -------
+        stats : dict
+            Maps stage names to dicts with ``count``, ``last``, ``mean``,
+            ``min``, ``max``, ``p50``, ``p90``, ``p99`` (elapsed times, in
+            sec), ``pixels`` and ``nbytes`` (means per sample), ``whence``
+            (of the last sample) and ``hist``, a histogram of elapsed
+            times with bin edges (in msec) given by ``hist_edges_ms``.
+
+        """
+        with self._lock:
+            samples = {name: list(dq) for name, dq in self.samples.items()}
+
+        res = {}
+        for name, lst in samples.items():
+            elapsed = np.array([s.elapsed for s in lst])
+            hist, _ = np.histogram(elapsed * 1000.0, bins=hist_edges_ms)
+            p50, p90, p99 = np.percentile(elapsed, [50, 90, 99])
+            res[name] = dict(count=len(lst), last=lst[-1].elapsed,
+                             mean=elapsed.mean(),
+                             min=elapsed.min(), max=elapsed.max(),
+                             p50=p50, p90=p90, p99=p99,
+                             pixels=np.mean([s.pixels for s in lst]),
+                             nbytes=np.mean([s.nbytes for s in lst]),
+                             whence=lst[-1].whence,
+                             hist=hist.tolist(),
+                             hist_edges_ms=hist_edges_ms.tolist())
+        return res
+
+# END
@@ -0,0 +1,263 @@
+#
+# spill.py -- disk cache of images dropped from memory
+#
+# This is open-source software licensed under a BSD license.
+# Please see the file LICENSE.txt for details.
+#
+"""
+A second tier cache, on local disk, for images that were dropped from
+memory (e.g. ejected from the data cache of a channel).
+
+The data of each image is written as a native byte order NumPy ``.npy``
+file, with its metadata (name, path, cut levels, etc.) and FITS header
+in JSON sidecar files.  An image is reopened with its data memory mapped
+(read-only) from the ``.npy`` file, so that even a huge image is back in
+a few milliseconds, without reading and parsing the original file,
+applying BSCALE/BZERO or finding the minimum and maximum of the data
+again.  The total size of the files is constrained by a disk budget,
+and the least recently used images are removed first.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ginga.misc import Bunch
+
+__all__ = ['SpillCache']
+
+
+def _json_value(value):
+    # header values that JSON can't represent are kept as strings
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class SpillCache(object):
+    """A cache of images on local disk.
+
+    Parameters
+    ----------
+    cache_dir : str or `None`
+        Directory in which to create the (private) directory of the
+        cache.  If `None`, the system's temporary directory is used.
+
+    max_bytes : int or `None`
+        Disk budget (in bytes) for the files of the cache.  If `None` or
+        0, the size of the cache is unlimited.
+
+    logger : :py:class:`~logging.Logger` or `None`
+        Logger for tracing and debugging.
+
+    """
+
+    # rows of the data copied to the file at a time
+    chunk_bytes = 64 * 1024 ** 2
+
+    def __init__(self, cache_dir=None, max_bytes=None, logger=None):
+        self.logger = logger
+        self.max_bytes = max_bytes
+        self.cache_dir = tempfile.mkdtemp(prefix='ginga-spill-',
+                                          dir=cache_dir)
+        # entries, in order of last use
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.count = 0
+        self.lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_nbytes(self):
+        """Get the size (in bytes) of the files of the cache."""
+        return self.nbytes
+
+    def set_max_bytes(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._eject_old()
+
+    def _remove_files(self, entry):
+        for path in entry.files:
+            try:
+                os.remove(path)
+            except OSError as e:
+                # e.g. file is still memory mapped on some platforms
+                if self.logger is not None:
+                    self.logger.warning("Can't remove file '%s': %s" % (
+                        path, str(e)))
+
+    def _eject_old(self):
+        if not self.max_bytes:
+            return
+        while self.nbytes > self.max_bytes and len(self.entries) > 0:
+            key, entry = self.entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            self._remove_files(entry)
+
+    def discard(self, key):
+        """Remove image `key` from the cache, if it is there."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            self.nbytes -= entry.nbytes
+        self._remove_files(entry)
+
+    def clear(self):
+        """Remove all the images and the directory of the cache."""
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _write_data(self, filepath, data):
+        # copy the data to the file a chunk of rows at a time, so that
+        # data in another byte order is not converted all at once
+        dtype = data.dtype.newbyteorder('=')
+        out = np.lib.format.open_memmap(filepath, mode='w+', dtype=dtype,
+                                        shape=data.shape)
+        try:
+            if data.ndim == 0 or data.size == 0:
+                out[...] = data
+            else:
+                row_bytes = max(1, data[0].nbytes)
+                num = max(1, self.chunk_bytes // row_bytes)
+                for i in range(0, len(data), num):
+                    out[i:i + num] = data[i:i + num]
+            out.flush()
+        finally:
+            del out
+
+    def spill(self, key, image):
+        """Write `image` to the cache as `key`.
+
+        Only images with their data in memory (e.g. not lazily loaded)
+        are written; if the data of the image is already memory mapped
+        from the cache, it is only marked as used.
+
+        Returns
+        -------
+        spilled : bool
+            `True` if the image is (now) in the cache.
+
+        """
+        get_mddata = getattr(image, 'get_mddata', None)
+        if get_mddata is None or image.is_lazy():
+            return False
+        data = get_mddata()
+        if data is None:
+            # e.g. image created with its data
+            data = image.get_data()
+        if not isinstance(data, np.ndarray):
+            return False
+
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if (entry is not None and
+                    getattr(data, 'filename', None) == entry.files[0]):
+                # image was reopened from the cache and not changed
+                self.entries.move_to_end(key)
+                return True
+            self.count += 1
+            stem = os.path.join(self.cache_dir, 'img%d' % (self.count))
+
+        path = image.get('path', None)
+        mtime = None
+        if path is not None and os.path.exists(path):
+            mtime = os.path.getmtime(path)
+        minmax = (image.get_minmax(noinf=False) +
+                  image.get_minmax(noinf=True))
+        meta = dict(name=image.get('name', None), path=path, mtime=mtime,
+                    idx=image.get('idx', None),
+                    naxispath=list(getattr(image, 'naxispath', [])),
+                    minmax=[np.asarray(val).item() for val in minmax])
+        header = image.get_header()
+        cards = [(key_, card.value, card.comment)
+                 for key_, card in ((key_, header.get_card(key_))
+                                    for key_ in header.keys())]
+
+        files = [stem + '.npy', stem + '.meta.json', stem + '.header.json']
+        try:
+            self._write_data(stem + '.tmp.npy', data)
+            with open(files[1], 'w') as out_f:
+                json.dump(meta, out_f, default=_json_value)
+            with open(files[2], 'w') as out_f:
+                json.dump(cards, out_f, default=_json_value)
+            # NOTE: data file appears only when it is complete
+            os.replace(stem + '.tmp.npy', files[0])
+
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.error("Error writing image to disk cache: %s" % (
+                    str(e)))
+            self._remove_files(Bunch.Bunch(files=files + [stem + '.tmp.npy']))
+            return False
+
+        nbytes = sum([os.path.getsize(path_) for path_ in files])
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = Bunch.Bunch(files=files, nbytes=nbytes)
+            self.nbytes += nbytes
+            self._eject_old()
+            return key in self.entries
+
+    def load(self, key, logger=None):
+        """Reopen image `key` from the cache.
+
+        Returns
+        -------
+        image : `~ginga.AstroImage.AstroImage` or `None`
+            The image, with its data memory mapped (read-only) from the
+            cache, or `None` if the image is not in the cache or its file
+            was changed after it was loaded.
+
+        """
+        # avoid circular import
+        from ginga.AstroImage import AstroImage, AstroHeader
+
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+
+        npy_path, meta_path, hdr_path = entry.files
+        with open(meta_path, 'r') as in_f:
+            meta = json.load(in_f)
+        path = meta['path']
+        if (meta['mtime'] is not None and os.path.exists(path) and
+                os.path.getmtime(path) != meta['mtime']):
+            # file has changed since the image was loaded from it
+            self.discard(key)
+            return None
+
+        header = AstroHeader()
+        with open(hdr_path, 'r') as in_f:
+            for kwd, value, comment in json.load(in_f):
+                header.set_card(kwd, value, comment=comment)
+
+        data = np.load(npy_path, mmap_mode='r')
+        # cut levels have the type of the data, as when calculated
+        minmax = [data.dtype.type(val) for val in meta['minmax']]
+        if logger is None:
+            logger = self.logger
+        image = AstroImage(logger=logger)
+        image.load_data(data, naxispath=meta['naxispath'],
+                        metadata=dict(header=header),
+                        minmax=minmax)
+        if image.wcs is not None:
+            image.wcs.load_header(header)
+        image.set(name=meta['name'], path=path, idx=meta['idx'])
+        return image
+
+# END